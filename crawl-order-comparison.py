@@ -0,0 +1,90 @@
+import collections
+import sys
+
+# PageRank damping factor, as in hw2/page-rank.py
+DAMPING_FACTOR = 0.85
+
+# PageRank iterations stop once no page rank changes by more than this.
+PAGE_RANK_TOLERANCE = 1e-10
+MAX_PAGE_RANK_ITERATIONS = 200
+
+# Fractions of a crawl at which the PageRank it collected so far is reported.
+CRAWL_FRACTIONS = (0.1, 0.25, 0.5, 1.0)
+
+
+def compute_page_rank(graph_file_name):
+    '''
+    PageRank of the pages of a graph file, a line per page: doc id followed
+    by the doc ids of its in-links. Sink pages spread their rank evenly.
+    :param graph_file_name: graph file name e.g. G1.txt
+    :return: dict of doc id vs PageRank
+    '''
+    inlinks_by_page = dict()
+    outlink_counts = collections.Counter()
+    with open(graph_file_name, 'r', encoding="utf-8") as graph_file:
+        for vertex_item in graph_file:
+            vertex_tokens = vertex_item.split()
+            inlinks_by_page[vertex_tokens[0]] = set(vertex_tokens[1:])
+            outlink_counts.update(set(vertex_tokens[1:]))
+
+    page_count = len(inlinks_by_page)
+    sinks = [page for page in inlinks_by_page if page not in outlink_counts]
+    page_rank = {page: 1 / page_count for page in inlinks_by_page}
+    for iteration in range(MAX_PAGE_RANK_ITERATIONS):
+        sink_rank = sum(page_rank[page] for page in sinks)
+        new_page_rank = {page: (1 - DAMPING_FACTOR) / page_count + DAMPING_FACTOR * sink_rank / page_count +
+                               DAMPING_FACTOR * sum(page_rank[inlink] / outlink_counts[inlink]
+                                                    for inlink in inlinks if inlink in page_rank)
+                         for page, inlinks in inlinks_by_page.items()}
+        converged = max(abs(new_page_rank[page] - page_rank[page]) for page in page_rank) < PAGE_RANK_TOLERANCE
+        page_rank = new_page_rank
+        if converged:
+            break
+    return page_rank
+
+
+def read_crawled_urls(links_file_name):
+    '''
+    :param links_file_name: links file of a crawl e.g. G1_LINKS.txt
+    :return: list of (doc id, URL) of the crawled pages, in crawl order
+    '''
+    crawled_urls = []
+    with open(links_file_name, 'r', encoding="utf-8") as links_file:
+        for link_item in links_file:
+            link_tokens = link_item.strip().split("|")
+            if len(link_tokens) == 1:
+                continue
+            crawled_urls.append((link_tokens[1], link_tokens[len(link_tokens) - 1]))
+    return crawled_urls
+
+
+def compare_crawl_orders(reference_graph_file_name, reference_links_file_name, links_file_names):
+    '''
+    Reports, for every crawl, the share of the reference PageRank collected by
+    the pages it crawled, after each of CRAWL_FRACTIONS of the crawl. Crawls of
+    the same budget over the same pages e.g. replayed from one fetch archive,
+    with a reference crawl of all of them, compare how early each crawl order
+    finds the important pages.
+    :param reference_graph_file_name: graph file of the reference crawl
+    :param reference_links_file_name: links file of the reference crawl, to map its doc ids to URLs
+    :param links_file_names: links files of the crawls to compare
+    :return: None
+    '''
+    page_rank = compute_page_rank(reference_graph_file_name)
+    page_rank_by_url = {url: page_rank.get(docid, 0.0) for docid, url in read_crawled_urls(reference_links_file_name)}
+    print("Reference pages: " + str(len(page_rank)))
+
+    for links_file_name in links_file_names:
+        crawled_urls = read_crawled_urls(links_file_name)
+        collected = [page_rank_by_url.get(url, 0.0) for docid, url in crawled_urls]
+        unknown_count = sum(1 for docid, url in crawled_urls if url not in page_rank_by_url)
+        print(links_file_name + "|" + "pages: " + str(len(crawled_urls)) + "|" +
+              "|".join("PageRank after " + str(round(fraction * 100)) + "%: " +
+                       str(round(sum(collected[:round(fraction * len(collected))]), 4))
+                       for fraction in CRAWL_FRACTIONS) + "|" +
+              "pages not in the reference: " + str(unknown_count))
+
+
+if __name__ == '__main__':
+    # python crawl-order-comparison.py <reference G1.txt> <reference G1_LINKS.txt> <G1_LINKS.txt of a crawl>...
+    compare_crawl_orders(sys.argv[1], sys.argv[2], sys.argv[3:])
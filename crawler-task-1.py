@@ -5,7 +5,8 @@ from urllib import request
 import nltk
 import time
 from bs4 import BeautifulSoup
-from nltk.corpus import words
+
+from crawler.word_index import load_english_words_index
 
 SEED_URL = "https://en.wikipedia.org/wiki/Tropical_cyclone"
 
@@ -38,8 +39,9 @@ links_file = open(LINKS_FILE_NAME, 'w', encoding="utf-8")
 # stemmer to stem words
 stemmer = nltk.stem.porter.PorterStemmer()
 
-# English dictionary to de-compund words.
-english_words_set = set(filter(lambda w: len(w) > 1, words.words())).union({""})
+# English dictionary to de-compund words, a prebuilt on-disk index
+# only opened when is_compound_keyword looks up a keyword suffix.
+english_words_set = load_english_words_index()
 
 # flag that enable raw-content writing to files.
 SHOULD_WRITE_RAW_CONTENT = False
@@ -1,11 +1,19 @@
-import re
+import asyncio
 import sys
-from urllib import request
 
 import nltk
 import time
 from bs4 import BeautifulSoup
-from nltk.corpus import words
+
+from crawler.async_fetcher import AsyncFetcher, blocking_fetch, get_host
+from crawler.crawl_log import CrawlLogWriter
+from crawler.fetch_archive import RecordingFetcher, ReplayFetcher
+from crawler.frontier import PriorityFrontier
+from crawler.host_scheduler import HostScheduler, RobotsCache, fetch_with_backoff
+from crawler.http_pool import ConditionalFetchCache, HTTPConnectionPool
+from crawler.keyword_matcher import KeywordMatcher
+from crawler.url_filter import compile_url_filter, get_site_url
+from crawler.word_index import load_english_words_index
 
 SEED_URL = "https://en.wikipedia.org/wiki/Tropical_cyclone"
 
@@ -16,43 +24,138 @@ UNIQUE_URL_THRESHOLD = 1000
 LINK_WITH_CONTENT_FILE_NAME = "task2_links_with_content.txt"
 LINKS_FILE_NAME = "task2_links.txt"
 
-# Frontier (list of frontier-item)
-# A frontier-item is tuple (<Anchor-Text>, <URL>, <DEPTH>)
-# Anchor-Text : is the Anchor-Text
-# URL : the URL hyperlink points to.
-# DEPTH : depth at which this was found
-frontier = []
+# asyncio fetch mode, keeps up to MAX_IN_FLIGHT_REQUESTS pages downloading at once.
+ASYNC_FETCH_ENABLED = False
+MAX_IN_FLIGHT_REQUESTS = 8
+
+# keep-alive HTTP connection pool with gzip, validators and bodies of fetched
+# pages are cached in HTTP_CACHE_DIRECTORY so recrawls send conditional GETs.
+HTTP_POOL_ENABLED = False
+HTTP_CACHE_DIRECTORY = "http_cache"
+
+# fetch backend archive: "record" saves every response to FETCH_ARCHIVE_DIRECTORY,
+# "replay" serves the crawl from it after a simulated latency of REPLAY_LATENCY_IN_SEC
+# +/- REPLAY_LATENCY_JITTER_IN_SEC per page, None fetches from the network.
+FETCH_ARCHIVE_MODE = None
+FETCH_ARCHIVE_DIRECTORY = "fetch_archive"
+REPLAY_LATENCY_IN_SEC = 0.1
+REPLAY_LATENCY_JITTER_IN_SEC = 0.05
+
+# robots.txt of every host is fetched once and honored, Crawl-delay included.
+ROBOTS_TXT_ENABLED = False
+
+# adaptive politeness, the delay of every host follows its response times and backs
+# off on 429 and 5xx statuses, between MINIMUM_POLITENESS_DELAY_IN_SEC and
+# MAXIMUM_POLITENESS_DELAY_IN_SEC, 429 and 503 responses are retried.
+ADAPTIVE_POLITENESS_ENABLED = False
+MINIMUM_POLITENESS_DELAY_IN_SEC = 0.25
+MAXIMUM_POLITENESS_DELAY_IN_SEC = 60
+
+# best-first focused crawl: links are not dropped for not matching the keyword,
+# the frontier serves the link with the highest score first instead. A link scores
+# ANCHOR_MATCH_WEIGHT if its anchor text matches the keyword, else HYPERLINK_MATCH_WEIGHT
+# if its hyperlink does, plus PARENT_RELEVANCE_WEIGHT times the relevance of the page
+# it was found on, minus DEPTH_PENALTY per depth.
+BEST_FIRST_ENABLED = False
+ANCHOR_MATCH_WEIGHT = 0.6
+HYPERLINK_MATCH_WEIGHT = 0.3
+PARENT_RELEVANCE_WEIGHT = 0.4
+DEPTH_PENALTY = 0.05
+
+# a page is relevant i.e. counts for the harvest rate, if its content
+# has RELEVANT_PAGE_MATCH_COUNT tokens matching the keyword, its relevance
+# is the fraction of those it has. Matching the whole content of every page
+# is costly, it is only done by a best-first crawl, which scores links with
+# it, or if HARVEST_RATE_ENABLED is set, the harvest rate is reported then.
+RELEVANT_PAGE_MATCH_COUNT = 3
+HARVEST_RATE_ENABLED = False
 
 # frontier-item selector indexes
 FRONTIER_ITEM_ANCHOR_TEXT_INDEX = 0
 FRONTIER_ITEM_URL_INDEX = 1
 FRONTIER_ITEM_DEPTH_INDEX = 2
+FRONTIER_ITEM_SCORE_INDEX = 3
+
+# Frontier (priority queue of frontier-item, each URL is queued once)
+# served shallowest depth first, in discovery order within a depth,
+# or highest score first if BEST_FIRST_ENABLED.
+# A frontier-item is tuple (<Anchor-Text>, <URL>, <DEPTH>, <SCORE>)
+# Anchor-Text : is the Anchor-Text
+# URL : the URL hyperlink points to.
+# DEPTH : depth at which this was found
+# SCORE : relevance score of the link, see BEST_FIRST_ENABLED
+frontier = PriorityFrontier(FRONTIER_ITEM_URL_INDEX, lambda x: x[FRONTIER_ITEM_DEPTH_INDEX])
 
 # visited links
 visited = set()
 
+# crawl scope check of a hyperlink, compiled from PREFIX_TO_FOLLOW
+url_filter = compile_url_filter(PREFIX_TO_FOLLOW)
+
+# scheme and host of PREFIX_TO_FOLLOW, relative links are resolved against it
+site_url = get_site_url(PREFIX_TO_FOLLOW)
+
 # files to document link and content
-links_with_content_file = open(LINK_WITH_CONTENT_FILE_NAME, 'w', encoding="utf-8")
-links_file = open(LINKS_FILE_NAME, 'w', encoding="utf-8")
+links_with_content_file = CrawlLogWriter(LINK_WITH_CONTENT_FILE_NAME)
+links_file = CrawlLogWriter(LINKS_FILE_NAME)
 
 # stemmer to stem words
 stemmer = nltk.stem.porter.PorterStemmer()
 
-# English dictionary to de-compund words.
-english_words_set = set(filter(lambda w:len(w)>1,words.words())).union({""})
+# English dictionary to de-compund words, a prebuilt on-disk index
+# only opened when is_compound_keyword looks up a keyword suffix.
+english_words_set = load_english_words_index()
+
+# keyword matcher with its stem cache, compiled once per crawl by get_keyword_matcher
+keyword_matcher = None
 
 # flag that enable raw-content writing to files.
 SHOULD_WRITE_RAW_CONTENT = False
 
+# HTTP connection pool, created by start_crawling if HTTP_POOL_ENABLED
+http_connection_pool = None
+
+# RecordingFetcher or ReplayFetcher, created by start_crawling if FETCH_ARCHIVE_MODE is set
+fetch_archive_backend = None
+
+# RobotsCache if ROBOTS_TXT_ENABLED is set, and the HostScheduler spacing
+# the requests to every host, created by start_crawling
+robots_cache = None
+host_scheduler = None
+
+# pages fetched and relevant pages committed, harvest rate is their ratio
+fetched_page_count = 0
+relevant_page_count = 0
+
 
 # This where the crawling starts
 def start_crawling(seed_url, keyword=None):
+    global http_connection_pool, fetch_archive_backend, url_filter, site_url, robots_cache, host_scheduler
+    url_filter = compile_url_filter(PREFIX_TO_FOLLOW)
+    site_url = get_site_url(PREFIX_TO_FOLLOW)
+    if HTTP_POOL_ENABLED:
+        http_connection_pool = HTTPConnectionPool(ConditionalFetchCache(HTTP_CACHE_DIRECTORY))
+    fetch_archive_backend = create_fetch_archive_backend()
+    robots_cache = RobotsCache(fetch_robots_txt) if ROBOTS_TXT_ENABLED else None
+    host_scheduler = HostScheduler(POLITENESS_POLICY_DELAY_IN_SEC, robots_cache, ADAPTIVE_POLITENESS_ENABLED,
+                                   MINIMUM_POLITENESS_DELAY_IN_SEC, MAXIMUM_POLITENESS_DELAY_IN_SEC)
 
     # Add Sed URL to frontier
-    frontier.append(("Seed", seed_url, 1))
-
-    # start crawling
-    internal_start_crawling(keyword)
+    frontier.add(("Seed", seed_url, 1, 0))
+
+    # start crawling, the lines buffered when it stops are written even if it fails
+    try:
+        if ASYNC_FETCH_ENABLED:
+            asyncio.run(internal_start_crawling_async(keyword))
+        else:
+            internal_start_crawling(keyword)
+    finally:
+        links_with_content_file.flush()
+        links_file.flush()
+
+    if is_page_relevance_needed():
+        print("Harvest rate:" + str(get_harvest_rate()) +
+              " relevant:" + str(relevant_page_count) + " fetched:" + str(fetched_page_count))
 
     # release all the resources
     release_resources()
@@ -62,6 +165,8 @@ def start_crawling(seed_url, keyword=None):
 def release_resources():
     links_with_content_file.close()
     links_file.close()
+    if http_connection_pool is not None:
+        http_connection_pool.close()
 
 
 def get_content_body(raw_html_soup):
@@ -84,21 +189,11 @@ def document_link_and_content(hyperlink_count, anchor_text, hyperlink, depth, ne
     if new_depth:
         links_file.write("\n\n\nDEPTH:" + str(depth) + "\n")
     links_file.write(str(hyperlink_count) + "|" + anchor_text + "|" + hyperlink + "\n")
-    links_file.flush()
 
     if SHOULD_WRITE_RAW_CONTENT:
         write_raw_content(hyperlink, html_content_body)
 
 
-def is_link_external(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: Return true if the link is outside of PREFIX_TO_FOLLOW
-             False, otherwise.
-    '''
-    return not hyperlink.startswith(PREFIX_TO_FOLLOW)
-
-
 def is_link_visited(hyperlink):
     '''
     :param hyperlink: hyperlink
@@ -106,54 +201,24 @@ def is_link_visited(hyperlink):
              presented in the frontier.
              False, otherwise.
     '''
-    return hyperlink in visited
-
-
-def is_link_administrative(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link is administrative
-             i.e. contains ':'
-             False, otherwise.
-    '''
-    return hyperlink.count(":") > 1
+    return hyperlink in visited or hyperlink in frontier
 
 
-def is_link_for_page_section(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link of page section
-             i.e. starts with #.
-             False, otherwise.
-    '''
-    return hyperlink.startswith("#")
-
-
-def is_link_pointing_to_english_article(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link of english article
-             i.e. of the form "en.wikipedia".
-             False, otherwise.
-    '''
-    return hyperlink.count("en.wikipedia") > 0
-
-
-def should_explore_link(hyperlink, anchor_text=None, keyword=None):
+def should_explore_link(hyperlink, anchor_text=None, keyword=None, keyword_satisfied=None):
     '''
     check to see if the link should be explored.
     :param hyperlink: hyperlink
     :param anchor_text: anchor_text
     :param keyword: keyword
+    :param keyword_satisfied: result of is_keyword_satisfied if already known
+                              i.e. from get_keyword_match_flags, None otherwise
     :return: True, if the link should be explored,
              False, otherwise.
     '''
-    return not (is_link_external(hyperlink)
-                or is_link_visited(hyperlink)
-                or is_link_administrative(hyperlink)
-                or is_link_for_page_section(hyperlink)) \
-           and is_link_pointing_to_english_article(hyperlink) \
-           and (is_keyword_satisfied(hyperlink, anchor_text, keyword)
+    return url_filter(hyperlink) \
+           and not is_link_visited(hyperlink) \
+           and ((keyword_satisfied if keyword_satisfied is not None
+                 else is_keyword_satisfied(hyperlink, anchor_text, keyword))
                 or is_compound_keyword(anchor_text, keyword)
                 or is_compound_keyword(hyperlink, keyword))
 
@@ -179,24 +244,90 @@ def is_keyword_satisfied(hyperlink, anchor_text, keyword):
                or is_hyper_link_satisfied_keyword(hyperlink, keyword)
     return True
 
-def does_text_satisfied_keyword(text, keyword):
+def get_keyword_matcher(keyword):
     '''
+    :param keyword: keyword
+    :return: KeywordMatcher of the keyword, compiled once per crawl.
+    '''
+    global keyword_matcher
+    if keyword_matcher is None or keyword_matcher.keyword != keyword.lower():
+        keyword_matcher = KeywordMatcher(keyword, stemmer.stem, english_words_set)
+    return keyword_matcher
 
+
+def does_text_satisfied_keyword(text, keyword):
+    '''
+    A text satisfies the keyword if one of its tokens stems to the
+    keyword or to a compound of the keyword, see KeywordMatcher.
     :param anchor_text: anchor_text
     :param keyword: keyword
     :return: True if the anchor text matches keyword,
              False, otherwise.
     '''
-    for token in re.findall(r"[a-zA-Z']+", text):
-        try:
-            stemmed_text = stemmer.stem(token)
-        except:
-            print("Token:"+token)
-            continue
+    return get_keyword_matcher(keyword).is_matching(text)
+
 
-        if stemmed_text == keyword or is_compound_keyword(stemmed_text, keyword):
-            return True
-    return False
+def get_keyword_match_flags(discovered_hyperlinks, keyword):
+    '''
+    Matches the anchor texts and the hyperlinks of all the links
+    of a page against the keyword with one regex pass over them.
+    :param discovered_hyperlinks: list of (anchor text, hyperlink)
+    :param keyword: keyword
+    :return: list of (<anchor text matches>, <hyperlink matches>), one per link,
+             is_keyword_satisfied of a link is true if either matches.
+    '''
+    if keyword is None:
+        return [(True, True)] * len(discovered_hyperlinks)
+    matching = get_keyword_matcher(keyword).match_all(
+        [anchor_text for anchor_text, hyperlink in discovered_hyperlinks] +
+        [hyperlink for anchor_text, hyperlink in discovered_hyperlinks])
+    link_count = len(discovered_hyperlinks)
+    return [(matching[i], matching[link_count + i]) for i in range(link_count)]
+
+
+def get_page_relevance(html_content_body, keyword):
+    '''
+    :param html_content_body: the content div element of the page
+    :param keyword: keyword
+    :return: relevance of the page between 0 and 1, the fraction of
+             RELEVANT_PAGE_MATCH_COUNT tokens matching the keyword its content has.
+    '''
+    if keyword is None:
+        return 1
+    match_count = get_keyword_matcher(keyword).count_matches(html_content_body.get_text(" "))
+    return min(match_count, RELEVANT_PAGE_MATCH_COUNT) / RELEVANT_PAGE_MATCH_COUNT
+
+
+def is_page_relevance_needed():
+    '''
+    :return: True if the relevance of the fetched pages is computed i.e.
+             BEST_FIRST_ENABLED or HARVEST_RATE_ENABLED is set, False, otherwise.
+    '''
+    return BEST_FIRST_ENABLED or HARVEST_RATE_ENABLED
+
+
+def get_link_score(anchor_text_matching, hyperlink_matching, parent_relevance, depth):
+    '''
+    :param anchor_text_matching: True if the anchor text matches the keyword
+    :param hyperlink_matching: True if the hyperlink matches the keyword
+    :param parent_relevance: relevance of the page the link was found on
+    :param depth: depth of the link
+    :return: score of the link for the best-first frontier, see BEST_FIRST_ENABLED.
+    '''
+    if anchor_text_matching:
+        match_score = ANCHOR_MATCH_WEIGHT
+    elif hyperlink_matching:
+        match_score = HYPERLINK_MATCH_WEIGHT
+    else:
+        match_score = 0
+    return match_score + PARENT_RELEVANCE_WEIGHT * parent_relevance - DEPTH_PENALTY * depth
+
+
+def get_harvest_rate():
+    '''
+    :return: relevant pages per page fetched.
+    '''
+    return relevant_page_count / fetched_page_count if fetched_page_count > 0 else 0
 
 
 def is_anchor_text_satisfied_keyword(anchor_text, keyword):
@@ -241,7 +372,7 @@ def format_hyperlink(hyperlink):
     :return:
             if the relative link start with "/wiki/"
             the function converts relative hyperlink to absolute
-            with addition of "https://en.wikipedia.org".
+            with addition of site_url e.g. "https://en.wikipedia.org".
             It also returns anchor text of the hyperlink.
 
             if the relative link doesn't start with "/wiki/"
@@ -250,7 +381,7 @@ def format_hyperlink(hyperlink):
     '''
     url = hyperlink['href']
     if url.startswith("/wiki/"):
-        return hyperlink.getText(), "https://en.wikipedia.org" + url
+        return hyperlink.getText(), site_url + url
     return hyperlink.getText(), url
 
 
@@ -278,68 +409,292 @@ def is_compound_keyword(compound_keyword, keyword):
 
 
 
+def get_hyperlink_to_crawl(frontier_item):
+    '''
+    :param frontier_item: frontier_item
+    :return: URL of the frontier item with the '#' part truncated.
+    '''
+    return truncate_fragment(frontier_item[FRONTIER_ITEM_URL_INDEX])
+
+
+def truncate_fragment(hyperlink):
+    '''
+    :param hyperlink: hyperlink
+    :return: the hyperlink with the '#' part truncated.
+    '''
+    return hyperlink if hyperlink.find('#')==-1 else hyperlink[:hyperlink.find('#')]
+
+
+def fetch_page(hyperlink):
+    '''
+    Fetches the hyperlink, reporting how the host responded to the host scheduler.
+    :param hyperlink: hyperlink
+    :return: FetchResult of the hyperlink.
+    '''
+    return fetch_with_backoff(fetch_page_from_backend, hyperlink, host_scheduler)
+
+
+def fetch_page_from_backend(hyperlink):
+    '''
+    Fetches the hyperlink, from the fetch archive if FETCH_ARCHIVE_MODE is set.
+    :param hyperlink: hyperlink
+    :return: FetchResult of the hyperlink.
+    '''
+    if fetch_archive_backend is not None:
+        return fetch_archive_backend.fetch(hyperlink)
+    return fetch_page_from_network(hyperlink)
+
+
+def fetch_page_from_network(hyperlink):
+    '''
+    Fetches the hyperlink, over the keep-alive HTTP connection pool if enabled.
+    :param hyperlink: hyperlink
+    :return: FetchResult of the hyperlink.
+    '''
+    if http_connection_pool is not None:
+        return http_connection_pool.fetch(hyperlink)
+    return blocking_fetch(hyperlink)
+
+
+def fetch_robots_txt(robots_url):
+    '''
+    Fetches a robots.txt in a politeness slot of its host, as any other page of the host.
+    :param robots_url: URL of the robots.txt
+    :return: FetchResult of the robots.txt.
+    '''
+    time.sleep(host_scheduler.reserve_slot(get_host(robots_url)))
+    return fetch_page_from_backend(robots_url)
+
+
+def is_allowed_by_robots(hyperlink):
+    '''
+    :param hyperlink: hyperlink
+    :return: True if ROBOTS_TXT_ENABLED is not set or robots.txt allows crawling the hyperlink,
+             False, otherwise.
+    '''
+    return robots_cache is None or robots_cache.can_fetch(hyperlink)
+
+
+async def load_robots_rules(parsed_page):
+    '''
+    Fetches the robots.txt of the hosts the links of the page point to
+    that were not fetched yet, in the default executor, so the lookups
+    of crawl_fetched_page do not block the event loop.
+    :param parsed_page: the page as returned by parse_page
+    :return: None
+    '''
+    if robots_cache is None:
+        return
+    loop = asyncio.get_event_loop()
+    for anchor_text, discovered_hyperlink in parsed_page[1]:
+        if url_filter(discovered_hyperlink) and not robots_cache.has_rules(discovered_hyperlink):
+            await loop.run_in_executor(None, robots_cache.get_rules, discovered_hyperlink)
+
+
+def create_fetch_archive_backend():
+    '''
+    :return: RecordingFetcher or ReplayFetcher of FETCH_ARCHIVE_MODE,
+             None, if it is not set.
+    '''
+    if FETCH_ARCHIVE_MODE == "record":
+        return RecordingFetcher(fetch_page_from_network, FETCH_ARCHIVE_DIRECTORY)
+    if FETCH_ARCHIVE_MODE == "replay":
+        return ReplayFetcher(FETCH_ARCHIVE_DIRECTORY, REPLAY_LATENCY_IN_SEC, REPLAY_LATENCY_JITTER_IN_SEC)
+    return None
+
+
+def parse_page(raw_html):
+    '''
+    :param raw_html: raw html of the page
+    :return: tuple (<content div element>, <list of (anchor text, hyperlink) of the links in it>),
+             relative links made absolute, the element is None and the list empty if
+             the page has no content section e.g. a redirect off the site.
+    '''
+    html_content_body = get_content_body(BeautifulSoup(raw_html))
+    if html_content_body is None:
+        return None, []
+    return html_content_body, [format_hyperlink(discovered_hyperlink)
+                               for discovered_hyperlink in html_content_body.find_all('a', href=True)]
+
+
+def crawl_fetched_page(frontier_item, hyperlink, final_url, parsed_page, new_depth, keyword=None):
+    '''
+    Commits a fetched page: marks it visited, documents it and
+    adds the links discovered in its content section to the frontier.
+    :param frontier_item: frontier_item the page was fetched for
+    :param hyperlink: hyperlink that was fetched
+    :param final_url: URL after redirects
+    :param parsed_page: the page as returned by parse_page
+    :param new_depth: True if the page starts a new depth
+    :param keyword: keyword
+    :return: True if the page was committed,
+             False, if it was dropped i.e. redirect to a link that should not be explored.
+    '''
+    global fetched_page_count, relevant_page_count
+    anchor_text = frontier_item[FRONTIER_ITEM_ANCHOR_TEXT_INDEX]
+    depth = frontier_item[FRONTIER_ITEM_DEPTH_INDEX]
+    fetched_page_count += 1
+
+    # to handle redirects
+    if not should_explore_link(final_url):
+        return False
+
+    # put link in visited
+    visited.add(hyperlink)
+    print("count:" + str(len(visited)) + " " + "depth:" + str(depth))
+
+    # content section HTML and the links in it, links to sections of a page
+    # are links to the page, matched, queued and scored as one frontier item
+    html_content_body, discovered_hyperlinks = parsed_page
+    discovered_hyperlinks = [(anchor_text, truncate_fragment(discovered_hyperlink))
+                             for anchor_text, discovered_hyperlink in discovered_hyperlinks]
+
+    if is_page_relevance_needed():
+        page_relevance = get_page_relevance(html_content_body, keyword)
+        if page_relevance == 1:
+            relevant_page_count += 1
+
+    # Document the visited link
+    document_link_and_content(len(visited), anchor_text, hyperlink, depth, new_depth, html_content_body)
+
+    keyword_match_flags = get_keyword_match_flags(discovered_hyperlinks, keyword)
+
+    # best-first links are never popped past the maximum depth, so they are not queued
+    if BEST_FIRST_ENABLED and depth + 1 > MAXIMUM_CRAWL_DEPTH:
+        return True
+
+    for (anchor_text, discovered_hyperlink), (anchor_text_matching, hyperlink_matching) \
+            in zip(discovered_hyperlinks, keyword_match_flags):
+        # best-first scores the links instead of filtering them by the keyword
+        keyword_satisfied = BEST_FIRST_ENABLED or anchor_text_matching or hyperlink_matching
+
+        # check to see if the links should be explored
+        if should_explore_link(discovered_hyperlink, anchor_text, keyword, keyword_satisfied) \
+                and is_allowed_by_robots(discovered_hyperlink):
+            # if yes add the link to frontier, unscored unless best-first
+            link_score = get_link_score(anchor_text_matching, hyperlink_matching, page_relevance, depth + 1) \
+                if BEST_FIRST_ENABLED else 0
+            frontier.add((anchor_text, discovered_hyperlink, depth + 1, link_score))
+
+        elif BEST_FIRST_ENABLED and discovered_hyperlink in frontier:
+            # a queued link keeps the highest score it is found with
+            frontier.add((anchor_text, discovered_hyperlink, depth + 1,
+                          get_link_score(anchor_text_matching, hyperlink_matching, page_relevance, depth + 1)))
+    return True
+
+
 def internal_start_crawling(keyword=None):
 
     current_depth = 1
 
-    previous_visit_time = 0
-
     # get a frontier_item from frontier
-    for frontier_item in frontier:
+    while len(frontier) > 0:
+
+        frontier_item = frontier.pop()
 
         # terminate crawling
         if should_stop_crawling(frontier_item):
             return
 
         # Get all the required data from a frontier item
-        anchor_text = frontier_item[FRONTIER_ITEM_ANCHOR_TEXT_INDEX]
-        hyperlink = frontier_item[FRONTIER_ITEM_URL_INDEX]
         depth = frontier_item[FRONTIER_ITEM_DEPTH_INDEX]
 
-        hyperlink = hyperlink if hyperlink.find('#')==-1 else hyperlink[:hyperlink.find('#')]
+        hyperlink = get_hyperlink_to_crawl(frontier_item)
 
         # check to see if the hyperlink should be crawled.
         if should_explore_link(hyperlink):
 
-            # politeness check                                      #time already elapsed
-            time_to_sleep = POLITENESS_POLICY_DELAY_IN_SEC - (time.clock() - previous_visit_time)
-            time.sleep(0 if time_to_sleep < 0 else time_to_sleep)
-
-            # make note time
-            previous_visit_time = time.clock()
+            # politeness check, per host
+            time.sleep(host_scheduler.reserve_slot(get_host(hyperlink)))
 
             # open the link
-            http_response = request.urlopen(hyperlink);
+            fetch_result = fetch_page(hyperlink)
 
-            # to handle redirects
-            if not should_explore_link(http_response.geturl()):
-                continue;
+            if crawl_fetched_page(frontier_item, hyperlink, fetch_result.final_url, parse_page(fetch_result.body),
+                                  current_depth != depth, keyword):
+                current_depth = depth
 
-            # put link in visited
-            visited.add(hyperlink)
-            print("count:" + str(len(visited)) + " " + "depth:" + str(depth))
 
-            # Get only content section HTML
-            html_content_body = get_content_body(BeautifulSoup(http_response.read()))
+def prefetch_frontier(fetcher):
+    '''
+    Schedules fetches for the frontier items that are going to be crawled
+    next, keeping at most MAX_IN_FLIGHT_REQUESTS fetches pending and never
+    fetching past the crawl budget.
+    :param fetcher: AsyncFetcher
+    :return: None
+    '''
+    budget = min(MAX_IN_FLIGHT_REQUESTS, UNIQUE_URL_THRESHOLD - len(visited))
+    for frontier_item in frontier.peek(MAX_IN_FLIGHT_REQUESTS):
+        if fetcher.pending_count() >= budget or frontier_item[FRONTIER_ITEM_DEPTH_INDEX] > MAXIMUM_CRAWL_DEPTH:
+            return
+        hyperlink = get_hyperlink_to_crawl(frontier_item)
+        # a queued URL is never visited, so it only needs checking when '#' was truncated
+        if hyperlink == frontier_item[FRONTIER_ITEM_URL_INDEX] or should_explore_link(hyperlink):
+            fetcher.schedule(hyperlink)
+
+
+async def internal_start_crawling_async(keyword=None):
+    '''
+    Same crawl as internal_start_crawling, but keeps up to
+    MAX_IN_FLIGHT_REQUESTS frontier items downloading ahead of the
+    one being committed. Pages are still committed in frontier order,
+    so visited and the output files match the serial crawl.
+    '''
+    fetcher = AsyncFetcher(POLITENESS_POLICY_DELAY_IN_SEC, MAX_IN_FLIGHT_REQUESTS, fetch_page,
+                           politeness_policy=host_scheduler)
+    current_depth = 1
+    try:
+        while len(frontier) > 0:
+            frontier_item = frontier.pop()
 
-            # Document the visited link
-            document_link_and_content(len(visited), anchor_text, hyperlink, depth, current_depth != depth, html_content_body)
+            # terminate crawling
+            if should_stop_crawling(frontier_item):
+                return
 
-            current_depth = depth
+            depth = frontier_item[FRONTIER_ITEM_DEPTH_INDEX]
+            hyperlink = get_hyperlink_to_crawl(frontier_item)
 
-            # Get all the hyper links in the content section
-            for discovered_hyperlink in html_content_body.find_all('a', href=True):
-                # format relative links to absolute links and get anchor text
-                anchor_text, discovered_hyperlink = format_hyperlink(discovered_hyperlink)
+            # check to see if the hyperlink should be crawled.
+            if should_explore_link(hyperlink):
+                prefetch_frontier(fetcher)
+                fetch_result = await fetcher.result(hyperlink)
+                parsed_page = parse_page(fetch_result.body)
+                await load_robots_rules(parsed_page)
 
-                # check to see if the links should be explored
-                if should_explore_link(discovered_hyperlink, anchor_text, keyword):
-                    # if yes add the link to frontier
-                    frontier.append((anchor_text, discovered_hyperlink, depth + 1))
+                if crawl_fetched_page(frontier_item, hyperlink, fetch_result.final_url, parsed_page,
+                                      current_depth != depth, keyword):
+                    current_depth = depth
+    finally:
+        await fetcher.close()
 
 
 if __name__ == '__main__':
-    start = time.clock()
+    args = set(sys.argv)
+    ASYNC_FETCH_ENABLED = "-async" in args
+    HTTP_POOL_ENABLED = "-httpPool" in args
+    ROBOTS_TXT_ENABLED = "-robots" in args
+    ADAPTIVE_POLITENESS_ENABLED = "-adaptivePoliteness" in args
+    BEST_FIRST_ENABLED = "-bestFirst" in args
+    HARVEST_RATE_ENABLED = "-harvestRate" in args
+    if BEST_FIRST_ENABLED:
+        frontier = PriorityFrontier(FRONTIER_ITEM_URL_INDEX, lambda x: -x[FRONTIER_ITEM_SCORE_INDEX])
+    if "-record" in args:
+        FETCH_ARCHIVE_MODE = "record"
+    if "-replay" in args:
+        FETCH_ARCHIVE_MODE = "replay"
+    for arg in sys.argv:
+        if arg.startswith("-replayLatency="):
+            REPLAY_LATENCY_IN_SEC = float(arg[len("-replayLatency="):])
+    # crawl another site e.g. a local fixture server -prefixToFollow=http://127.0.0.1:8001/wiki
+    for arg in sys.argv:
+        if arg.startswith("-prefixToFollow="):
+            PREFIX_TO_FOLLOW = arg[len("-prefixToFollow="):]
+    for arg in sys.argv:
+        if arg.startswith("-politenessDelay="):
+            POLITENESS_POLICY_DELAY_IN_SEC = float(arg[len("-politenessDelay="):])
+    for arg in sys.argv:
+        if arg.startswith("-maxPages="):
+            UNIQUE_URL_THRESHOLD = int(arg[len("-maxPages="):])
+    start = time.perf_counter()
     start_crawling(sys.argv[1], sys.argv[2])
-    print("Time taken:"+str(time.clock() - start))
-
+    print("Time taken:"+str(time.perf_counter() - start))
@@ -0,0 +1,218 @@
+import asyncio
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib import request
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+
+from crawler.instrumentation import BODY_STAGE, POLITENESS_STAGE, TTFB_STAGE
+
+# Default number of requests kept in flight at any time.
+DEFAULT_MAX_IN_FLIGHT = 8
+
+# Result of a fetch.
+# URL : the URL that was requested.
+# FINAL_URL : the URL after redirects i.e. http_response.geturl()
+# BODY : raw bytes of the response body.
+FetchResult = collections.namedtuple("FetchResult", ["url", "final_url", "body"])
+
+# Content types of a response that can hold the content section of a page.
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+# Bytes read at once from a response whose body size is bounded.
+BODY_READ_CHUNK_SIZE = 64 * 1024
+
+# Statuses of the HTTPError raised for a response given up on by read_body.
+BODY_TOO_LARGE_STATUS = 413
+NOT_HTML_STATUS = 415
+REJECTED_BODY_STATUSES = (BODY_TOO_LARGE_STATUS, NOT_HTML_STATUS)
+
+
+def get_host(hyperlink):
+    '''
+    :param hyperlink: hyperlink
+    :return: host (with port) the hyperlink points to.
+    '''
+    return urlsplit(hyperlink).netloc
+
+
+def get_body_too_large_error(hyperlink, http_response, max_body_size):
+    return HTTPError(hyperlink, BODY_TOO_LARGE_STATUS, "Body larger than " + str(max_body_size) + " bytes",
+                     http_response.headers, None)
+
+
+def read_body(http_response, hyperlink, max_body_size=None, html_only=False):
+    '''
+    Reads the body of a response in chunks, giving up on it as soon as
+    it is known to be larger than max_body_size, from its Content-Length
+    or once more bytes were read, and if html_only, before reading it if
+    its Content-Type is not HTML.
+    :param http_response: http.client or urllib response
+    :param hyperlink: URL of the response
+    :param max_body_size: maximum size of the body in bytes, None for no limit
+    :param html_only: True to give up on responses that are not HTML
+    :return: body of the response, raises urllib.error.HTTPError with
+             BODY_TOO_LARGE_STATUS or NOT_HTML_STATUS if it was given up on.
+    '''
+    content_type = http_response.getheader("Content-Type")
+    if html_only and content_type is not None and \
+            content_type.split(";")[0].strip().lower() not in HTML_CONTENT_TYPES:
+        raise HTTPError(hyperlink, NOT_HTML_STATUS, "Not HTML: " + content_type, http_response.headers, None)
+    if max_body_size is None:
+        return http_response.read()
+
+    content_length = http_response.getheader("Content-Length")
+    if content_length is not None and content_length.strip().isdigit() and int(content_length) > max_body_size:
+        raise get_body_too_large_error(hyperlink, http_response, max_body_size)
+    chunks = []
+    body_size = 0
+    while True:
+        chunk = http_response.read(min(BODY_READ_CHUNK_SIZE, max_body_size + 1 - body_size))
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+        body_size += len(chunk)
+        if body_size > max_body_size:
+            raise get_body_too_large_error(hyperlink, http_response, max_body_size)
+
+
+def blocking_fetch(hyperlink, metrics=None, max_body_size=None, html_only=False):
+    '''
+    Fetches the hyperlink using urllib.
+    :param hyperlink: hyperlink
+    :param metrics: CrawlMetrics to record the time to first byte (DNS and
+                    connect included, urllib does not report them) and body time
+    :param max_body_size: maximum size of the body in bytes, None for no limit, see read_body
+    :param html_only: True to give up on responses that are not HTML, see read_body
+    :return: FetchResult of the hyperlink.
+    '''
+    start = time.perf_counter()
+    http_response = request.urlopen(hyperlink)
+    try:
+        headers_time = time.perf_counter()
+        body = read_body(http_response, http_response.geturl(), max_body_size, html_only)
+        if metrics is not None:
+            metrics.record(TTFB_STAGE, headers_time - start)
+            metrics.record(BODY_STAGE, time.perf_counter() - headers_time)
+        return FetchResult(hyperlink, http_response.geturl(), body)
+    finally:
+        http_response.close()
+
+
+def get_time_until(slot):
+    '''
+    :param slot: time.monotonic() time
+    :return: seconds left until the slot, 0 if it has passed.
+    '''
+    return max(0.0, slot - time.monotonic())
+
+
+class HostPolitenessPolicy:
+    '''
+    Hands out request slots per host so that two requests to the
+    same host start at least politeness_delay seconds apart.
+    Requests to different hosts do not wait for each other.
+    '''
+
+    def __init__(self, politeness_delay):
+        self.politeness_delay = politeness_delay
+        self.next_slot_by_host = dict()
+
+    def get_delay(self, host):
+        return self.politeness_delay
+
+    def reserve_slot_time(self, host):
+        '''
+        Reserves the next free slot for the host.
+        :param host: host
+        :return: time.monotonic() time at which the request may be sent.
+        '''
+        now = time.monotonic()
+        slot = max(now, self.next_slot_by_host.get(host, now))
+        self.next_slot_by_host[host] = slot + self.get_delay(host)
+        return slot
+
+    def reserve_slot(self, host):
+        '''
+        Reserves the next free slot for the host.
+        :param host: host
+        :return: seconds to wait before the request may be sent.
+        '''
+        return get_time_until(self.reserve_slot_time(host))
+
+    async def wait(self, host):
+        '''
+        Waits for the next free slot of the host.
+        :param host: host
+        :return: seconds waited.
+        '''
+        delay = self.reserve_slot(host)
+        await asyncio.sleep(delay)
+        return delay
+
+
+class AsyncFetcher:
+    '''
+    Keeps up to max_in_flight fetches running concurrently on an
+    asyncio event loop, applying the politeness delay per host.
+
+    Fetches are started with schedule() in the order the crawler
+    wants them and collected with result(), so the crawler is free
+    to commit pages in frontier order while later pages download.
+    Given a CrawlMetrics, the politeness wait of every fetch is recorded.
+    '''
+
+    def __init__(self, politeness_delay, max_in_flight=DEFAULT_MAX_IN_FLIGHT, fetch=blocking_fetch,
+                 politeness_policy=None, metrics=None):
+        self.politeness_policy = politeness_policy or HostPolitenessPolicy(politeness_delay)
+        self.metrics = metrics
+        self.max_in_flight = max_in_flight
+        self.fetch = fetch
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.tasks = dict()
+
+    def is_scheduled(self, hyperlink):
+        return hyperlink in self.tasks
+
+    def pending_count(self):
+        return len(self.tasks)
+
+    def schedule(self, hyperlink):
+        '''
+        Starts fetching the hyperlink in the background,
+        unless it is already being fetched.
+        :param hyperlink: hyperlink
+        :return: None
+        '''
+        if hyperlink not in self.tasks:
+            self.tasks[hyperlink] = asyncio.ensure_future(self.internal_fetch(hyperlink))
+
+    async def internal_fetch(self, hyperlink):
+        politeness_wait = await self.politeness_policy.wait(get_host(hyperlink))
+        if self.metrics is not None:
+            self.metrics.record(POLITENESS_STAGE, politeness_wait)
+        async with self.in_flight:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self.executor, self.fetch, hyperlink)
+
+    async def result(self, hyperlink):
+        '''
+        Waits for the fetch of the hyperlink, scheduling it first if needed.
+        :param hyperlink: hyperlink
+        :return: FetchResult of the hyperlink, raises the fetch error if any.
+        '''
+        self.schedule(hyperlink)
+        return await self.tasks.pop(hyperlink)
+
+    async def close(self):
+        '''
+        Cancels fetches that were scheduled but never collected.
+        :return: None
+        '''
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks.clear()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,111 @@
+import os
+import re
+from urllib.parse import quote, urlsplit, urlunsplit
+
+# Characters left as they are in the path and query, '%' keeps the existing escapes.
+SAFE_CHARACTERS = "!#$%&'()*+,/:;=?@[]~"
+
+UNRESERVED_CHARACTERS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+PERCENT_ESCAPE_REGEX = re.compile("%([0-9A-Fa-f]{2})")
+
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+# Redirects followed by resolve, a longer chain is cut short.
+MAX_REDIRECT_HOPS = 5
+
+REDIRECT_DELIMITER = " "
+
+
+def normalize_escape(match):
+    character = chr(int(match.group(1), 16))
+    return character if character in UNRESERVED_CHARACTERS else "%" + match.group(1).upper()
+
+
+def normalize_percent_encoding(component):
+    '''
+    :param component: path or query of a URL
+    :return: the component with non-ASCII characters and spaces escaped, escaped
+             unreserved characters unescaped and the other escapes in upper case.
+    '''
+    return PERCENT_ESCAPE_REGEX.sub(normalize_escape, quote(component, safe=SAFE_CHARACTERS))
+
+
+def canonicalize_url(hyperlink):
+    '''
+    :param hyperlink: absolute hyperlink, other hyperlinks are returned as they are
+    :return: canonical form of the hyperlink: lower case scheme and host, no default
+             port, no fragment, no trailing slash and normalized percent-encoding.
+    '''
+    scheme, netloc, path, query, fragment = urlsplit(hyperlink)
+    if not scheme or not netloc:
+        return hyperlink
+    scheme = scheme.lower()
+    netloc = netloc.lower()
+    if netloc.endswith(DEFAULT_PORTS.get(scheme, "\0")):
+        netloc = netloc[:-len(DEFAULT_PORTS[scheme])]
+    path = normalize_percent_encoding(path).rstrip("/") or "/"
+    return urlunsplit((scheme, netloc, path, normalize_percent_encoding(query), ""))
+
+
+class CanonicalUrlMap:
+    '''
+    Maps every hyperlink to one canonical URL: its canonical form, or the
+    canonical form of the URL it is known to redirect to, both found with
+    dict lookups so links are resolved before they are fetched.
+
+    Redirects are appended to the map file, one "<source> <target>" line
+    each, so later crawls know them without fetching the sources again.
+    '''
+
+    def __init__(self, map_file_name=None):
+        '''
+        :param map_file_name: file the redirects are loaded from and appended to,
+                              None to keep them in memory only
+        '''
+        self.redirects = dict()
+        self.map_file = None
+        if map_file_name is not None:
+            if os.path.exists(map_file_name):
+                with open(map_file_name, 'r', encoding="utf-8") as map_file:
+                    for line in map_file:
+                        redirect = line.split()
+                        # a line cut short by a crash is skipped
+                        if len(redirect) == 2:
+                            self.redirects[redirect[0]] = redirect[1]
+            self.map_file = open(map_file_name, 'a', encoding="utf-8")
+
+    def __len__(self):
+        return len(self.redirects)
+
+    def resolve(self, hyperlink):
+        '''
+        :param hyperlink: hyperlink
+        :return: canonical URL of the hyperlink.
+        '''
+        canonical_url = canonicalize_url(hyperlink)
+        for hop in range(MAX_REDIRECT_HOPS):
+            if canonical_url not in self.redirects:
+                break
+            canonical_url = self.redirects[canonical_url]
+        return canonical_url
+
+    def add_redirect(self, hyperlink, final_url):
+        '''
+        Records that the hyperlink redirects to final_url.
+        :param hyperlink: requested hyperlink
+        :param final_url: URL after redirects
+        :return: canonical URL of final_url.
+        '''
+        source = canonicalize_url(hyperlink)
+        target = self.resolve(final_url)
+        if source != target and self.redirects.get(source) != target:
+            self.redirects[source] = target
+            if self.map_file is not None:
+                self.map_file.write(source + REDIRECT_DELIMITER + target + "\n")
+                self.map_file.flush()
+        return target
+
+    def close(self):
+        if self.map_file is not None:
+            self.map_file.close()
@@ -0,0 +1,28 @@
+import os
+import pickle
+
+
+def write_checkpoint(checkpoint_file_name, crawl_state):
+    '''
+    Writes the crawl state to the checkpoint file. The state is written to
+    a temporary file first and then renamed over the checkpoint, so a crash
+    while checkpointing leaves the previous checkpoint intact.
+    :param checkpoint_file_name: checkpoint file name
+    :param crawl_state: dict of everything needed to resume the crawl
+    :return: None
+    '''
+    temporary_file_name = checkpoint_file_name + ".tmp"
+    with open(temporary_file_name, 'wb') as checkpoint_file:
+        pickle.dump(crawl_state, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(temporary_file_name, checkpoint_file_name)
+
+
+def read_checkpoint(checkpoint_file_name):
+    '''
+    :param checkpoint_file_name: checkpoint file name
+    :return: the crawl state written by write_checkpoint.
+    '''
+    with open(checkpoint_file_name, 'rb') as checkpoint_file:
+        return pickle.load(checkpoint_file)
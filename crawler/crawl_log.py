@@ -0,0 +1,134 @@
+import os
+import queue
+import threading
+import time
+
+# A batch is written once this many bytes are buffered ...
+DEFAULT_FLUSH_SIZE = 64 * 1024
+
+# ... or the oldest buffered line is this old.
+DEFAULT_FLUSH_INTERVAL_IN_SEC = 1.0
+
+
+class CrawlLogWriter:
+    '''
+    Buffered writer of a crawl log e.g. the links file. Lines are buffered
+    and written in batches, once flush_size bytes are buffered, the oldest
+    line is flush_interval seconds old, or on flush() e.g. at a checkpoint.
+
+    tell() writes the buffered lines first, so the offset it returns is
+    always the end of a complete batch. A crawl checkpoint records it and
+    a resumed crawl reopens the log truncated to it, cutting whatever
+    was written after the checkpoint, a batch torn by a crash included.
+
+    With background=True the batches are written by a writer thread, and
+    write() only queues the line, so the crawl never waits on the disk.
+    '''
+
+    def __init__(self, file_name, offset=None, flush_size=DEFAULT_FLUSH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL_IN_SEC, background=False):
+        '''
+        :param file_name: file name of the log
+        :param offset: offset returned by tell(), to resume writing a log
+                       truncated to it, None to start a new log
+        :param flush_size: bytes buffered before a batch is written
+        :param flush_interval: seconds a line may stay buffered
+        :param background: True to write the batches from a writer thread
+        '''
+        self.file_name = file_name
+        if offset is None:
+            self.log_file = open(file_name, 'wb')
+        else:
+            self.log_file = open(file_name, 'ab')
+            self.log_file.truncate(offset)
+            self.log_file.seek(0, os.SEEK_END)
+        self.offset = self.log_file.tell()
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.buffered_size = 0
+        self.oldest_line_time = None
+        self.line_queue = None
+        if background:
+            self.line_queue = queue.Queue()
+            self.writer_thread = threading.Thread(target=self.run_writer, daemon=True)
+            self.writer_thread.start()
+
+    def write(self, line):
+        if self.line_queue is not None:
+            self.line_queue.put(line)
+        else:
+            self.append(line)
+
+    def append(self, line):
+        data = line.encode("utf-8")
+        self.buffer.append(data)
+        self.buffered_size += len(data)
+        now = time.monotonic()
+        if self.oldest_line_time is None:
+            self.oldest_line_time = now
+        if self.buffered_size >= self.flush_size or now - self.oldest_line_time >= self.flush_interval:
+            self.write_batch()
+
+    def write_batch(self):
+        if not self.buffer:
+            return
+        data = b"".join(self.buffer)
+        self.log_file.write(data)
+        self.log_file.flush()
+        self.offset += len(data)
+        self.buffer = []
+        self.buffered_size = 0
+        self.oldest_line_time = None
+
+    def run_writer(self):
+        while True:
+            timeout = None
+            if self.oldest_line_time is not None:
+                timeout = max(0.0, self.oldest_line_time + self.flush_interval - time.monotonic())
+            try:
+                item = self.line_queue.get(timeout=timeout)
+            except queue.Empty:
+                self.write_batch()
+                continue
+            if item is None:
+                self.write_batch()
+                return
+            if isinstance(item, threading.Event):
+                self.write_batch()
+                item.set()
+            else:
+                self.append(item)
+
+    def pending_count(self):
+        '''
+        :return: number of lines queued for the writer thread.
+        '''
+        return self.line_queue.qsize() if self.line_queue is not None else 0
+
+    def flush(self):
+        '''
+        Writes everything written so far to the file.
+        :return: None
+        '''
+        if self.line_queue is not None:
+            flushed = threading.Event()
+            self.line_queue.put(flushed)
+            flushed.wait()
+        else:
+            self.write_batch()
+
+    def tell(self):
+        '''
+        :return: offset of the log, to resume writing from.
+        '''
+        self.flush()
+        return self.offset
+
+    def close(self):
+        if self.line_queue is not None:
+            self.line_queue.put(None)
+            self.writer_thread.join()
+        else:
+            self.write_batch()
+        self.log_file.close()
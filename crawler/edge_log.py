@@ -0,0 +1,171 @@
+import heapq
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+
+# An edge record is the in-link doc id followed by the doc id it links to,
+# both little-endian unsigned 32 bit ints, so a record read as one little-endian
+# unsigned 64 bit int is the sort key <doc id> << 32 | <in-link doc id>.
+EDGE_TYPECODE = "I"
+EDGE_KEY_TYPECODE = "Q"
+EDGE_RECORD_SIZE = 8
+
+# In-link of the record written for every crawled page, so pages
+# without in-links are in the graph too. Doc ids start from 1.
+NODE_INLINK = 0
+
+# Edges buffered before they are appended to the log.
+EDGE_BUFFER_SIZE = 4096
+
+# Edges sorted in memory at once when the graph file is written.
+SORT_RUN_SIZE = 500000
+
+# Keys read at once from a sorted run while merging the runs.
+MERGE_READ_SIZE = 8192
+
+
+class EdgeLogWriter:
+    '''
+    Append-only log of the edges of the crawl graph, written as the
+    in-links are found so the graph is not kept in memory, and a crawl
+    that dies still leaves the graph of the pages crawled until then.
+    finalize_edge_log turns the log into the adjacency graph file.
+    '''
+
+    def __init__(self, edge_log_path, offset=None):
+        '''
+        :param edge_log_path: path of the edge log
+        :param offset: offset returned by tell(), to resume writing a log
+                       truncated to it, None to start a new log
+        '''
+        if offset is None:
+            self.edge_log_file = open(edge_log_path, 'wb')
+        else:
+            self.edge_log_file = open(edge_log_path, 'ab')
+            self.edge_log_file.truncate(offset)
+            self.edge_log_file.seek(0, os.SEEK_END)
+        self.edges = array(EDGE_TYPECODE)
+
+    def write_node(self, doc_id, inlinks):
+        '''
+        Logs a crawled page with the in-links found before it was crawled.
+        :param doc_id: doc id of the page
+        :param inlinks: iterable of in-link doc ids
+        :return: None
+        '''
+        self.edges.extend((NODE_INLINK, doc_id))
+        self.write_edges(doc_id, inlinks)
+
+    def write_edges(self, doc_id, inlinks):
+        '''
+        :param doc_id: doc id of a crawled page
+        :param inlinks: iterable of doc ids linking to it
+        :return: None
+        '''
+        for inlink in inlinks:
+            self.edges.extend((inlink, doc_id))
+        if len(self.edges) >= 2 * EDGE_BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        if sys.byteorder == "big":
+            self.edges.byteswap()
+        self.edges.tofile(self.edge_log_file)
+        del self.edges[:]
+        self.edge_log_file.flush()
+
+    def tell(self):
+        '''
+        :return: offset of the log, to resume writing from.
+        '''
+        self.flush()
+        return self.edge_log_file.tell()
+
+    def close(self):
+        self.flush()
+        self.edge_log_file.close()
+
+
+def read_edge_keys(edge_log_file, edge_count):
+    '''
+    :param edge_log_file: edge log opened in binary mode
+    :param edge_count: maximum number of edges to read
+    :return: array of the sort keys of the next edges of the log, a record
+             cut short by a crash while it was written is skipped.
+    '''
+    data = edge_log_file.read(edge_count * EDGE_RECORD_SIZE)
+    keys = array(EDGE_KEY_TYPECODE)
+    keys.frombytes(data[:len(data) - len(data) % EDGE_RECORD_SIZE])
+    if sys.byteorder == "big":
+        keys.byteswap()
+    return keys
+
+
+def iterate_run(run_path):
+    with open(run_path, 'rb') as run_file:
+        while True:
+            keys = array(EDGE_KEY_TYPECODE)
+            keys.frombytes(run_file.read(MERGE_READ_SIZE * keys.itemsize))
+            if len(keys) == 0:
+                return
+            yield from keys
+
+
+def finalize_edge_log(edge_log_path, graph_file_name, run_size=SORT_RUN_SIZE, temporary_directory=None):
+    '''
+    Writes the graph file from the edge log, a line per crawled page in doc id
+    order: D<doc id> followed by its in-links, each once and in doc id order.
+
+    The log is sorted externally: runs of run_size edges are sorted and
+    deduplicated in memory and written to temporary files, then the runs
+    are merged, so memory does not grow with the size of the graph.
+    :param edge_log_path: path of the edge log, it may belong to a crawl still running
+    :param graph_file_name: graph file name
+    :param run_size: number of edges sorted in memory at once
+    :param temporary_directory: directory of the sorted runs, None for the system default
+    :return: number of pages in the graph.
+    '''
+    run_directory = tempfile.mkdtemp(prefix="edge_runs", dir=temporary_directory)
+    try:
+        run_paths = []
+        with open(edge_log_path, 'rb') as edge_log_file:
+            while True:
+                keys = read_edge_keys(edge_log_file, run_size)
+                if len(keys) == 0:
+                    break
+                run_paths.append(os.path.join(run_directory, "run-" + str(len(run_paths))))
+                with open(run_paths[-1], 'wb') as run_file:
+                    array(EDGE_KEY_TYPECODE, sorted(set(keys))).tofile(run_file)
+
+        page_count = 0
+        with open(graph_file_name, 'w', encoding="utf-8") as graph_file:
+            doc_id = None
+            inlinks = []
+            previous_key = None
+            for key in heapq.merge(*(iterate_run(run_path) for run_path in run_paths)):
+                # runs are deduplicated, an edge can still be in several of them
+                if key == previous_key:
+                    continue
+                previous_key = key
+                if key >> 32 != doc_id:
+                    if doc_id is not None:
+                        graph_file.write("D" + str(doc_id) + " " + " ".join(inlinks) + "\n")
+                        page_count += 1
+                    doc_id = key >> 32
+                    inlinks = []
+                if key & 0xFFFFFFFF != NODE_INLINK:
+                    inlinks.append("D" + str(key & 0xFFFFFFFF))
+            if doc_id is not None:
+                graph_file.write("D" + str(doc_id) + " " + " ".join(inlinks) + "\n")
+                page_count += 1
+        return page_count
+    finally:
+        shutil.rmtree(run_directory)
+
+
+if __name__ == '__main__':
+    # write the graph of a crawl from its edge log, e.g. one that was interrupted:
+    # python -m crawler.edge_log <edge log> <graph file>
+    print(str(finalize_edge_log(sys.argv[1], sys.argv[2])) + " pages")
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import random
+import time
+import zlib
+from urllib.error import HTTPError
+
+from crawler.async_fetcher import FetchResult
+from crawler.instrumentation import TTFB_STAGE
+
+
+def get_archive_path(archive_directory, hyperlink):
+    return os.path.join(archive_directory, hashlib.sha1(hyperlink.encode("utf-8")).hexdigest())
+
+
+def write_archived_response(archive_directory, hyperlink, final_url, status, reason, body):
+    '''
+    Archives one response: a JSON header line followed by the zlib compressed body.
+    :return: None
+    '''
+    header = json.dumps({"url": hyperlink, "final_url": final_url, "status": status, "reason": reason})
+    temporary_path = get_archive_path(archive_directory, hyperlink) + ".tmp"
+    with open(temporary_path, 'wb') as archive_file:
+        archive_file.write(header.encode("utf-8") + b"\n")
+        archive_file.write(zlib.compress(body))
+    os.replace(temporary_path, get_archive_path(archive_directory, hyperlink))
+
+
+def read_archived_response(archive_directory, hyperlink):
+    '''
+    :return: dict with "url", "final_url", "status", "reason" and "body",
+             None, if the hyperlink is not archived.
+    '''
+    try:
+        with open(get_archive_path(archive_directory, hyperlink), 'rb') as archive_file:
+            archived_response = json.loads(archive_file.readline().decode("utf-8"))
+            archived_response["body"] = zlib.decompress(archive_file.read())
+            return archived_response
+    except FileNotFoundError:
+        return None
+
+
+class RecordingFetcher:
+    '''
+    Fetch backend that fetches with another backend and archives every
+    response, error statuses included, for ReplayFetcher to serve.
+    '''
+
+    def __init__(self, fetch, archive_directory):
+        '''
+        :param fetch: fetch backend, a function of the hyperlink returning a FetchResult
+        :param archive_directory: directory of the archive
+        '''
+        self.fetch_from_backend = fetch
+        self.archive_directory = archive_directory
+        os.makedirs(archive_directory, exist_ok=True)
+
+    def fetch(self, hyperlink):
+        try:
+            fetch_result = self.fetch_from_backend(hyperlink)
+        except HTTPError as http_error:
+            write_archived_response(self.archive_directory, hyperlink, http_error.geturl(),
+                                    http_error.code, str(http_error.reason), b"")
+            raise
+        write_archived_response(self.archive_directory, hyperlink, fetch_result.final_url, 200, "OK",
+                                fetch_result.body)
+        return fetch_result
+
+
+class ReplayFetcher:
+    '''
+    Fetch backend serving the responses archived by RecordingFetcher,
+    after a simulated latency of latency +/- latency_jitter seconds.
+    The jitter of a URL only depends on the URL and the seed, so a
+    replayed crawl takes the same time whatever order it fetches in.
+    '''
+
+    def __init__(self, archive_directory, latency=0.0, latency_jitter=0.0, seed=0, metrics=None):
+        '''
+        :param archive_directory: directory of the archive
+        :param latency: simulated latency in seconds
+        :param latency_jitter: maximum deviation from latency in seconds
+        :param seed: seed of the jitter
+        :param metrics: CrawlMetrics to record the simulated latency as time to first byte
+        '''
+        self.archive_directory = archive_directory
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.seed = seed
+        self.metrics = metrics
+
+    def get_latency(self, hyperlink):
+        if self.latency_jitter == 0:
+            return self.latency
+        jitter = random.Random(str(self.seed) + hyperlink).uniform(-self.latency_jitter, self.latency_jitter)
+        return max(0.0, self.latency + jitter)
+
+    def fetch(self, hyperlink):
+        '''
+        :param hyperlink: hyperlink
+        :return: archived FetchResult of the hyperlink,
+                 raises urllib.error.HTTPError for archived error statuses
+                 and with status 404 if the hyperlink is not archived.
+        '''
+        latency = self.get_latency(hyperlink)
+        time.sleep(latency)
+        if self.metrics is not None:
+            self.metrics.record(TTFB_STAGE, latency)
+
+        archived_response = read_archived_response(self.archive_directory, hyperlink)
+        if archived_response is None:
+            raise HTTPError(hyperlink, 404, "Not in the fetch archive", None, None)
+        if archived_response["status"] >= 400:
+            raise HTTPError(archived_response["final_url"], archived_response["status"],
+                            archived_response["reason"], None, None)
+        return FetchResult(hyperlink, archived_response["final_url"], archived_response["body"])
@@ -0,0 +1,625 @@
+import collections
+import heapq
+import itertools
+import json
+import os
+import shutil
+import tempfile
+
+from crawler.visited_store import create_inlinks, hash_url
+
+# Bits and probes of the filter of spilled URLs, 16M bits i.e. 2MB keep
+# its false positive rate under 1% up to about 1.7M spilled URLs.
+SPILLED_URL_FILTER_BIT_COUNT = 1 << 24
+SPILLED_URL_FILTER_HASH_COUNT = 7
+
+# Bytes of a URL hash in a segment key file.
+SPILLED_KEY_SIZE = 16
+
+
+class Frontier:
+    '''
+    Frontier that holds every URL at most once.
+
+    Frontier items are the crawler's tuples, url_index selects the URL
+    of an item and inlink_set_index (if the crawler records in-links)
+    selects its in-link buffer. The enqueued dict maps each queued URL to
+    its item, so membership checks are O(1) and in-links discovered
+    while a URL is still queued are merged into that one item.
+
+    Subclasses decide the crawl order by implementing push, pop_item and peek.
+    '''
+
+    def __init__(self, url_index, inlink_set_index=None):
+        self.url_index = url_index
+        self.inlink_set_index = inlink_set_index
+        self.enqueued = dict()
+
+    def __len__(self):
+        return len(self.enqueued)
+
+    def __contains__(self, hyperlink):
+        return hyperlink in self.enqueued
+
+    def add(self, frontier_item):
+        '''
+        Adds the frontier item, unless its URL is already queued,
+        in which case its in-links are merged into the queued item.
+        :param frontier_item: frontier_item
+        :return: True if the item was added,
+                 False, if the URL was already queued.
+        '''
+        hyperlink = frontier_item[self.url_index]
+        if hyperlink in self.enqueued:
+            if self.inlink_set_index is not None:
+                self.merge_inlinks(hyperlink, frontier_item[self.inlink_set_index])
+            return False
+        self.enqueued[hyperlink] = frontier_item
+        self.push(frontier_item)
+        return True
+
+    def merge_inlinks(self, hyperlink, inlinks):
+        '''
+        Merges in-links into the queued item of the hyperlink.
+        :param hyperlink: queued hyperlink
+        :param inlinks: iterable of in-links
+        :return: None
+        '''
+        self.enqueued[hyperlink][self.inlink_set_index].extend(inlinks)
+
+    def pop(self):
+        '''
+        :return: the next frontier item to crawl, removed from the frontier.
+        '''
+        frontier_item = self.pop_item()
+        del self.enqueued[frontier_item[self.url_index]]
+        return frontier_item
+
+    def push(self, frontier_item):
+        raise NotImplementedError
+
+    def pop_item(self):
+        raise NotImplementedError
+
+    def peek(self, count):
+        '''
+        :param count: number of items
+        :return: up to count items that pop() would return next, in order.
+        '''
+        raise NotImplementedError
+
+
+class BFSFrontier(Frontier):
+    '''
+    First-in first-out frontier, for breadth first crawling.
+    '''
+
+    def __init__(self, url_index, inlink_set_index=None):
+        super().__init__(url_index, inlink_set_index)
+        self.queue = collections.deque()
+
+    def push(self, frontier_item):
+        self.queue.append(frontier_item)
+
+    def pop_item(self):
+        return self.queue.popleft()
+
+    def peek(self, count):
+        return list(itertools.islice(self.queue, count))
+
+
+class DFSFrontier(Frontier):
+    '''
+    Last-in first-out frontier, for depth first crawling.
+    '''
+
+    def __init__(self, url_index, inlink_set_index=None):
+        super().__init__(url_index, inlink_set_index)
+        self.stack = []
+
+    def push(self, frontier_item):
+        self.stack.append(frontier_item)
+
+    def pop_item(self):
+        return self.stack.pop()
+
+    def peek(self, count):
+        return self.stack[:-count - 1:-1]
+
+
+class PriorityFrontier(Frontier):
+    '''
+    Frontier served lowest priority value first, for focused crawling.
+    priority(frontier_item) is evaluated when the item is added, items
+    with equal priority are served in the order they were added.
+
+    Adding an item for a queued URL with a lower priority value e.g. a
+    link rediscovered on a more relevant page replaces the queued item,
+    its in-links merged. As in OPICFrontier the replacement pushes a new
+    heap entry, the old one is skipped when it surfaces and the heap is
+    rebuilt once most of its entries are stale.
+    '''
+
+    def __init__(self, url_index, priority, inlink_set_index=None):
+        super().__init__(url_index, inlink_set_index)
+        self.priority = priority
+        self.heap = []
+        self.sequence = itertools.count()
+
+        # URL vs current heap entry of every queued item.
+        self.heap_entries = dict()
+
+    def add(self, frontier_item):
+        hyperlink = frontier_item[self.url_index]
+        if hyperlink not in self.enqueued:
+            return super().add(frontier_item)
+        if self.inlink_set_index is not None:
+            self.merge_inlinks(hyperlink, frontier_item[self.inlink_set_index])
+            # the replacement keeps the merged in-links
+            frontier_item = frontier_item[:self.inlink_set_index] + \
+                            (self.enqueued[hyperlink][self.inlink_set_index],) + \
+                            frontier_item[self.inlink_set_index + 1:]
+        if self.priority(frontier_item) < self.heap_entries[hyperlink][0]:
+            self.enqueued[hyperlink] = frontier_item
+            self.push(frontier_item)
+            if len(self.heap) > 2 * len(self.heap_entries) + 1024:
+                self.heap = list(self.heap_entries.values())
+                heapq.heapify(self.heap)
+        return False
+
+    def push(self, frontier_item):
+        heap_entry = (self.priority(frontier_item), next(self.sequence), frontier_item)
+        self.heap_entries[frontier_item[self.url_index]] = heap_entry
+        heapq.heappush(self.heap, heap_entry)
+
+    def is_current(self, heap_entry):
+        return self.heap_entries.get(heap_entry[2][self.url_index]) is heap_entry
+
+    def pop_item(self):
+        while True:
+            heap_entry = heapq.heappop(self.heap)
+            if self.is_current(heap_entry):
+                del self.heap_entries[heap_entry[2][self.url_index]]
+                return heap_entry[2]
+
+    def peek(self, count):
+        # as in pop_item, stale entries surfacing at the top are dropped for good
+        current_entries = []
+        while len(current_entries) < count and len(self.heap) > 0:
+            heap_entry = heapq.heappop(self.heap)
+            if self.is_current(heap_entry):
+                current_entries.append(heap_entry)
+        for heap_entry in current_entries:
+            heapq.heappush(self.heap, heap_entry)
+        return [heap_entry[2] for heap_entry in current_entries]
+
+
+class OPICFrontier(Frontier):
+    '''
+    Frontier served in approximate importance order, estimated online
+    with OPIC (On-line Page Importance Computation): every queued URL
+    holds cash, the seed starts with initial_cash and a crawled page
+    splits its cash evenly among its out-links, see spend_cash. The URL
+    holding the most cash is served first, URLs with equal cash in the
+    order they were added.
+
+    Cash is handed out as in-links are recorded: an item added or merged
+    with in-links of the page spending its cash gets a share per in-link.
+    Cash sent to a URL that is not queued i.e. crawled or filtered out is
+    dropped. Requires the in-link buffers of the items.
+
+    Raising the cash of a queued URL pushes a new heap entry, the old one
+    is skipped when it surfaces and the heap is rebuilt once most of its
+    entries are stale.
+    '''
+
+    def __init__(self, url_index, inlink_set_index, initial_cash=1.0):
+        super().__init__(url_index, inlink_set_index)
+        self.initial_cash = initial_cash
+
+        # URL vs [<cash>, <sequence number of the add>] of every queued item.
+        self.cash = dict()
+        self.heap = []
+        self.sequence = itertools.count()
+
+        # page whose out-links are being recorded and the cash each gets.
+        self.paying_doc_id = None
+        self.cash_share = 0.0
+
+        # URL and cash of the last item popped, until it spends its cash.
+        self.popped = (None, 0.0)
+
+    def get_credit(self, inlinks):
+        '''
+        :param inlinks: in-links added to a queued item
+        :return: cash the in-links bring to the item.
+        '''
+        if self.paying_doc_id is None:
+            return 0.0
+        return self.cash_share * inlinks.count(self.paying_doc_id)
+
+    def push(self, frontier_item):
+        inlinks = frontier_item[self.inlink_set_index]
+        cash = self.get_credit(inlinks) if len(inlinks) > 0 else self.initial_cash
+        cash_entry = [cash, next(self.sequence)]
+        self.cash[frontier_item[self.url_index]] = cash_entry
+        heapq.heappush(self.heap, (-cash, cash_entry[1], frontier_item[self.url_index]))
+
+    def merge_inlinks(self, hyperlink, inlinks):
+        super().merge_inlinks(hyperlink, inlinks)
+        credit = self.get_credit(inlinks)
+        if credit > 0:
+            cash_entry = self.cash[hyperlink]
+            cash_entry[0] += credit
+            heapq.heappush(self.heap, (-cash_entry[0], cash_entry[1], hyperlink))
+            if len(self.heap) > 2 * len(self.cash) + 1024:
+                self.heap = [(-cash, sequence, hyperlink) for hyperlink, (cash, sequence) in self.cash.items()]
+                heapq.heapify(self.heap)
+
+    def is_current(self, heap_entry):
+        cash_entry = self.cash.get(heap_entry[2])
+        return cash_entry is not None and -heap_entry[0] == cash_entry[0]
+
+    def pop_item(self):
+        while True:
+            heap_entry = heapq.heappop(self.heap)
+            if self.is_current(heap_entry):
+                hyperlink = heap_entry[2]
+                self.popped = (hyperlink, self.cash.pop(hyperlink)[0])
+                # in-links recorded until the popped page spends its cash bring none
+                self.paying_doc_id = None
+                return self.enqueued[hyperlink]
+
+    def peek(self, count):
+        current_entries = []
+        while len(current_entries) < count and len(self.heap) > 0:
+            heap_entry = heapq.heappop(self.heap)
+            if self.is_current(heap_entry):
+                current_entries.append(heap_entry)
+        for heap_entry in current_entries:
+            heapq.heappush(self.heap, heap_entry)
+        return [self.enqueued[heap_entry[2]] for heap_entry in current_entries]
+
+    def spend_cash(self, hyperlink, doc_id, out_link_count):
+        '''
+        Splits the cash of a crawled page among its out-links: until the
+        next call, every in-link doc_id recorded for a queued URL brings
+        it cash / out_link_count.
+        :param hyperlink: hyperlink of the page, the last one popped
+        :param doc_id: doc id of the page
+        :param out_link_count: number of out-links of the page
+        :return: cash of the page.
+        '''
+        popped_hyperlink, cash = self.popped
+        if popped_hyperlink != hyperlink:
+            cash = 0.0
+        self.popped = (None, 0.0)
+        self.paying_doc_id = doc_id
+        self.cash_share = cash / out_link_count if out_link_count > 0 else 0.0
+        return cash
+
+
+class SpilledUrlFilter:
+    '''
+    Bloom filter of the URL hashes of spilled frontier items, a fixed
+    size bit array probed at hash_count positions by double hashing the
+    two 64 bit halves of the hash. It may answer True for a URL that was
+    never spilled, never False for one that was.
+    '''
+
+    def __init__(self, bit_count, hash_count):
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bytearray(bit_count // 8)
+
+    def get_positions(self, url_key):
+        h1, h2 = url_key >> 64, url_key & 0xFFFFFFFFFFFFFFFF
+        return ((h1 + i * h2) % self.bit_count for i in range(self.hash_count))
+
+    def add(self, url_key):
+        for position in self.get_positions(url_key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, url_key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.get_positions(url_key))
+
+    def clear(self):
+        self.bits = bytearray(self.bit_count // 8)
+
+
+class SpillingBFSFrontier(BFSFrontier):
+    '''
+    First-in first-out frontier that keeps at most memory_capacity items
+    in memory and spills the rest, in order, to append-only segment files
+    of segment_size items in spill_directory. Segments are read back in
+    the order they were written, so the crawl order is the same as with
+    BFSFrontier.
+
+    Memory does not grow with the number of spilled items: a spilled URL
+    is only recorded in a SpilledUrlFilter of filter_bit_count bits and,
+    once its segment is complete, in the segment's key file, the sorted
+    128 bit hashes of its URLs. A URL the filter may hold is confirmed by
+    a binary search of the key files of the segments not read back yet,
+    the URLs of the segment being written are the only ones kept in
+    memory. The filter is cleared whenever every segment has been read
+    back. In-links merged into a spilled item are appended to the
+    segment's in-link file and applied when the segment is read back.
+
+    The frontier can be pickled into a crawl checkpoint. Segments read
+    back are only deleted by remove_consumed_segments(), which the crawler
+    calls once a checkpoint is written, so an older checkpoint never
+    refers to a deleted segment.
+    '''
+
+    def __init__(self, url_index, inlink_set_index=None, spill_directory=None,
+                 memory_capacity=10000, segment_size=10000, filter_bit_count=SPILLED_URL_FILTER_BIT_COUNT):
+        super().__init__(url_index, inlink_set_index)
+        self.spill_directory = spill_directory if spill_directory is not None else tempfile.mkdtemp(prefix="frontier-")
+        os.makedirs(self.spill_directory, exist_ok=True)
+        self.memory_capacity = memory_capacity
+        self.segment_size = segment_size
+        self.filter_bit_count = filter_bit_count
+
+        # SpilledUrlFilter of the spilled URLs, created on the first spill.
+        self.spilled_filter = None
+        self.spilled_count = 0
+
+        # segment numbers not yet read back, oldest first.
+        self.segments = collections.deque()
+        self.segment_count = 0
+
+        # segment being appended to, its open file, number of items and URL hashes (see get_spilled_key).
+        self.open_segment = None
+        self.segment_file = None
+        self.segment_item_count = 0
+        self.segment_keys = set()
+
+        # segment number vs open in-link file.
+        self.inlink_files = dict()
+
+        # files of segments already read back, not yet deleted.
+        self.consumed_file_names = []
+
+    def __len__(self):
+        return len(self.enqueued) + self.spilled_count
+
+    def __contains__(self, hyperlink):
+        return hyperlink in self.enqueued or self.find_spilled_segment(hyperlink) is not None
+
+    def get_spilled_key(self, hyperlink):
+        h1, h2 = hash_url(hyperlink)
+        return h1 << 64 | h2
+
+    def get_segment_path(self, segment, suffix):
+        return os.path.join(self.spill_directory, "segment-" + str(segment) + suffix)
+
+    def find_spilled_segment(self, hyperlink):
+        '''
+        :param hyperlink: hyperlink
+        :return: segment number of the spilled item of the hyperlink,
+                 None, if it is not spilled.
+        '''
+        if self.spilled_count == 0:
+            return None
+        spilled_key = self.get_spilled_key(hyperlink)
+        if spilled_key not in self.spilled_filter:
+            return None
+        if spilled_key in self.segment_keys:
+            return self.open_segment
+        for segment in self.segments:
+            if segment != self.open_segment and self.has_segment_key(segment, spilled_key):
+                return segment
+        return None
+
+    def has_segment_key(self, segment, spilled_key):
+        '''
+        Binary search of the key file of a complete segment.
+        :param segment: segment number
+        :param spilled_key: URL hash, see get_spilled_key
+        :return: True if one of the URLs of the segment has the hash,
+                 False, otherwise.
+        '''
+        with open(self.get_segment_path(segment, ".keys"), 'rb') as keys_file:
+            low, high = 0, os.fstat(keys_file.fileno()).st_size // SPILLED_KEY_SIZE
+            while low < high:
+                middle = (low + high) // 2
+                keys_file.seek(middle * SPILLED_KEY_SIZE)
+                key = int.from_bytes(keys_file.read(SPILLED_KEY_SIZE), "big")
+                if key < spilled_key:
+                    low = middle + 1
+                elif key > spilled_key:
+                    high = middle
+                else:
+                    return True
+        return False
+
+    def encode(self, frontier_item):
+        frontier_item = list(frontier_item)
+        if self.inlink_set_index is not None:
+            frontier_item[self.inlink_set_index] = list(frontier_item[self.inlink_set_index])
+        return json.dumps(frontier_item)
+
+    def decode(self, line):
+        frontier_item = json.loads(line)
+        if self.inlink_set_index is not None:
+            frontier_item[self.inlink_set_index] = create_inlinks(frontier_item[self.inlink_set_index])
+        return tuple(frontier_item)
+
+    def add(self, frontier_item):
+        hyperlink = frontier_item[self.url_index]
+        if hyperlink in self.enqueued:
+            if self.inlink_set_index is not None:
+                super().merge_inlinks(hyperlink, frontier_item[self.inlink_set_index])
+            return False
+        segment = self.find_spilled_segment(hyperlink)
+        if segment is not None:
+            if self.inlink_set_index is not None:
+                self.merge_spilled_inlinks(segment, hyperlink, frontier_item[self.inlink_set_index])
+            return False
+        if len(self.segments) == 0 and len(self.queue) < self.memory_capacity:
+            self.enqueued[hyperlink] = frontier_item
+            self.push(frontier_item)
+        else:
+            self.spill(frontier_item)
+        return True
+
+    def spill(self, frontier_item):
+        '''
+        Appends the frontier item to the segment being written,
+        starting a new segment when the current one is full.
+        :param frontier_item: frontier_item
+        :return: None
+        '''
+        if self.open_segment is None:
+            self.open_segment = self.segment_count
+            self.segments.append(self.segment_count)
+            self.segment_count += 1
+            self.segment_item_count = 0
+            # in-links of a segment left by an earlier crawl must not be applied to this one
+            if os.path.exists(self.get_segment_path(self.open_segment, ".inlinks")):
+                os.remove(self.get_segment_path(self.open_segment, ".inlinks"))
+            self.segment_file = open(self.get_segment_path(self.open_segment, ".jsonl"), 'w', encoding="utf-8")
+        elif self.segment_file is None:
+            # frontier restored from a checkpoint, the segment is appended to again
+            self.segment_file = open(self.get_segment_path(self.open_segment, ".jsonl"), 'a', encoding="utf-8")
+        if self.spilled_filter is None:
+            self.spilled_filter = SpilledUrlFilter(self.filter_bit_count, SPILLED_URL_FILTER_HASH_COUNT)
+        self.segment_file.write(self.encode(frontier_item) + "\n")
+        spilled_key = self.get_spilled_key(frontier_item[self.url_index])
+        self.spilled_filter.add(spilled_key)
+        self.segment_keys.add(spilled_key)
+        self.spilled_count += 1
+        self.segment_item_count += 1
+        if self.segment_item_count >= self.segment_size:
+            self.complete_segment()
+
+    def complete_segment(self):
+        '''
+        Closes the segment being written and writes its key file.
+        :return: None
+        '''
+        self.close_segment_file()
+        with open(self.get_segment_path(self.open_segment, ".keys"), 'wb') as keys_file:
+            keys_file.write(b"".join(key.to_bytes(SPILLED_KEY_SIZE, "big") for key in sorted(self.segment_keys)))
+        self.segment_keys = set()
+        self.open_segment = None
+
+    def close_segment_file(self):
+        if self.segment_file is not None:
+            self.segment_file.close()
+            self.segment_file = None
+
+    def merge_inlinks(self, hyperlink, inlinks):
+        if hyperlink in self.enqueued:
+            super().merge_inlinks(hyperlink, inlinks)
+            return
+        self.merge_spilled_inlinks(self.find_spilled_segment(hyperlink), hyperlink, inlinks)
+
+    def merge_spilled_inlinks(self, segment, hyperlink, inlinks):
+        if segment not in self.inlink_files:
+            self.inlink_files[segment] = open(self.get_segment_path(segment, ".inlinks"), 'a', encoding="utf-8")
+        self.inlink_files[segment].write(json.dumps([hyperlink, list(inlinks)]) + "\n")
+
+    def load_next_segment(self):
+        '''
+        Reads the oldest spilled segment back into memory,
+        applying the in-links merged while it was on disk.
+        :return: None
+        '''
+        segment = self.segments.popleft()
+        if segment == self.open_segment:
+            # the segment being written has no key file
+            self.close_segment_file()
+            self.segment_keys = set()
+            self.open_segment = None
+        else:
+            self.consumed_file_names.append(self.get_segment_path(segment, ".keys"))
+
+        segment_path = self.get_segment_path(segment, ".jsonl")
+        with open(segment_path, 'r', encoding="utf-8") as segment_file:
+            for line in segment_file:
+                frontier_item = self.decode(line)
+                self.enqueued[frontier_item[self.url_index]] = frontier_item
+                self.push(frontier_item)
+                self.spilled_count -= 1
+        self.consumed_file_names.append(segment_path)
+        if len(self.segments) == 0:
+            # nothing is spilled, the filter starts over
+            self.spilled_filter.clear()
+
+        if segment in self.inlink_files:
+            self.inlink_files.pop(segment).close()
+        inlinks_path = self.get_segment_path(segment, ".inlinks")
+        if os.path.exists(inlinks_path):
+            with open(inlinks_path, 'r', encoding="utf-8") as inlinks_file:
+                for line in inlinks_file:
+                    hyperlink, inlinks = json.loads(line)
+                    super().merge_inlinks(hyperlink, inlinks)
+            self.consumed_file_names.append(inlinks_path)
+
+    def pop_item(self):
+        if len(self.queue) == 0:
+            self.load_next_segment()
+        return super().pop_item()
+
+    def peek(self, count):
+        if len(self.queue) == 0 and len(self.segments) > 0:
+            self.load_next_segment()
+        return super().peek(count)
+
+    def remove_spilled_files(self):
+        '''
+        Deletes every file in spill_directory, the segments of an earlier
+        crawl included, so a new crawl never reads their items or in-links back.
+        :return: None
+        '''
+        for file_name in os.listdir(self.spill_directory):
+            os.remove(os.path.join(self.spill_directory, file_name))
+
+    def remove_consumed_segments(self):
+        '''
+        Deletes the files of segments that were already read back.
+        :return: None
+        '''
+        for file_name in self.consumed_file_names:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+        self.consumed_file_names = []
+
+    def __getstate__(self):
+        # flush the spilled files and record their sizes, so a frontier
+        # restored from a checkpoint can drop whatever was spilled after it.
+        self.flush()
+        state = self.__dict__.copy()
+        state["segment_file"] = None
+        state["inlink_files"] = dict()
+        state["spilled_file_sizes"] = {file_name: os.path.getsize(os.path.join(self.spill_directory, file_name))
+                                       for file_name in os.listdir(self.spill_directory)}
+        return state
+
+    def __setstate__(self, state):
+        spilled_file_sizes = state.pop("spilled_file_sizes")
+        self.__dict__.update(state)
+        for file_name in os.listdir(self.spill_directory):
+            file_path = os.path.join(self.spill_directory, file_name)
+            if file_name in spilled_file_sizes:
+                os.truncate(file_path, spilled_file_sizes[file_name])
+            else:
+                os.remove(file_path)
+
+    def flush(self):
+        if self.segment_file is not None:
+            self.segment_file.flush()
+        for inlink_file in self.inlink_files.values():
+            inlink_file.flush()
+
+    def close(self):
+        '''
+        Closes and removes the spilled segments.
+        :return: None
+        '''
+        self.close_segment_file()
+        for inlink_file in self.inlink_files.values():
+            inlink_file.close()
+        self.inlink_files.clear()
+        shutil.rmtree(self.spill_directory, ignore_errors=True)
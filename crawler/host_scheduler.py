@@ -0,0 +1,243 @@
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from crawler.async_fetcher import HostPolitenessPolicy, get_host
+
+ROBOTS_TXT_PATH = "/robots.txt"
+
+# A robots.txt failing with a 5xx status or a network error disallows the whole
+# host until it is fetched again, ROBOTS_TXT_RETRY_INTERVAL seconds later.
+ROBOTS_TXT_RETRY_INTERVAL = 600
+
+# Statuses of an overloaded server, the host backs off and the fetch is retried.
+RETRY_STATUSES = (429, 503)
+MAX_FETCH_RETRIES = 3
+
+# Adaptive delay bounds in seconds, Crawl-delay of robots.txt raises the minimum.
+DEFAULT_MINIMUM_DELAY = 0.25
+DEFAULT_MAXIMUM_DELAY = 60
+
+# The delay of a host moves halfway towards RESPONSE_TIME_DELAY_FACTOR times
+# its last response time, so a slow server is given more time between requests.
+RESPONSE_TIME_DELAY_FACTOR = 2
+
+# Delay multiplier after an error status of an overloaded or failing server.
+BACKOFF_FACTOR = 2
+
+
+class RobotsCache:
+    '''
+    robots.txt rules of every host, fetched once on the first lookup of the host.
+
+    As in urllib.robotparser, a robots.txt answering 401 or 403 disallows
+    the whole host and a missing one (any other 4xx) allows it. As RFC 9309
+    asks, an unreachable one (5xx or network error) disallows the whole host
+    too, but only for retry_interval seconds, the next lookup after that
+    fetches it again.
+
+    Each host has its own lock, so robots.txt of different hosts are
+    fetched concurrently and that of one host only once.
+    '''
+
+    def __init__(self, fetch, user_agent="*", retry_interval=ROBOTS_TXT_RETRY_INTERVAL):
+        '''
+        :param fetch: fetch backend, a function of the hyperlink returning a FetchResult
+        :param user_agent: user agent the rules are looked up for
+        :param retry_interval: seconds an unreachable robots.txt disallows its host for
+        '''
+        self.fetch = fetch
+        self.user_agent = user_agent
+        self.retry_interval = retry_interval
+        self.rules_by_host = dict()
+        # time.monotonic() at which the rules of a host with an unreachable robots.txt expire
+        self.retry_time_by_host = dict()
+        self.locks_by_host = dict()
+        # guards locks_by_host only, never held while fetching
+        self.lock = threading.Lock()
+
+    def get_rules(self, hyperlink):
+        host = get_host(hyperlink)
+        if not self.has_rules(hyperlink):
+            with self.get_host_lock(host):
+                # another thread may have fetched it while this one waited for the lock
+                if not self.has_rules(hyperlink):
+                    rules, reachable = self.fetch_rules(urlsplit(hyperlink).scheme + "://" + host + ROBOTS_TXT_PATH)
+                    if reachable:
+                        self.retry_time_by_host.pop(host, None)
+                    else:
+                        self.retry_time_by_host[host] = time.monotonic() + self.retry_interval
+                    self.rules_by_host[host] = rules
+        return self.rules_by_host[host]
+
+    def get_host_lock(self, host):
+        with self.lock:
+            host_lock = self.locks_by_host.get(host)
+            if host_lock is None:
+                host_lock = self.locks_by_host[host] = threading.Lock()
+            return host_lock
+
+    def has_rules(self, hyperlink):
+        '''
+        :param hyperlink: hyperlink
+        :return: True if robots.txt of the host of the hyperlink was already fetched,
+                 False, otherwise i.e. a lookup would fetch it.
+        '''
+        host = get_host(hyperlink)
+        retry_time = self.retry_time_by_host.get(host)
+        return host in self.rules_by_host and (retry_time is None or time.monotonic() < retry_time)
+
+    def fetch_rules(self, robots_url):
+        '''
+        :param robots_url: URL of the robots.txt
+        :return: tuple (<RobotFileParser of the robots.txt>, <False if it was unreachable, True otherwise>)
+        '''
+        rules = RobotFileParser(robots_url)
+        try:
+            fetch_result = self.fetch(robots_url)
+        except HTTPError as http_error:
+            if http_error.code in (401, 403):
+                rules.disallow_all = True
+            elif http_error.code >= 500:
+                rules.disallow_all = True
+                return rules, False
+            else:
+                rules.allow_all = True
+            return rules, True
+        except OSError:
+            rules.disallow_all = True
+            return rules, False
+        rules.parse(fetch_result.body.decode("utf-8", errors="replace").splitlines())
+        return rules, True
+
+    def can_fetch(self, hyperlink):
+        '''
+        :param hyperlink: hyperlink
+        :return: True if robots.txt of the host allows crawling the hyperlink,
+                 False, otherwise.
+        '''
+        return self.get_rules(hyperlink).can_fetch(self.user_agent, hyperlink)
+
+    def get_crawl_delay(self, host):
+        '''
+        :param host: host
+        :return: Crawl-delay of the host in seconds, None if it has none
+                 or its robots.txt was not fetched yet.
+        '''
+        rules = self.rules_by_host.get(host)
+        if rules is None:
+            return None
+        return rules.crawl_delay(self.user_agent)
+
+
+class HostScheduler(HostPolitenessPolicy):
+    '''
+    HostPolitenessPolicy with a delay per host: never below the
+    Crawl-delay of the host's robots.txt and, if adaptive, adjusted
+    to how the host responds. Fast responses bring the delay down to
+    minimum_delay, slow ones and 429/5xx statuses push it up to
+    maximum_delay, so every host is crawled as fast as it allows.
+
+    Response times and errors are reported from the fetching threads.
+    '''
+
+    def __init__(self, politeness_delay, robots=None, adaptive=False,
+                 minimum_delay=DEFAULT_MINIMUM_DELAY, maximum_delay=DEFAULT_MAXIMUM_DELAY):
+        '''
+        :param politeness_delay: delay in seconds, the starting delay of every host if adaptive
+        :param robots: RobotsCache to take the Crawl-delay from, None to ignore it
+        :param adaptive: True to adapt the delay of each host to its responses
+        :param minimum_delay: minimum adaptive delay in seconds
+        :param maximum_delay: maximum adaptive delay in seconds
+        '''
+        super().__init__(politeness_delay)
+        self.robots = robots
+        self.adaptive = adaptive
+        self.minimum_delay = minimum_delay
+        self.maximum_delay = maximum_delay
+        self.delay_by_host = dict()
+        self.lock = threading.Lock()
+
+    def get_delay(self, host):
+        '''
+        :param host: host
+        :return: seconds between two requests to the host.
+        '''
+        delay = self.delay_by_host.get(host, self.politeness_delay)
+        crawl_delay = self.robots.get_crawl_delay(host) if self.robots is not None else None
+        return max(delay, crawl_delay or 0)
+
+    def reserve_slot_time(self, host):
+        with self.lock:
+            return super().reserve_slot_time(host)
+
+    def record_response(self, host, response_time):
+        '''
+        Moves the delay of the host halfway towards RESPONSE_TIME_DELAY_FACTOR * response_time.
+        :param host: host
+        :param response_time: seconds the host took to respond
+        :return: None
+        '''
+        if not self.adaptive:
+            return
+        with self.lock:
+            delay = self.delay_by_host.get(host, self.politeness_delay)
+            delay = (delay + RESPONSE_TIME_DELAY_FACTOR * response_time) / 2
+            self.delay_by_host[host] = min(self.maximum_delay, max(self.minimum_delay, delay))
+
+    def record_error(self, host, status, retry_after=None):
+        '''
+        Backs off the host after a 429 or 5xx status.
+        :param host: host
+        :param status: HTTP status
+        :param retry_after: seconds of the Retry-After header, None if there was none
+        :return: None
+        '''
+        if not self.adaptive or (status not in RETRY_STATUSES and status < 500):
+            return
+        with self.lock:
+            delay = self.delay_by_host.get(host, self.politeness_delay)
+            self.delay_by_host[host] = min(self.maximum_delay, max(self.minimum_delay, delay * BACKOFF_FACTOR))
+            if retry_after is not None:
+                self.next_slot_by_host[host] = max(self.next_slot_by_host.get(host, 0),
+                                                   time.monotonic() + min(retry_after, self.maximum_delay))
+
+
+def get_retry_after(http_error):
+    '''
+    :param http_error: urllib.error.HTTPError
+    :return: seconds of the Retry-After header, None if it is missing or an HTTP date.
+    '''
+    retry_after = http_error.headers.get("Retry-After") if http_error.headers is not None else None
+    if retry_after is None or not retry_after.strip().isdigit():
+        return None
+    return int(retry_after)
+
+
+def fetch_with_backoff(fetch, hyperlink, scheduler):
+    '''
+    Fetches the hyperlink, reporting the response time or error status to the
+    scheduler. If the scheduler is adaptive, 429 and 503 responses are retried
+    up to MAX_FETCH_RETRIES times, each once the host's next slot comes.
+    :param fetch: fetch backend, a function of the hyperlink returning a FetchResult
+    :param hyperlink: hyperlink
+    :param scheduler: HostScheduler
+    :return: FetchResult of the hyperlink, raises the fetch error if any.
+    '''
+    host = get_host(hyperlink)
+    retry_count = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            fetch_result = fetch(hyperlink)
+        except HTTPError as http_error:
+            scheduler.record_error(host, http_error.code, get_retry_after(http_error))
+            if not scheduler.adaptive or http_error.code not in RETRY_STATUSES or retry_count >= MAX_FETCH_RETRIES:
+                raise
+            retry_count += 1
+            time.sleep(scheduler.reserve_slot(host))
+            continue
+        scheduler.record_response(host, time.perf_counter() - start)
+        return fetch_result
@@ -0,0 +1,266 @@
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import socket
+import ssl
+import threading
+import time
+import zlib
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+from crawler.async_fetcher import FetchResult, get_body_too_large_error, read_body
+from crawler.instrumentation import BODY_STAGE, CONNECT_STAGE, DNS_STAGE, TTFB_STAGE
+
+# Maximum number of redirects followed for one fetch.
+MAX_REDIRECTS = 10
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+# Errors raised when a kept-alive connection was closed by the server.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                           ConnectionResetError, BrokenPipeError)
+
+
+class ConditionalFetchCache:
+    '''
+    On-disk cache of the validators (ETag, Last-Modified) and the body of
+    every URL that answered with a body, one file per URL: a JSON header
+    line followed by the zlib compressed body. Lets a recrawl send
+    conditional GETs and serve the cached body when the server answers
+    304 Not Modified. A redirected URL is cached under the URL that
+    answered, so its validators are only ever sent to that URL.
+    '''
+
+    def __init__(self, cache_directory):
+        self.cache_directory = cache_directory
+        os.makedirs(cache_directory, exist_ok=True)
+
+    def get_path(self, hyperlink):
+        return os.path.join(self.cache_directory, hashlib.sha1(hyperlink.encode("utf-8")).hexdigest())
+
+    def get(self, hyperlink):
+        '''
+        :param hyperlink: hyperlink
+        :return: dict with "etag", "last_modified" and "body",
+                 None, if the hyperlink is not cached.
+        '''
+        try:
+            with open(self.get_path(hyperlink), 'rb') as cache_file:
+                cache_entry = json.loads(cache_file.readline().decode("utf-8"))
+                cache_entry["body"] = zlib.decompress(cache_file.read())
+                return cache_entry
+        except (OSError, ValueError, zlib.error):
+            return None
+
+    def put(self, hyperlink, etag, last_modified, body):
+        if etag is None and last_modified is None:
+            return
+        header = json.dumps({"etag": etag, "last_modified": last_modified})
+        temporary_path = self.get_path(hyperlink) + ".tmp"
+        with open(temporary_path, 'wb') as cache_file:
+            cache_file.write(header.encode("utf-8") + b"\n")
+            cache_file.write(zlib.compress(body))
+        os.replace(temporary_path, self.get_path(hyperlink))
+
+
+def decode_body(http_response, body, hyperlink=None, max_body_size=None):
+    '''
+    :param http_response: http.client response
+    :param body: raw body of the response
+    :param hyperlink: URL of the response
+    :param max_body_size: maximum size of the decoded body in bytes, None for no limit
+    :return: body decoded according to its Content-Encoding, raises urllib.error.HTTPError
+             with BODY_TOO_LARGE_STATUS if it decodes to more than max_body_size bytes.
+    '''
+    content_encoding = (http_response.getheader("Content-Encoding") or "").lower()
+    if content_encoding not in ("gzip", "deflate"):
+        return body
+    if max_body_size is None:
+        return gzip.decompress(body) if content_encoding == "gzip" else zlib.decompress(body)
+    # decompressed no further than the limit, so a small body cannot inflate without bound
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS if content_encoding == "gzip" else zlib.MAX_WBITS)
+    body = decompressor.decompress(body, max_body_size + 1)
+    if len(body) > max_body_size:
+        raise get_body_too_large_error(hyperlink, http_response, max_body_size)
+    return body
+
+
+class TimedHTTPConnection(http.client.HTTPConnection):
+    '''
+    HTTPConnection that opens its socket itself, so that given a CrawlMetrics
+    it records the DNS lookup apart from the connect i.e. the TCP handshake.
+    '''
+
+    def __init__(self, host, timeout, metrics=None):
+        super().__init__(host, timeout=timeout)
+        self.metrics = metrics
+
+    def connect(self):
+        start = time.perf_counter()
+        address_info = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        self.sock = self.handshake(address_info[0][4][:2])
+        if self.metrics is not None:
+            self.metrics.record(DNS_STAGE, resolved - start)
+            self.metrics.record(CONNECT_STAGE, time.perf_counter() - resolved)
+
+    def handshake(self, address):
+        '''
+        :param address: resolved (host, port) of the connection
+        :return: socket connected to the address.
+        '''
+        sock = socket.create_connection(address, self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+
+class TimedHTTPSConnection(TimedHTTPConnection):
+    '''
+    TimedHTTPConnection over TLS, the TLS handshake is part of the connect time.
+    '''
+
+    default_port = http.client.HTTPS_PORT
+
+    def __init__(self, host, timeout, metrics=None, ssl_context=None):
+        super().__init__(host, timeout, metrics)
+        self.ssl_context = ssl_context if ssl_context is not None else ssl.create_default_context()
+
+    def handshake(self, address):
+        return self.ssl_context.wrap_socket(super().handshake(address), server_hostname=self.host)
+
+
+class HTTPConnectionPool:
+    '''
+    Fetcher that keeps alive one or more connections per host, asks for
+    gzip compressed bodies and, given a ConditionalFetchCache, sends
+    conditional GETs for URLs fetched before.
+
+    fetch() is safe to call from several threads, a connection is only
+    ever used by one thread at a time.
+
+    Given a CrawlMetrics, the DNS lookup and connect time of new connections
+    and the time to first byte and body time of every request are recorded.
+
+    Given max_body_size or html_only, bodies are read as read_body does and a
+    connection whose response was given up on is closed instead of kept alive.
+    '''
+
+    def __init__(self, cache=None, timeout=30, user_agent="InformationRetrieval-crawler", metrics=None):
+        self.cache = cache
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.metrics = metrics
+        self.idle_connections = dict()
+        self.lock = threading.Lock()
+
+    def get_connection(self, scheme, netloc):
+        '''
+        :return: tuple (<idle connection to the host, or a new one>, <True if it was reused>)
+        '''
+        with self.lock:
+            idle_connections = self.idle_connections.get((scheme, netloc))
+            if idle_connections:
+                return idle_connections.pop(), True
+        if scheme == "https":
+            return TimedHTTPSConnection(netloc, self.timeout, self.metrics), False
+        return TimedHTTPConnection(netloc, self.timeout, self.metrics), False
+
+    def release_connection(self, scheme, netloc, connection):
+        with self.lock:
+            self.idle_connections.setdefault((scheme, netloc), []).append(connection)
+
+    def request(self, hyperlink, headers, max_body_size=None, html_only=False):
+        '''
+        Sends one GET over a pooled connection, retrying once on a fresh
+        connection if a reused one turns out to be closed by the server.
+        :param max_body_size: maximum size of the body in bytes, None for no limit
+        :param html_only: True to give up on a 200 response that is not HTML
+        :return: tuple (<response>, <body>)
+        '''
+        url_parts = urlsplit(hyperlink)
+        path = url_parts.path or "/"
+        if url_parts.query:
+            path += "?" + url_parts.query
+
+        while True:
+            connection, reused = self.get_connection(url_parts.scheme, url_parts.netloc)
+            try:
+                if not reused:
+                    # connected apart, so the time to first byte does not include the connect
+                    connection.connect()
+                start = time.perf_counter()
+                connection.request("GET", path, headers=headers)
+                http_response = connection.getresponse()
+                headers_time = time.perf_counter()
+                body = read_body(http_response, hyperlink, max_body_size, html_only and http_response.status == 200)
+                if self.metrics is not None:
+                    self.metrics.record(TTFB_STAGE, headers_time - start)
+                    self.metrics.record(BODY_STAGE, time.perf_counter() - headers_time)
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+
+            if http_response.will_close:
+                connection.close()
+            else:
+                self.release_connection(url_parts.scheme, url_parts.netloc, connection)
+            return http_response, body
+
+    def fetch(self, hyperlink, max_body_size=None, html_only=False):
+        '''
+        Fetches the hyperlink following redirects.
+        :param hyperlink: hyperlink
+        :param max_body_size: maximum size of the body in bytes, None for no limit, see read_body
+        :param html_only: True to give up on responses that are not HTML, see read_body
+        :return: FetchResult of the hyperlink,
+                 raises urllib.error.HTTPError for error statuses like urlopen
+                 and for the responses given up on.
+        '''
+        final_url = hyperlink
+        for redirect in range(MAX_REDIRECTS + 1):
+            # the validators of every URL requested, redirects included, are its own
+            cache_entry = self.cache.get(final_url) if self.cache is not None else None
+            headers = {"Accept-Encoding": "gzip", "User-Agent": self.user_agent}
+            if cache_entry is not None:
+                if cache_entry["etag"] is not None:
+                    headers["If-None-Match"] = cache_entry["etag"]
+                if cache_entry["last_modified"] is not None:
+                    headers["If-Modified-Since"] = cache_entry["last_modified"]
+
+            http_response, body = self.request(final_url, headers, max_body_size, html_only)
+
+            if http_response.status == 304:
+                if cache_entry is None:
+                    # nothing to serve, the request was not conditional
+                    raise HTTPError(final_url, 304, "Not Modified without a cached body", http_response.msg, None)
+                return FetchResult(hyperlink, final_url, cache_entry["body"])
+
+            if http_response.status in REDIRECT_STATUSES and http_response.getheader("Location"):
+                final_url = urljoin(final_url, http_response.getheader("Location"))
+                continue
+
+            if http_response.status >= 400:
+                raise HTTPError(final_url, http_response.status, http_response.reason, http_response.msg, None)
+
+            body = decode_body(http_response, body, final_url, max_body_size)
+            if self.cache is not None:
+                self.cache.put(final_url, http_response.getheader("ETag"),
+                               http_response.getheader("Last-Modified"), body)
+            return FetchResult(hyperlink, final_url, body)
+
+        raise HTTPError(final_url, 310, "Too many redirects", None, None)
+
+    def close(self):
+        with self.lock:
+            for idle_connections in self.idle_connections.values():
+                for connection in idle_connections:
+                    connection.close()
+            self.idle_connections.clear()
@@ -0,0 +1,211 @@
+import collections
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Stages of crawling a page that are timed.
+DNS_STAGE = "dns"
+CONNECT_STAGE = "connect"
+TTFB_STAGE = "ttfb"
+BODY_STAGE = "body"
+PARSE_STAGE = "parse"
+LINK_FILTER_STAGE = "link_filter"
+POLITENESS_STAGE = "politeness"
+
+# Stages summed up to tell what the crawl is bound by.
+STAGE_GROUPS = {
+    "network": (DNS_STAGE, CONNECT_STAGE, TTFB_STAGE, BODY_STAGE),
+    "parse": (PARSE_STAGE, LINK_FILTER_STAGE),
+    "politeness": (POLITENESS_STAGE,)
+}
+
+# Latency histogram buckets grow by 2^(1/8) i.e. ~9% from MIN_LATENCY_IN_SEC.
+MIN_LATENCY_IN_SEC = 1e-6
+BUCKET_GROWTH = 2 ** (1 / 8)
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram:
+    '''
+    Log-bucketed latency histogram. Bucket b holds the samples in
+    (MIN_LATENCY_IN_SEC * BUCKET_GROWTH^(b-1), MIN_LATENCY_IN_SEC * BUCKET_GROWTH^b],
+    so memory does not grow with the number of samples and percentiles
+    are reported within one bucket i.e. ~9% of the exact value.
+    '''
+
+    def __init__(self):
+        self.bucket_counts = collections.Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        bucket = 0
+        if seconds > MIN_LATENCY_IN_SEC:
+            bucket = math.ceil(math.log(seconds / MIN_LATENCY_IN_SEC, BUCKET_GROWTH))
+        self.bucket_counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        '''
+        :param percent: percentile e.g. 95
+        :return: upper bound of the bucket holding the percentile, 0 if there are no samples.
+        '''
+        if self.count == 0:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.bucket_counts):
+            seen += self.bucket_counts[bucket]
+            if seen >= rank:
+                return min(MIN_LATENCY_IN_SEC * BUCKET_GROWTH ** bucket, self.max)
+        return self.max
+
+    def summary(self):
+        summary = {
+            "count": self.count,
+            "total": round(self.total, 6),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6)
+        }
+        for percent in PERCENTILES:
+            summary["p" + str(percent)] = round(self.percentile(percent), 6)
+        return summary
+
+
+class CrawlMetrics:
+    '''
+    Per-stage latency histograms and throughput counters of a crawl.
+
+    Snapshots (pages, bytes, rolling and average pages/sec, a summary of
+    every stage and the stage group the crawl spent most time in) are
+    appended to a JSON-lines file every snapshot_interval seconds.
+    Queue depths e.g. of the pipelined crawl are sampled per page once
+    watched with watch_queues(). Safe to update from several threads.
+    '''
+
+    def __init__(self, snapshot_file_name=None, snapshot_interval=10, throughput_window=60):
+        '''
+        :param snapshot_file_name: JSON-lines file for the snapshots, None to not write them
+        :param snapshot_interval: seconds between two snapshots
+        :param throughput_window: seconds over which the rolling pages/sec is computed
+        '''
+        self.snapshot_file = open(snapshot_file_name, 'a', encoding="utf-8") if snapshot_file_name else None
+        self.snapshot_interval = snapshot_interval
+        self.throughput_window = throughput_window
+        self.histograms = collections.defaultdict(LatencyHistogram)
+        self.page_count = 0
+        self.byte_count = 0
+        self.page_times = collections.deque()
+        self.start_time = time.perf_counter()
+        self.last_snapshot_time = self.start_time
+        self.get_queue_depths = None
+        self.queue_depths = dict()
+        self.queue_depth_totals = collections.Counter()
+        self.queue_depth_maxima = collections.Counter()
+        self.queue_depth_sample_count = 0
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.histograms[stage].record(seconds)
+
+    @contextmanager
+    def measure(self, stage):
+        '''
+        Times the block under stage.
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def watch_queues(self, get_queue_depths):
+        '''
+        Samples the queue depths with every crawled page, snapshots then report
+        the current, mean and maximum depth of every queue, the stage after the
+        deepest queue being the one the crawl waits for.
+        :param get_queue_depths: function returning a dict of queue name vs depth
+        :return: None
+        '''
+        self.get_queue_depths = get_queue_depths
+
+    def add_bytes(self, byte_count):
+        with self.lock:
+            self.byte_count += byte_count
+
+    def page_crawled(self):
+        '''
+        Counts a crawled page and writes a snapshot if one is due.
+        :return: None
+        '''
+        now = time.perf_counter()
+        queue_depths = self.get_queue_depths() if self.get_queue_depths is not None else None
+        with self.lock:
+            self.page_count += 1
+            self.page_times.append(now)
+            while self.page_times[0] < now - self.throughput_window:
+                self.page_times.popleft()
+            if queue_depths is not None:
+                self.queue_depths = queue_depths
+                self.queue_depth_totals.update(queue_depths)
+                for name, depth in queue_depths.items():
+                    self.queue_depth_maxima[name] = max(self.queue_depth_maxima[name], depth)
+                self.queue_depth_sample_count += 1
+        if now - self.last_snapshot_time >= self.snapshot_interval:
+            self.write_snapshot()
+
+    def snapshot(self):
+        '''
+        :return: dict with the counters and the summary of every stage.
+        '''
+        now = time.perf_counter()
+        with self.lock:
+            elapsed = now - self.start_time
+            stages = {stage: histogram.summary() for stage, histogram in sorted(self.histograms.items())}
+            stage_group_totals = {group: round(sum(self.histograms[stage].total for stage in group_stages
+                                                   if stage in self.histograms), 6)
+                                  for group, group_stages in STAGE_GROUPS.items()}
+            rolling_span = min(self.throughput_window, elapsed)
+            snapshot = {
+                "timestamp": round(time.time(), 3),
+                "elapsed": round(elapsed, 3),
+                "pages": self.page_count,
+                "bytes": self.byte_count,
+                "pages_per_sec": round(len(self.page_times) / rolling_span, 3) if rolling_span > 0 else 0.0,
+                "average_pages_per_sec": round(self.page_count / elapsed, 3) if elapsed > 0 else 0.0,
+                "stages": stages,
+                "stage_group_totals": stage_group_totals,
+                "bound_by": max(stage_group_totals, key=stage_group_totals.get)
+            }
+            if self.queue_depth_sample_count > 0:
+                snapshot["queue_depths"] = {name: {"current": depth,
+                                                   "mean": round(self.queue_depth_totals[name] /
+                                                                 self.queue_depth_sample_count, 3),
+                                                   "max": self.queue_depth_maxima[name]}
+                                            for name, depth in self.queue_depths.items()}
+            return snapshot
+
+    def write_snapshot(self):
+        self.last_snapshot_time = time.perf_counter()
+        if self.snapshot_file is None:
+            return
+        snapshot = self.snapshot()
+        with self.lock:
+            self.snapshot_file.write(json.dumps(snapshot) + "\n")
+            self.snapshot_file.flush()
+
+    def close(self):
+        '''
+        Writes the final snapshot.
+        :return: None
+        '''
+        self.write_snapshot()
+        if self.snapshot_file is not None:
+            self.snapshot_file.close()
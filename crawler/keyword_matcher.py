@@ -0,0 +1,98 @@
+import bisect
+import functools
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Number of stemmed tokens kept by the stem cache.
+STEM_CACHE_SIZE = 100000
+
+# Characters of a token, the text is tokenized into maximal runs of them.
+TOKEN_CHARACTERS = "a-zA-Z'"
+
+# Separates the texts of a batch, it is never part of a token.
+BATCH_SEPARATOR = "\n"
+
+
+class KeywordMatcher:
+    '''
+    Matches text against the keyword of a focused crawl: a text matches
+    if one of its tokens stems to the keyword or to the keyword followed
+    by an english word i.e. a compound word like rainbow for rain.
+
+    Built once per crawl. Stems are kept in an LRU cache, and since the
+    Porter stemmer never changes the first character of a token, only
+    tokens starting with the first character of the keyword are stemmed.
+    '''
+
+    def __init__(self, keyword, stem, english_words_set, stem_cache_size=STEM_CACHE_SIZE):
+        '''
+        :param keyword: keyword
+        :param stem: stemming function e.g. PorterStemmer().stem
+        :param english_words_set: english words a compound word may end with,
+                                  including "" for the keyword itself
+        :param stem_cache_size: number of stems kept in the LRU cache
+        '''
+        self.keyword = keyword.lower()
+        self.english_words_set = english_words_set
+        self.stem = functools.lru_cache(maxsize=stem_cache_size)(stem)
+        if self.keyword == "":
+            self.candidate_token_regex = re.compile("[" + TOKEN_CHARACTERS + "]+")
+        elif re.fullmatch("[" + TOKEN_CHARACTERS + "]", self.keyword[0]):
+            self.candidate_token_regex = re.compile("(?<![" + TOKEN_CHARACTERS + "])" + re.escape(self.keyword[0]) +
+                                                    "[" + TOKEN_CHARACTERS + "]*")
+        else:
+            # no token can stem to the keyword
+            self.candidate_token_regex = re.compile("(?!)")
+
+    def is_token_matching(self, token):
+        try:
+            stemmed_token = self.stem(token)
+        except Exception:
+            # a token the stemmer fails on cannot match, the crawl goes on
+            logger.warning("Could not stem token %r", token, exc_info=True)
+            return False
+        return stemmed_token.startswith(self.keyword) \
+               and stemmed_token[len(self.keyword):] in self.english_words_set
+
+    def is_matching(self, text):
+        '''
+        :param text: text
+        :return: True if the text matches the keyword,
+                 False, otherwise.
+        '''
+        for candidate_token in self.candidate_token_regex.finditer(text.lower()):
+            if self.is_token_matching(candidate_token.group()):
+                return True
+        return False
+
+    def count_matches(self, text):
+        '''
+        :param text: text
+        :return: number of tokens of the text matching the keyword.
+        '''
+        return sum(1 for candidate_token in self.candidate_token_regex.finditer(text.lower())
+                   if self.is_token_matching(candidate_token.group()))
+
+    def match_all(self, texts):
+        '''
+        Matches all the texts e.g. the anchor texts of a page
+        with one regex pass over them.
+        :param texts: list of texts
+        :return: list of booleans, True for the texts matching the keyword.
+        '''
+        text_starts = []
+        position = 0
+        lowered_texts = []
+        for text in texts:
+            text_starts.append(position)
+            lowered_texts.append(text.lower())
+            position += len(lowered_texts[-1]) + len(BATCH_SEPARATOR)
+
+        matching = [False] * len(texts)
+        for candidate_token in self.candidate_token_regex.finditer(BATCH_SEPARATOR.join(lowered_texts)):
+            text_index = bisect.bisect_right(text_starts, candidate_token.start()) - 1
+            if not matching[text_index] and self.is_token_matching(candidate_token.group()):
+                matching[text_index] = True
+        return matching
@@ -0,0 +1,150 @@
+import re
+from html.parser import HTMLParser
+
+# size of the chunks fed to the parser, parsing stops at the
+# first chunk boundary after the content section has ended.
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+class ContentLinkExtractor(HTMLParser):
+    '''
+    Streaming extractor for the links of the content section i.e.
+    <div id="content" role="main">, built on html.parser.
+
+    No tree is built: the parser only keeps track of the div nesting
+    inside the content section and of the anchor being read, and
+    collects (anchor text, href) pairs in document order, the same
+    pairs the crawler gets from BeautifulSoup with find_all('a', href=True).
+    Optionally the text of the content section is collected too.
+    '''
+
+    def __init__(self, content_id="content", content_role="main"):
+        super().__init__(convert_charrefs=True)
+        self.content_id = content_id
+        self.content_role = content_role
+        self.reset_extraction()
+
+    def reset_extraction(self):
+        self.content_div_depth = 0
+        self.content_start_position = None
+        self.content_end_position = None
+        self.anchor_href = None
+        self.anchor_text = []
+        self.links = []
+        self.keep_text = False
+        self.text = []
+
+    def is_content_div(self, attrs):
+        attrs = dict(attrs)
+        return attrs.get("id") == self.content_id and attrs.get("role") == self.content_role
+
+    def handle_starttag(self, tag, attrs):
+        if self.content_end_position is not None:
+            return
+        if self.content_div_depth == 0:
+            if tag == "div" and self.is_content_div(attrs):
+                self.content_div_depth = 1
+                self.content_start_position = self.getpos()
+            return
+
+        if tag == "div":
+            self.content_div_depth += 1
+        elif tag == "a":
+            self.end_anchor()
+            href = dict(attrs).get("href")
+            if href is not None:
+                self.anchor_href = href
+
+    def handle_startendtag(self, tag, attrs):
+        # <a href="..."/> has no anchor text, <div/> does not change the nesting.
+        if self.content_div_depth > 0 and self.content_end_position is None and tag == "a":
+            self.end_anchor()
+            href = dict(attrs).get("href")
+            if href is not None:
+                self.links.append(("", href))
+
+    def handle_endtag(self, tag):
+        if self.content_div_depth == 0 or self.content_end_position is not None:
+            return
+        if tag == "a":
+            self.end_anchor()
+        elif tag == "div":
+            self.content_div_depth -= 1
+            if self.content_div_depth == 0:
+                self.end_anchor()
+                self.content_end_position = self.getpos()
+
+    def handle_data(self, data):
+        if self.anchor_href is not None:
+            self.anchor_text.append(data)
+        if self.keep_text and self.content_div_depth > 0 and self.content_end_position is None:
+            self.text.append(data)
+
+    def end_anchor(self):
+        if self.anchor_href is not None:
+            self.links.append(("".join(self.anchor_text), self.anchor_href))
+        self.anchor_href = None
+        self.anchor_text = []
+
+    def is_content_done(self):
+        return self.content_end_position is not None
+
+    def extract(self, raw_html, keep_content=False, keep_text=False):
+        '''
+        Extracts the links of the content section.
+        :param raw_html: raw html, bytes are decoded as utf-8
+        :param keep_content: also return the html of the content section
+        :param keep_text: also collect the text of the content section, see get_text
+        :return: tuple (<content section html or None>, <list of (anchor text, href)>),
+                 the content section html is None if it was not kept or not found.
+        '''
+        if isinstance(raw_html, bytes):
+            raw_html = raw_html.decode("utf-8", errors="replace")
+
+        self.reset()
+        self.reset_extraction()
+        self.keep_text = keep_text
+        for chunk_start in range(0, len(raw_html), FEED_CHUNK_SIZE):
+            self.feed(raw_html[chunk_start:chunk_start + FEED_CHUNK_SIZE])
+            if self.is_content_done():
+                break
+        else:
+            self.close()
+        self.end_anchor()
+
+        content = None
+        if keep_content and self.content_start_position is not None:
+            content = self.get_content_html(raw_html)
+        return content, self.links
+
+    def get_text(self):
+        '''
+        :return: text of the content section of the last extraction,
+                 if it was extracted with keep_text.
+        '''
+        return " ".join(self.text)
+
+    def get_content_html(self, raw_html):
+        '''
+        :param raw_html: the raw html that was extracted
+        :return: html of the content section, from its start tag to
+                 the end of its end tag (or the end of the document).
+        '''
+        line_starts = [0] + [match.end() for match in re.finditer("\n", raw_html)]
+        start_line, start_column = self.content_start_position
+        start = line_starts[start_line - 1] + start_column
+        if self.content_end_position is None:
+            return raw_html[start:]
+        end_line, end_column = self.content_end_position
+        end = raw_html.index(">", line_starts[end_line - 1] + end_column) + 1
+        return raw_html[start:end]
+
+
+def extract_content_links(raw_html, keep_content=False):
+    '''
+    Convenience wrapper around ContentLinkExtractor.extract.
+    :param raw_html: raw html
+    :param keep_content: also return the html of the content section
+    :return: tuple (<content section html or None>, <list of (anchor text, href)>)
+    '''
+    return ContentLinkExtractor().extract(raw_html, keep_content)
@@ -0,0 +1,84 @@
+import collections
+import hashlib
+import re
+
+# Number of bits in a SimHash fingerprint.
+FINGERPRINT_BITS = 64
+
+TOKEN_REGEX = re.compile(r"\w+")
+
+
+def hash_token(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def compute_simhash(text):
+    '''
+    Computes the 64 bit SimHash fingerprint of the text,
+    using its case folded word tokens weighted by term frequency.
+    :param text: text
+    :return: fingerprint as int
+    '''
+    bit_weights = [0] * FINGERPRINT_BITS
+    for token, tf in collections.Counter(TOKEN_REGEX.findall(text.lower())).items():
+        token_hash = hash_token(token)
+        for bit in range(FINGERPRINT_BITS):
+            if token_hash >> bit & 1:
+                bit_weights[bit] += tf
+            else:
+                bit_weights[bit] -= tf
+
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        if bit_weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(fingerprint, other_fingerprint):
+    return bin(fingerprint ^ other_fingerprint).count("1")
+
+
+class SimHashIndex:
+    '''
+    Banded LSH index over SimHash fingerprints.
+
+    Fingerprints are split into band_count bands and bucketed by each
+    band. Two fingerprints within max_distance bits of each other agree
+    on at least one band whenever band_count > max_distance, so only
+    the fingerprints sharing a bucket need to be compared.
+    '''
+
+    def __init__(self, max_distance=3, band_count=4):
+        if band_count <= max_distance:
+            raise ValueError("band_count must be greater than max_distance")
+        self.max_distance = max_distance
+        self.band_count = band_count
+        self.band_bits = FINGERPRINT_BITS // band_count
+        self.band_mask = (1 << self.band_bits) - 1
+        self.buckets = [dict() for band in range(band_count)]
+
+    def get_bands(self, fingerprint):
+        return [(fingerprint >> (band * self.band_bits)) & self.band_mask for band in range(self.band_count)]
+
+    def find(self, fingerprint):
+        '''
+        :param fingerprint: fingerprint
+        :return: doc id of the first indexed near-duplicate of the fingerprint,
+                 None, if there is none.
+        '''
+        for band, band_value in enumerate(self.get_bands(fingerprint)):
+            for other_fingerprint, doc_id in self.buckets[band].get(band_value, ()):
+                if hamming_distance(fingerprint, other_fingerprint) <= self.max_distance:
+                    return doc_id
+        return None
+
+    def add(self, fingerprint, doc_id):
+        '''
+        Indexes the fingerprint of doc id.
+        :param fingerprint: fingerprint
+        :param doc_id: doc id
+        :return: None
+        '''
+        for band, band_value in enumerate(self.get_bands(fingerprint)):
+            self.buckets[band].setdefault(band_value, []).append((fingerprint, doc_id))
@@ -0,0 +1,246 @@
+import multiprocessing
+import queue
+import time
+import zlib
+
+from crawler.async_fetcher import HostPolitenessPolicy
+
+# Number of links buffered for a partition before they are sent to it.
+ROUTE_BATCH_SIZE = 500
+
+# Seconds between checks that no worker died while waiting for results.
+RESULT_POLL_INTERVAL_IN_SEC = 1
+
+# Committed page (<DEPTH>, <COMMIT_TIME>, <DOC_ID>, <Anchor-Text>, <URL>),
+# sorting committed pages orders them the way a single BFS crawl would commit them.
+COMMITTED_PAGE_DEPTH_INDEX = 0
+COMMITTED_PAGE_DOC_ID_INDEX = 2
+
+
+def get_partition(hyperlink, partition_count):
+    '''
+    :param hyperlink: hyperlink
+    :param partition_count: number of partitions
+    :return: index of the partition owning the hyperlink,
+             the same in every process unlike hash().
+    '''
+    # the '#' part is truncated before the hyperlink is crawled,
+    # so links to sections of a page belong with the page.
+    return zlib.crc32(hyperlink.split('#', 1)[0].encode("utf-8")) % partition_count
+
+
+class SharedHostPolitenessPolicy(HostPolitenessPolicy):
+    '''
+    HostPolitenessPolicy shared by the worker processes, so
+    requests to a host stay politeness_delay seconds apart
+    however many partitions crawl it.
+    '''
+
+    def __init__(self, politeness_delay, next_slot_by_host, lock):
+        '''
+        :param politeness_delay: politeness delay in seconds
+        :param next_slot_by_host: dict shared between processes e.g. a Manager dict
+        :param lock: multiprocessing lock guarding next_slot_by_host
+        '''
+        super().__init__(politeness_delay)
+        self.next_slot_by_host = next_slot_by_host
+        self.lock = lock
+
+    def reserve_slot_time(self, host):
+        with self.lock:
+            return super().reserve_slot_time(host)
+
+
+class CrawlPartition:
+    '''
+    One worker's share of a hash-partitioned crawl, every URL is owned by
+    the partition get_partition maps it to, which alone keeps it in its
+    frontier and visited links.
+
+    Partitions crawl one depth at a time: links discovered for other
+    partitions are routed to their inboxes, and at the end of a depth
+    every partition sends an end-of-depth marker to all the others and
+    takes in the routed links until it has the markers of all of them.
+    A URL is thus always found at its shallowest depth, as in the
+    single process BFS crawl, and the page budget is shared.
+    '''
+
+    def __init__(self, index, partition_count, inboxes, result_queue, politeness_policy,
+                 reserved_page_count, page_budget, frontier_sizes, barrier):
+        self.index = index
+        self.partition_count = partition_count
+        self.inboxes = inboxes
+        self.result_queue = result_queue
+        self.politeness_policy = politeness_policy
+        self.reserved_page_count = reserved_page_count
+        self.page_budget = page_budget
+        self.frontier_sizes = frontier_sizes
+        self.barrier = barrier
+        self.routed_links = dict()
+        self.committed_pages = []
+
+    def is_owned(self, hyperlink):
+        return get_partition(hyperlink, self.partition_count) == self.index
+
+    def route(self, anchor_text, hyperlink, inlink_doc_id):
+        '''
+        Buffers a link discovered for the partition owning the hyperlink.
+        :param anchor_text: anchor text
+        :param hyperlink: hyperlink
+        :param inlink_doc_id: doc id of the page the link was found on
+        :return: None
+        '''
+        owner = get_partition(hyperlink, self.partition_count)
+        links = self.routed_links.setdefault(owner, [])
+        links.append((anchor_text, hyperlink, inlink_doc_id))
+        if len(links) >= ROUTE_BATCH_SIZE:
+            self.send_routed_links()
+
+    def send_routed_links(self):
+        for owner, links in self.routed_links.items():
+            self.inboxes[owner].put((self.index, links))
+        self.routed_links.clear()
+
+    def end_depth(self, discover_links):
+        '''
+        Exchanges the links discovered at this depth with the other partitions.
+        :param discover_links: function called with each list of
+                               (anchor text, hyperlink, inlink doc id) routed to this partition
+        :return: None
+        '''
+        self.send_routed_links()
+        for partition_index in range(self.partition_count):
+            if partition_index != self.index:
+                self.inboxes[partition_index].put((self.index, None))
+
+        ended_partition_count = 0
+        while ended_partition_count < self.partition_count - 1:
+            sender, links = self.inboxes[self.index].get()
+            if links is None:
+                ended_partition_count += 1
+            else:
+                discover_links(links)
+
+    def is_crawl_done(self, frontier_size):
+        '''
+        Waits for all partitions to end the depth.
+        :param frontier_size: number of frontier items of this partition
+        :return: True if every frontier is empty or the page budget is spent.
+        '''
+        self.frontier_sizes[self.index] = frontier_size
+        self.barrier.wait()
+        done = sum(self.frontier_sizes) == 0 or self.reserved_page_count.value >= self.page_budget
+        # nobody updates frontier_sizes before all partitions have read it
+        self.barrier.wait()
+        return done
+
+    def reserve_page(self):
+        '''
+        :return: True if the page budget allows one more page to be crawled.
+        '''
+        with self.reserved_page_count.get_lock():
+            if self.reserved_page_count.value >= self.page_budget:
+                return False
+            self.reserved_page_count.value += 1
+            return True
+
+    def release_page(self):
+        '''
+        Gives back a reserved page that was not committed.
+        :return: None
+        '''
+        with self.reserved_page_count.get_lock():
+            self.reserved_page_count.value -= 1
+
+    def page_committed(self, doc_id, anchor_text, hyperlink, depth):
+        self.committed_pages.append((depth, time.time(), doc_id, anchor_text, hyperlink))
+
+    def send_result(self, inlinks):
+        '''
+        Sends the committed pages and the in-links of this partition to the parent.
+        :param inlinks: dict of doc id vs in-link buffer
+        :return: None
+        '''
+        self.result_queue.put((self.index, self.committed_pages, inlinks))
+
+    def abort(self):
+        '''
+        Lets the other partitions fail instead of waiting for this one.
+        :return: None
+        '''
+        self.barrier.abort()
+        for inbox in self.inboxes:
+            inbox.cancel_join_thread()
+
+
+def create_partitions(partition_count, politeness_delay, page_budget, manager):
+    '''
+    :param partition_count: number of partitions
+    :param politeness_delay: politeness delay in seconds
+    :param page_budget: number of pages to crawl across all partitions
+    :param manager: multiprocessing Manager holding the politeness schedule
+    :return: tuple (<list of CrawlPartition>, <result queue>)
+    '''
+    inboxes = [multiprocessing.Queue() for partition_index in range(partition_count)]
+    result_queue = multiprocessing.Queue()
+    politeness_policy = SharedHostPolitenessPolicy(politeness_delay, manager.dict(), multiprocessing.Lock())
+    reserved_page_count = multiprocessing.Value("i", 0)
+    frontier_sizes = multiprocessing.Array("i", partition_count)
+    barrier = multiprocessing.Barrier(partition_count)
+    return [CrawlPartition(partition_index, partition_count, inboxes, result_queue, politeness_policy,
+                           reserved_page_count, page_budget, frontier_sizes, barrier)
+            for partition_index in range(partition_count)], result_queue
+
+
+def collect_partition_results(result_queue, processes):
+    '''
+    :param result_queue: result queue of the partitions
+    :param processes: worker processes
+    :return: list of (<partition index>, <committed pages>, <in-links>),
+             raises RuntimeError if a worker dies before sending its result.
+    '''
+    partition_results = []
+    while len(partition_results) < len(processes):
+        try:
+            partition_results.append(result_queue.get(timeout=RESULT_POLL_INTERVAL_IN_SEC))
+        except queue.Empty:
+            if any(process.exitcode not in (None, 0) for process in processes):
+                raise RuntimeError("A partition worker failed")
+    return partition_results
+
+
+def merge_partition_results(partition_results, graph_file_name, links_file_name):
+    '''
+    Merges the partitions into one crawl: pages are ordered by depth and
+    commit time and given global doc ids 1, 2, ... in that order, then
+    the links file and the graph file are written as the single process
+    crawl writes them.
+    :param partition_results: list of (<partition index>, <committed pages>, <in-links>)
+    :param graph_file_name: graph file name
+    :param links_file_name: links file name
+    :return: number of pages crawled.
+    '''
+    committed_pages = sorted(committed_page for partition_index, partition_pages, partition_inlinks in partition_results
+                             for committed_page in partition_pages)
+    global_doc_ids = {committed_page[COMMITTED_PAGE_DOC_ID_INDEX]: page_number
+                      for page_number, committed_page in enumerate(committed_pages, 1)}
+
+    with open(links_file_name, 'w', encoding="utf-8") as links_file:
+        current_depth = 1
+        for page_number, (depth, commit_time, doc_id, anchor_text, hyperlink) in enumerate(committed_pages, 1):
+            if depth != current_depth:
+                links_file.write("\n\n\nDEPTH:" + str(depth) + "\n")
+                current_depth = depth
+            links_file.write(str(page_number) + "|D" + str(global_doc_ids[doc_id]) + "|" + anchor_text + "|" + hyperlink + "\n")
+
+    inlinks = dict()
+    for partition_index, partition_pages, partition_inlinks in partition_results:
+        for doc_id, inlink_doc_ids in partition_inlinks.items():
+            inlinks[global_doc_ids[doc_id]] = {global_doc_ids[inlink_doc_id] for inlink_doc_id in inlink_doc_ids}
+
+    with open(graph_file_name, 'w', encoding="utf-8") as graph_file:
+        for page_number in range(1, len(committed_pages) + 1):
+            graph_file.write("D" + str(page_number) + " " +
+                             " ".join("D" + str(inlink) for inlink in sorted(inlinks.get(page_number, ()))))
+            graph_file.write("\n")
+    return len(committed_pages)
@@ -0,0 +1,177 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from crawler.async_fetcher import DEFAULT_MAX_IN_FLIGHT, HostPolitenessPolicy, blocking_fetch, get_host
+from crawler.instrumentation import PARSE_STAGE, POLITENESS_STAGE
+
+DEFAULT_PARSER_COUNT = 2
+
+# Items a stage queue holds before the stage feeding it waits.
+DEFAULT_QUEUE_SIZE = 16
+
+# Start method of the parser processes. The pipeline is created with the
+# fetcher and writer threads already running, a forked child could inherit
+# a lock one of them holds, so parsers start from a fork server instead.
+PARSER_START_METHOD = "forkserver"
+
+
+class CrawlPipeline:
+    '''
+    Fetch and parse stages of a pipelined crawl, connected by bounded queues:
+
+        schedule() -> fetch queue -> fetchers -> parse queue -> parsers -> result()
+
+    Fetchers are asyncio tasks applying the politeness delay per host and
+    running the blocking fetches in a thread pool. Parsers hand the bodies
+    to a process pool, so parsing does not compete with the committer for
+    the GIL. The committer schedules hyperlinks in the order it is going to
+    commit them and collects them with result(), the writer stage is the
+    caller's e.g. a CrawlLogWriter with a writer thread.
+
+    A full parse queue holds the fetchers back and a full fetch queue makes
+    schedule() refuse hyperlinks, so no stage runs ahead of a slower one.
+    get_queue_depths() tells which stage the others are waiting for.
+    '''
+
+    def __init__(self, politeness_delay, parse, fetch=blocking_fetch, fetcher_count=DEFAULT_MAX_IN_FLIGHT,
+                 parser_count=DEFAULT_PARSER_COUNT, queue_size=DEFAULT_QUEUE_SIZE, politeness_policy=None,
+                 parser_initializer=None, parser_initargs=(), metrics=None):
+        '''
+        Must be created on the running event loop.
+        :param politeness_delay: politeness delay in seconds, unless politeness_policy is given
+        :param parse: function of the body returning the parsed page, run in
+                      the parser processes so it must be picklable by reference i.e.
+                      a module level function of an importable module
+        :param fetch: fetch backend, a function of the hyperlink returning a FetchResult
+        :param fetcher_count: number of fetches in flight at once
+        :param parser_count: number of parser processes
+        :param queue_size: capacity of the fetch queue and of the parse queue
+        :param politeness_policy: HostPolitenessPolicy to space the requests to every host
+        :param parser_initializer: function run in every parser process before it parses
+        :param parser_initargs: arguments of parser_initializer
+        :param metrics: CrawlMetrics to record the politeness wait and the parse time in,
+                        parsers cannot record it themselves
+        '''
+        self.politeness_policy = politeness_policy or HostPolitenessPolicy(politeness_delay)
+        self.parse = parse
+        self.fetch = fetch
+        self.metrics = metrics
+        self.fetch_queue = asyncio.Queue(queue_size)
+        self.parse_queue = asyncio.Queue(queue_size)
+        self.fetch_executor = ThreadPoolExecutor(max_workers=fetcher_count)
+        self.parse_executor = ProcessPoolExecutor(max_workers=parser_count,
+                                                  mp_context=multiprocessing.get_context(PARSER_START_METHOD),
+                                                  initializer=parser_initializer, initargs=parser_initargs)
+        self.results = dict()
+        self.fetching_count = 0
+        self.parsing_count = 0
+        self.workers = [asyncio.ensure_future(self.run_fetcher()) for fetcher in range(fetcher_count)] + \
+                       [asyncio.ensure_future(self.run_parser()) for parser in range(parser_count)]
+
+    def is_scheduled(self, hyperlink):
+        return hyperlink in self.results
+
+    def pending_count(self):
+        return len(self.results)
+
+    def schedule(self, hyperlink):
+        '''
+        Queues the hyperlink for the fetchers, unless it is already scheduled.
+        :param hyperlink: hyperlink
+        :return: True if the hyperlink is scheduled,
+                 False, if the fetch queue is full.
+        '''
+        if hyperlink in self.results:
+            return True
+        if self.fetch_queue.full():
+            return False
+        self.results[hyperlink] = asyncio.get_event_loop().create_future()
+        self.fetch_queue.put_nowait(hyperlink)
+        return True
+
+    async def result(self, hyperlink):
+        '''
+        Waits for the hyperlink to go through the pipeline, scheduling it first if needed.
+        :param hyperlink: hyperlink
+        :return: tuple (<URL after redirects>, <parsed page>), raises the fetch or parse error if any.
+        '''
+        if hyperlink not in self.results:
+            self.results[hyperlink] = asyncio.get_event_loop().create_future()
+            await self.fetch_queue.put(hyperlink)
+        try:
+            return await self.results[hyperlink]
+        finally:
+            del self.results[hyperlink]
+
+    def set_result(self, hyperlink, result=None, error=None):
+        future = self.results.get(hyperlink)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def run_fetcher(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            hyperlink = await self.fetch_queue.get()
+            politeness_wait = await self.politeness_policy.wait(get_host(hyperlink))
+            if self.metrics is not None:
+                self.metrics.record(POLITENESS_STAGE, politeness_wait)
+            self.fetching_count += 1
+            try:
+                fetch_result = await loop.run_in_executor(self.fetch_executor, self.fetch, hyperlink)
+            except Exception as error:
+                self.set_result(hyperlink, error=error)
+                continue
+            finally:
+                self.fetching_count -= 1
+            await self.parse_queue.put((hyperlink, fetch_result))
+
+    async def run_parser(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            hyperlink, fetch_result = await self.parse_queue.get()
+            self.parsing_count += 1
+            start = time.perf_counter()
+            try:
+                parsed_page = await loop.run_in_executor(self.parse_executor, self.parse, fetch_result.body)
+            except Exception as error:
+                self.set_result(hyperlink, error=error)
+                continue
+            finally:
+                self.parsing_count -= 1
+            if self.metrics is not None:
+                self.metrics.record(PARSE_STAGE, time.perf_counter() - start)
+            self.set_result(hyperlink, (fetch_result.final_url, parsed_page))
+
+    def get_queue_depths(self):
+        '''
+        :return: dict of stage vs number of hyperlinks waiting for it or in it:
+                 fetch_queue, fetching, parse_queue, parsing and commit i.e.
+                 parsed pages the committer has not collected yet.
+        '''
+        return {
+            "fetch_queue": self.fetch_queue.qsize(),
+            "fetching": self.fetching_count,
+            "parse_queue": self.parse_queue.qsize(),
+            "parsing": self.parsing_count,
+            "commit": sum(1 for future in self.results.values() if future.done())
+        }
+
+    async def close(self):
+        '''
+        Stops the stages, dropping the hyperlinks still in them.
+        :return: None
+        '''
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        for future in self.results.values():
+            future.cancel()
+        self.results.clear()
+        self.fetch_executor.shutdown(wait=False)
+        self.parse_executor.shutdown(wait=True, cancel_futures=True)
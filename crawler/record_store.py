@@ -0,0 +1,130 @@
+import json
+import os
+import zlib
+
+# Every record starts with this marker, followed by a JSON header line
+# and the zlib compressed content.
+RECORD_MARKER = b"RECORD/1.0 "
+
+INDEX_FILE_SUFFIX = ".idx"
+
+INDEX_DELIMITER = "|"
+
+
+def get_index_path(store_path):
+    return store_path + INDEX_FILE_SUFFIX
+
+
+class RecordStoreWriter:
+    '''
+    Append-only store of raw page content, WARC-like: every record holds
+    the doc id, the URL and the zlib compressed content of one page.
+
+    A sidecar index file (<store_path>.idx) has one line per record,
+    <DOC_ID>|<OFFSET>|<LENGTH>|<URL>, so readers can seek straight to
+    any record and several readers can work on the store at once.
+    '''
+
+    def __init__(self, store_path, offsets=None, compression_level=6):
+        '''
+        :param store_path: path of the store
+        :param offsets: offsets returned by tell(), to resume writing a store
+                        truncated to them, None to start a new store
+        :param compression_level: zlib compression level
+        '''
+        self.compression_level = compression_level
+        if offsets is None:
+            self.store_file = open(store_path, 'wb')
+            self.index_file = open(get_index_path(store_path), 'w', encoding="utf-8")
+        else:
+            store_offset, index_offset = offsets
+            self.store_file = open(store_path, 'ab')
+            self.store_file.truncate(store_offset)
+            self.store_file.seek(0, os.SEEK_END)
+            self.index_file = open(get_index_path(store_path), 'a', encoding="utf-8")
+            self.index_file.truncate(index_offset)
+            self.index_file.seek(0, os.SEEK_END)
+
+    def write_record(self, doc_id, hyperlink, content):
+        '''
+        Appends a record.
+        :param doc_id: doc id of the page
+        :param hyperlink: URL of the page
+        :param content: content of the page
+        :return: None
+        '''
+        compressed_content = zlib.compress(content.encode("utf-8"), self.compression_level)
+        header = json.dumps({"doc_id": doc_id, "url": hyperlink, "length": len(compressed_content)})
+        record = RECORD_MARKER + header.encode("utf-8") + b"\n" + compressed_content + b"\n"
+
+        offset = self.store_file.tell()
+        self.store_file.write(record)
+        self.index_file.write(INDEX_DELIMITER.join((doc_id, str(offset), str(len(record)), hyperlink)) + "\n")
+
+    def flush(self):
+        self.store_file.flush()
+        self.index_file.flush()
+
+    def tell(self):
+        '''
+        :return: offsets of the store and the index, to resume writing from.
+        '''
+        self.flush()
+        return self.store_file.tell(), self.index_file.tell()
+
+    def close(self):
+        self.store_file.close()
+        self.index_file.close()
+
+
+def decode_record(record):
+    '''
+    :param record: bytes of one record
+    :return: tuple (<doc id>, <URL>, <content>)
+    '''
+    if not record.startswith(RECORD_MARKER):
+        raise ValueError("Not a record")
+    header_end = record.index(b"\n")
+    header = json.loads(record[len(RECORD_MARKER):header_end].decode("utf-8"))
+    compressed_content = record[header_end + 1:header_end + 1 + header["length"]]
+    return header["doc_id"], header["url"], zlib.decompress(compressed_content).decode("utf-8")
+
+
+class RecordStoreReader:
+    '''
+    Reads records of a store written by RecordStoreWriter,
+    by doc id or all of them in the order they were written.
+    '''
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self.index = dict()
+        with open(get_index_path(store_path), 'r', encoding="utf-8") as index_file:
+            for index_item in index_file:
+                index_item = index_item.rstrip("\n")
+                if index_item == "":
+                    continue
+                doc_id, offset, length, hyperlink = index_item.split(INDEX_DELIMITER, 3)
+                self.index[doc_id] = (int(offset), int(length), hyperlink)
+
+    def __len__(self):
+        return len(self.index)
+
+    def get_doc_ids(self):
+        return list(self.index.keys())
+
+    def read_record(self, doc_id):
+        '''
+        :param doc_id: doc id
+        :return: tuple (<doc id>, <URL>, <content>) of the doc id.
+        '''
+        offset, length, hyperlink = self.index[doc_id]
+        with open(self.store_path, 'rb') as store_file:
+            store_file.seek(offset)
+            return decode_record(store_file.read(length))
+
+    def __iter__(self):
+        with open(self.store_path, 'rb') as store_file:
+            for offset, length, hyperlink in sorted(self.index.values()):
+                store_file.seek(offset)
+                yield decode_record(store_file.read(length))
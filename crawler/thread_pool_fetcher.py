@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from crawler.async_fetcher import DEFAULT_MAX_IN_FLIGHT, HostPolitenessPolicy, get_host, get_time_until
+from crawler.instrumentation import POLITENESS_STAGE
+
+
+class ThreadPoolFetcher:
+    '''
+    Thread-pool counterpart of AsyncFetcher for deployments that cannot
+    use asyncio. Worker threads run work(hyperlink), typically a fetch
+    followed by the html parse, while the calling thread stays the only
+    one that commits results, in the order it asks for them.
+    Given a CrawlMetrics, the politeness wait of every worker is recorded.
+    '''
+
+    def __init__(self, politeness_delay, work, max_in_flight=DEFAULT_MAX_IN_FLIGHT, politeness_policy=None,
+                 metrics=None):
+        self.politeness_policy = politeness_policy or HostPolitenessPolicy(politeness_delay)
+        self.metrics = metrics
+        self.work = work
+        self.max_in_flight = max_in_flight
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.futures = dict()
+
+    def is_scheduled(self, hyperlink):
+        return hyperlink in self.futures
+
+    def pending_count(self):
+        return len(self.futures)
+
+    def schedule(self, hyperlink):
+        '''
+        Hands the hyperlink to a worker thread, unless it is already scheduled.
+        The politeness slot is reserved here, on the committing thread,
+        so slots are handed out in frontier order. The worker waits until
+        the slot time, not for a delay, as it may start after the slot.
+        :param hyperlink: hyperlink
+        :return: None
+        '''
+        if hyperlink not in self.futures:
+            slot = self.politeness_policy.reserve_slot_time(get_host(hyperlink))
+            self.futures[hyperlink] = self.executor.submit(self.internal_work, hyperlink, slot)
+
+    def internal_work(self, hyperlink, slot):
+        politeness_wait = get_time_until(slot)
+        time.sleep(politeness_wait)
+        if self.metrics is not None:
+            self.metrics.record(POLITENESS_STAGE, politeness_wait)
+        return self.work(hyperlink)
+
+    def result(self, hyperlink):
+        '''
+        Waits for the work of the hyperlink, scheduling it first if needed.
+        :param hyperlink: hyperlink
+        :return: result of work(hyperlink), raises the worker error if any.
+        '''
+        self.schedule(hyperlink)
+        return self.futures.pop(hyperlink).result()
+
+    def close(self):
+        '''
+        Cancels work that was scheduled but never collected.
+        :return: None
+        '''
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,48 @@
+from urllib.parse import urlsplit
+
+ENGLISH_WIKIPEDIA_HOST = "en.wikipedia"
+WIKIPEDIA_HOST = "wikipedia"
+
+# Pages every crawl skips.
+MAIN_PAGE_URLS = ("https://en.wikipedia.org/wiki/Main_Page", "https://www.wikipedia.org/")
+
+
+def get_site_url(prefix_to_follow):
+    '''
+    :param prefix_to_follow: prefix of the hyperlinks to follow e.g. "https://en.wikipedia.org/wiki"
+    :return: scheme and host (with port) of the prefix e.g. "https://en.wikipedia.org",
+             the site relative links such as "/wiki/Solar_eclipse" point to.
+    '''
+    split_prefix = urlsplit(prefix_to_follow)
+    return split_prefix.scheme + "://" + split_prefix.netloc
+
+
+def compile_url_filter(prefix_to_follow, excluded_urls=()):
+    '''
+    Compiles the crawl scope rules of a hyperlink into a single check:
+    it starts with prefix_to_follow, is not a page section i.e. does
+    not start with '#', has no ':' past the scheme and host i.e. is not
+    administrative (a port is allowed), points to an English article
+    i.e. contains "en.wikipedia" and is not one of excluded_urls.
+
+    The rules prefix_to_follow already decides are dropped from the check,
+    so for "https://en.wikipedia.org/wiki" it is a prefix test, a search for
+    ':' and a set lookup. A precompiled regex of the same rules is slower.
+    A prefix on a host other than Wikipedia e.g. a local fixture server
+    "http://127.0.0.1:8000/wiki" decides the English article rule too.
+    :param prefix_to_follow: prefix of the hyperlinks to follow
+    :param excluded_urls: hyperlinks never followed e.g. MAIN_PAGE_URLS
+    :return: function of a hyperlink returning True if it is in the crawl scope,
+             False, otherwise.
+    '''
+    excluded_urls = frozenset(excluded_urls)
+    # a ':' past the scheme and host marks an administrative page e.g. /wiki/Help:Contents
+    path_start = len(get_site_url(prefix_to_follow))
+    if prefix_to_follow.startswith("#") or prefix_to_follow.find(":", path_start) != -1:
+        return lambda hyperlink: False
+    site_host = urlsplit(prefix_to_follow).netloc
+    if ENGLISH_WIKIPEDIA_HOST in prefix_to_follow or (site_host != "" and WIKIPEDIA_HOST not in site_host):
+        return lambda hyperlink: hyperlink.startswith(prefix_to_follow) and hyperlink.find(":", path_start) == -1 \
+                                 and hyperlink not in excluded_urls
+    return lambda hyperlink: hyperlink.startswith(prefix_to_follow) and hyperlink.find(":", path_start) == -1 \
+                             and ENGLISH_WIKIPEDIA_HOST in hyperlink and hyperlink not in excluded_urls
@@ -0,0 +1,169 @@
+import hashlib
+import math
+from array import array
+
+# In-link buffers hold doc ids as unsigned ints.
+INLINK_TYPECODE = "I"
+
+
+def hash_url(hyperlink):
+    '''
+    :param hyperlink: hyperlink
+    :return: tuple of two 64 bit integer hashes of the hyperlink.
+    '''
+    digest = hashlib.blake2b(hyperlink.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+
+def get_url_key(url_hash):
+    '''
+    :param url_hash: tuple of two 64 bit integer hashes, see hash_url
+    :return: the two hashes as one 128 bit integer, a smaller dict key than the tuple.
+    '''
+    return url_hash[0] << 64 | url_hash[1]
+
+
+def create_inlinks(doc_ids=()):
+    '''
+    :param doc_ids: iterable of integer doc ids
+    :return: in-link buffer of the doc ids, an array that may hold duplicates,
+             they are dropped when the graph is written.
+    '''
+    return array(INLINK_TYPECODE, doc_ids)
+
+
+class BloomFilter:
+    '''
+    Bloom filter over precomputed hash pairs, sized for capacity
+    items at the given false positive rate. Uses double hashing
+    i.e. the i-th bit index is (h1 + i * h2) mod bit_count.
+    '''
+
+    def __init__(self, capacity, false_positive_rate=0.001):
+        capacity = max(capacity, 1)
+        self.bit_count = max(8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.bit_count / capacity * math.log(2))))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+
+    def get_bit_indexes(self, url_hash):
+        h1, h2 = url_hash
+        return ((h1 + i * h2) % self.bit_count for i in range(self.hash_count))
+
+    def add(self, url_hash):
+        for bit_index in self.get_bit_indexes(url_hash):
+            self.bits[bit_index >> 3] |= 1 << (bit_index & 7)
+
+    def __contains__(self, url_hash):
+        for bit_index in self.get_bit_indexes(url_hash):
+            if not self.bits[bit_index >> 3] & (1 << (bit_index & 7)):
+                return False
+        return True
+
+
+class VisitedStore:
+    '''
+    Compact store of visited URLs.
+
+    URLs are not kept, only their hashes: a Bloom filter answers most
+    "not visited" lookups, and an exact map of the full 128 bit URL hash
+    to doc id confirms Bloom filter hits, so a URL is only reported
+    visited by a false positive if its hash collides with a visited one,
+    with a probability of about n^2 / 2^129 for n visited URLs. In-links are kept separately, keyed by integer
+    doc id, as in-link buffers (see create_inlinks): appending to an
+    array costs 4 bytes per link against a set's hash table entries.
+    With an edge log set (see set_edge_log) in-links are appended to
+    the log instead, and none are kept in memory.
+
+    Several URLs can be aliases of the same doc id, the length of the
+    store is the number of distinct doc ids.
+    '''
+
+    def __init__(self, expected_url_count, false_positive_rate=0.001):
+        self.bloom_filter = BloomFilter(expected_url_count, false_positive_rate)
+        self.doc_id_by_url_hash = dict()
+        self.inlinks_by_doc_id = dict()
+        self.doc_count = 0
+        self.edge_log = None
+
+    def __len__(self):
+        return self.doc_count
+
+    def __getstate__(self):
+        # the edge log is checkpointed by its offset, set it again after a restore
+        state = self.__dict__.copy()
+        state["edge_log"] = None
+        return state
+
+    def set_edge_log(self, edge_log):
+        '''
+        :param edge_log: EdgeLogWriter to write the in-links to
+        :return: None
+        '''
+        self.edge_log = edge_log
+
+    def __contains__(self, hyperlink):
+        url_hash = hash_url(hyperlink)
+        return url_hash in self.bloom_filter and get_url_key(url_hash) in self.doc_id_by_url_hash
+
+    def add(self, hyperlink, doc_id, inlinks):
+        '''
+        Marks the hyperlink visited.
+        :param hyperlink: hyperlink
+        :param doc_id: doc id of the hyperlink
+        :param inlinks: in-link buffer of the doc ids linking to the hyperlink
+        :return: None
+        '''
+        url_hash = hash_url(hyperlink)
+        self.bloom_filter.add(url_hash)
+        self.doc_id_by_url_hash[get_url_key(url_hash)] = doc_id
+        self.doc_count += 1
+        if self.edge_log is None:
+            self.inlinks_by_doc_id[doc_id] = inlinks
+        else:
+            self.edge_log.write_node(doc_id, inlinks)
+
+    def add_alias(self, hyperlink, doc_id, inlinks):
+        '''
+        Marks the hyperlink visited as an alias of the already visited doc id,
+        its in-links are merged into the in-links of doc id.
+        :param hyperlink: hyperlink
+        :param doc_id: doc id of the visited page the hyperlink is an alias of
+        :param inlinks: iterable of doc ids linking to the hyperlink
+        :return: None
+        '''
+        url_hash = hash_url(hyperlink)
+        self.bloom_filter.add(url_hash)
+        self.doc_id_by_url_hash[get_url_key(url_hash)] = doc_id
+        if self.edge_log is None:
+            self.inlinks_by_doc_id[doc_id].extend(inlinks)
+        else:
+            self.edge_log.write_edges(doc_id, inlinks)
+
+    def get_doc_id(self, hyperlink):
+        '''
+        :param hyperlink: hyperlink
+        :return: doc id of the visited hyperlink, None if not visited.
+        '''
+        url_hash = hash_url(hyperlink)
+        if url_hash not in self.bloom_filter:
+            return None
+        return self.doc_id_by_url_hash.get(get_url_key(url_hash))
+
+    def add_inlink(self, hyperlink, inlink):
+        '''
+        Records a link from doc id inlink to the visited hyperlink.
+        :param hyperlink: visited hyperlink
+        :param inlink: doc id of the linking page
+        :return: None
+        '''
+        if self.edge_log is None:
+            self.inlinks_by_doc_id[self.get_doc_id(hyperlink)].append(inlink)
+        else:
+            self.edge_log.write_edges(self.get_doc_id(hyperlink), (inlink,))
+
+    def get_inlinks(self):
+        '''
+        :return: dict of doc id vs in-link buffer of all visited URLs,
+                 empty if the in-links are written to an edge log.
+        '''
+        return self.inlinks_by_doc_id
@@ -0,0 +1,141 @@
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from nltk.corpus import words
+
+# Default location of the prebuilt english words index.
+ENGLISH_WORDS_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "english_words.idx")
+
+INDEX_MAGIC = b"WORDIDX1"
+
+# magic, slot count, word count
+HEADER_FORMAT = "<8sII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+SLOT_FORMAT = "<I"
+SLOT_SIZE = struct.calcsize(SLOT_FORMAT)
+
+WORD_TERMINATOR = b"\n"
+
+
+def get_slot(word_bytes, slot_count):
+    return zlib.crc32(word_bytes) % slot_count
+
+
+def build_word_index(words, path):
+    '''
+    Writes the words to an on-disk open addressing hash table:
+    a header, slot_count slots holding 1 + the offset of a word in the
+    word section (0 for an empty slot) and the newline terminated words.
+    The table is at most half full, so a lookup hashes the word once and
+    compares it with one or two stored words.
+    :param words: iterable of words, without newlines
+    :param path: path of the index
+    :return: None
+    '''
+    word_bytes_list = sorted({word.encode("utf-8") for word in words})
+    slot_count = max(1, 2 * len(word_bytes_list))
+    slots = [0] * slot_count
+    word_section = bytearray()
+    for word_bytes in word_bytes_list:
+        slot = get_slot(word_bytes, slot_count)
+        while slots[slot] != 0:
+            slot = (slot + 1) % slot_count
+        slots[slot] = len(word_section) + 1
+        word_section += word_bytes + WORD_TERMINATOR
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'wb') as index_file:
+        index_file.write(struct.pack(HEADER_FORMAT, INDEX_MAGIC, slot_count, len(word_bytes_list)))
+        index_file.write(struct.pack("<" + str(slot_count) + "I", *slots))
+        index_file.write(word_section)
+    os.replace(temporary_path, path)
+
+
+class WordIndex:
+    '''
+    Set-like, read-only view of an index written by build_word_index.
+    The file is memory-mapped, so loading it costs nothing up front and
+    its pages are shared between crawler processes.
+    '''
+
+    def __init__(self, path):
+        with open(path, 'rb') as index_file:
+            self.index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.slot_count, self.word_count = struct.unpack_from(HEADER_FORMAT, self.index)
+        if magic != INDEX_MAGIC:
+            raise ValueError("Not a word index: " + path)
+        self.word_section_start = HEADER_SIZE + self.slot_count * SLOT_SIZE
+
+    def __len__(self):
+        return self.word_count
+
+    def __contains__(self, word):
+        word_bytes = word.encode("utf-8")
+        slot = get_slot(word_bytes, self.slot_count)
+        while True:
+            offset = struct.unpack_from(SLOT_FORMAT, self.index, HEADER_SIZE + slot * SLOT_SIZE)[0]
+            if offset == 0:
+                return False
+            word_start = self.word_section_start + offset - 1
+            word_end = word_start + len(word_bytes)
+            if self.index[word_start:word_end] == word_bytes \
+                    and self.index[word_end:word_end + 1] == WORD_TERMINATOR:
+                return True
+            slot = (slot + 1) % self.slot_count
+
+    def close(self):
+        self.index.close()
+
+
+class LazyWordIndex:
+    '''
+    WordIndex that is only opened on the first lookup, and built from
+    get_words() first if the index file does not exist yet.
+    '''
+
+    def __init__(self, path, get_words):
+        '''
+        :param path: path of the index
+        :param get_words: function returning the words to build the index from
+        '''
+        self.path = path
+        self.get_words = get_words
+        self.word_index = None
+
+    def load(self):
+        if self.word_index is None:
+            if not os.path.exists(self.path):
+                build_word_index(self.get_words(), self.path)
+            self.word_index = WordIndex(self.path)
+        return self.word_index
+
+    def __len__(self):
+        return len(self.load())
+
+    def __contains__(self, word):
+        return word in self.load()
+
+
+def get_english_words():
+    '''
+    :return: the NLTK english words longer than one letter, and ""
+             so that the keyword on its own counts as a compound.
+    '''
+    return [word for word in words.words() if len(word) > 1] + [""]
+
+
+def load_english_words_index(path=ENGLISH_WORDS_INDEX_PATH):
+    '''
+    :param path: path of the index
+    :return: LazyWordIndex of the english words, built on its first lookup if missing.
+    '''
+    return LazyWordIndex(path, get_english_words)
+
+
+if __name__ == '__main__':
+    # prebuild the index e.g. python -m crawler.word_index [<index path>]
+    build_word_index(get_english_words(), sys.argv[1] if len(sys.argv) > 1 else ENGLISH_WORDS_INDEX_PATH)
@@ -1,11 +1,37 @@
+import asyncio
+import multiprocessing
+import os
 import re
+import shutil
 import sys
-from urllib import request
 
 import nltk
 import time
 from bs4 import BeautifulSoup
-from nltk.corpus import words
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+
+# make the shared crawler package at the repository root importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawler.async_fetcher import AsyncFetcher, FetchResult, REJECTED_BODY_STATUSES, blocking_fetch, get_host
+from crawler.canonical_urls import CanonicalUrlMap
+from crawler.checkpoint import read_checkpoint, write_checkpoint
+from crawler.crawl_log import CrawlLogWriter
+from crawler.edge_log import EdgeLogWriter, finalize_edge_log
+from crawler.fetch_archive import RecordingFetcher, ReplayFetcher
+from crawler.frontier import BFSFrontier, OPICFrontier, SpillingBFSFrontier
+from crawler.host_scheduler import ROBOTS_TXT_PATH, HostScheduler, RobotsCache, fetch_with_backoff
+from crawler.http_pool import ConditionalFetchCache, HTTPConnectionPool
+from crawler.instrumentation import CrawlMetrics, LINK_FILTER_STAGE, PARSE_STAGE, POLITENESS_STAGE
+from crawler.link_extractor import ContentLinkExtractor
+from crawler.near_duplicates import SimHashIndex, compute_simhash
+from crawler.pipeline import CrawlPipeline
+from crawler.partitioned_crawl import collect_partition_results, create_partitions, merge_partition_results
+from crawler.record_store import RecordStoreWriter
+from crawler.thread_pool_fetcher import ThreadPoolFetcher
+from crawler.url_filter import MAIN_PAGE_URLS, compile_url_filter, get_site_url
+from crawler.visited_store import VisitedStore, create_inlinks
+from crawler.word_index import load_english_words_index
 
 SEED_URL = "https://en.wikipedia.org/wiki/Solar_eclipse"
 
@@ -14,15 +40,111 @@ MAXIMUM_CRAWL_DEPTH = 6
 PREFIX_TO_FOLLOW = "https://en.wikipedia.org/wiki"
 UNIQUE_URL_THRESHOLD = 1000
 LINK_WITH_CONTENT_FILE_NAME = "task1_links_with_content.txt"
+RAW_CONTENT_STORE_FILE_NAME = "task1_raw_content.store"
 LINKS_FILE_NAME = "G1_LINKS.txt"
 GRAPH_FILE_NAME = "G1.txt"
 
-# Frontier (list of frontier-item)
-# A frontier-item is tuple (<Anchor-Text>, <URL>, <DEPTH>, <DOC_ID>, <INLINKS_SET>)
-# Anchor-Text : is the Anchor-Text
-# URL : the URL hyperlink points to.
-# DEPTH : depth at which this was found
-frontier = []
+# asyncio fetch mode, keeps up to MAX_IN_FLIGHT_REQUESTS pages downloading at once.
+ASYNC_FETCH_ENABLED = False
+MAX_IN_FLIGHT_REQUESTS = 8
+
+# keep-alive HTTP connection pool with gzip, validators and bodies of fetched
+# pages are cached in HTTP_CACHE_DIRECTORY so recrawls send conditional GETs.
+HTTP_POOL_ENABLED = False
+HTTP_CACHE_DIRECTORY = "http_cache"
+
+# fetch backend archive: "record" saves every response to FETCH_ARCHIVE_DIRECTORY,
+# "replay" serves the crawl from it after a simulated latency of REPLAY_LATENCY_IN_SEC
+# +/- REPLAY_LATENCY_JITTER_IN_SEC per page, None fetches from the network.
+FETCH_ARCHIVE_MODE = None
+FETCH_ARCHIVE_DIRECTORY = "fetch_archive"
+REPLAY_LATENCY_IN_SEC = 0.1
+REPLAY_LATENCY_JITTER_IN_SEC = 0.05
+
+# bounded body reads, bodies are read in chunks and a response that is not HTML by its
+# Content-Type, or larger than MAX_BODY_SIZE_IN_BYTES by its Content-Length or once as
+# many bytes were read, is given up on and its page skipped.
+BODY_LIMITS_ENABLED = False
+MAX_BODY_SIZE_IN_BYTES = 5 * 1024 * 1024
+
+# robots.txt of every host is fetched once and honored, Crawl-delay included.
+ROBOTS_TXT_ENABLED = False
+
+# adaptive politeness, the delay of every host follows its response times and backs
+# off on 429 and 5xx statuses, between MINIMUM_POLITENESS_DELAY_IN_SEC and
+# MAXIMUM_POLITENESS_DELAY_IN_SEC, 429 and 503 responses are retried.
+ADAPTIVE_POLITENESS_ENABLED = False
+MINIMUM_POLITENESS_DELAY_IN_SEC = 0.25
+MAXIMUM_POLITENESS_DELAY_IN_SEC = 60
+
+# canonical URLs, links are looked up in their canonical form (no fragment, normalized
+# percent-encoding and trailing slash) or as the URL they are known to redirect to,
+# redirects are kept in REDIRECT_MAP_FILE_NAME and both URLs of one share its doc id.
+CANONICAL_URLS_ENABLED = False
+REDIRECT_MAP_FILE_NAME = "G1_REDIRECTS.txt"
+
+# thread-pool mode, worker threads fetch and parse up to MAX_IN_FLIGHT_REQUESTS pages at once.
+THREAD_POOL_ENABLED = False
+
+# pipelined mode, PIPELINE_FETCHER_COUNT async fetchers feed PIPELINE_PARSER_COUNT parser
+# processes through queues of PIPELINE_QUEUE_SIZE pages, this process commits the pages
+# in frontier order, scheduling at most PIPELINE_WINDOW ahead, and a writer thread writes
+# the links and link with content files. Queue depths go to the metrics snapshots.
+PIPELINE_ENABLED = False
+PIPELINE_FETCHER_COUNT = 8
+PIPELINE_PARSER_COUNT = 2
+PIPELINE_QUEUE_SIZE = 16
+PIPELINE_WINDOW = 32
+
+# settings a parser process takes from the process starting it
+PIPELINE_PARSER_SETTINGS = ["PREFIX_TO_FOLLOW", "FAST_LINK_EXTRACTION_ENABLED", "NEAR_DUPLICATE_DETECTION_ENABLED",
+                            "SHOULD_WRITE_RAW_CONTENT"]
+
+# disk-spilling frontier, keeps FRONTIER_MEMORY_CAPACITY items in memory
+# and spills the rest to segment files in FRONTIER_SPILL_DIRECTORY.
+FRONTIER_MEMORY_CAPACITY = 10000
+FRONTIER_SPILL_DIRECTORY = "frontier_segments"
+
+# edge log, in-links are appended to EDGE_LOG_FILE_NAME as they are found instead
+# of being kept in memory, and the graph file is written from it by an external sort.
+EDGE_LOG_ENABLED = False
+EDGE_LOG_FILE_NAME = "G1_EDGES.log"
+
+# the links and link with content files are written in batches, by a writer
+# thread if CRAWL_LOG_WRITER_THREAD_ENABLED is set.
+CRAWL_LOG_WRITER_THREAD_ENABLED = False
+
+# crawl checkpoint, written every CHECKPOINT_INTERVAL_IN_PAGES crawled pages.
+# "--resume" continues the crawl from the last checkpoint.
+CHECKPOINT_FILE_NAME = "G1_CHECKPOINT.pickle"
+CHECKPOINT_INTERVAL_IN_PAGES = 50
+RESUME_ENABLED = False
+
+# flag that enables writing crawl metrics snapshots (per-stage latency percentiles,
+# pages/sec) to METRICS_FILE_NAME every METRICS_SNAPSHOT_INTERVAL_IN_SEC.
+METRICS_ENABLED = False
+METRICS_FILE_NAME = "G1_METRICS.jsonl"
+METRICS_SNAPSHOT_INTERVAL_IN_SEC = 10
+
+# number of worker processes of the partitioned crawl, each crawling
+# a hash partition of the URLs, 1 to crawl in this process.
+PARTITION_COUNT = 1
+
+# settings a partition worker process takes from the process starting it
+PARTITION_WORKER_SETTINGS = ["POLITENESS_POLICY_DELAY_IN_SEC", "MAXIMUM_CRAWL_DEPTH", "UNIQUE_URL_THRESHOLD",
+                             "PREFIX_TO_FOLLOW", "FAST_LINK_EXTRACTION_ENABLED", "HTTP_POOL_ENABLED",
+                             "HTTP_CACHE_DIRECTORY", "FETCH_ARCHIVE_MODE", "FETCH_ARCHIVE_DIRECTORY",
+                             "REPLAY_LATENCY_IN_SEC", "REPLAY_LATENCY_JITTER_IN_SEC", "ROBOTS_TXT_ENABLED",
+                             "CANONICAL_URLS_ENABLED", "BODY_LIMITS_ENABLED", "MAX_BODY_SIZE_IN_BYTES",
+                             "METRICS_ENABLED", "METRICS_FILE_NAME", "METRICS_SNAPSHOT_INTERVAL_IN_SEC"]
+
+# flags a partitioned crawl does not support, -processes is rejected with them: workers
+# do not checkpoint, write raw content or an edge log, detect near-duplicates across
+# partitions, adapt their politeness or fetch concurrently, and each crawls breadth
+# first from a frontier of its own, not a spilling or OPIC one shared by all.
+PARTITIONED_CRAWL_UNSUPPORTED_FLAGS = ["--resume", "-rawContentStore", "-edgeLog", "-nearDuplicates",
+                                       "-adaptivePoliteness", "-async", "-threads", "-pipeline",
+                                       "-logWriterThread", "-spillFrontier", "-opic"]
 
 # frontier-item selector indexes
 FRONTIER_ITEM_ANCHOR_TEXT_INDEX = 0
@@ -31,51 +153,280 @@ FRONTIER_ITEM_DEPTH_INDEX = 2
 FRONTIER_ITEM_DOC_ID_INDEX = 3
 FRONTIER_ITEM_INLINK_SET_INDEX = 4
 
-# visited links
-visited = dict()
+# Frontier (FIFO queue of frontier-item, each URL is queued once)
+# A frontier-item is tuple (<Anchor-Text>, <URL>, <DEPTH>, <DOC_ID>, <INLINKS_SET>)
+# Anchor-Text : is the Anchor-Text
+# URL : the URL hyperlink points to.
+# DEPTH : depth at which this was found
+frontier = BFSFrontier(FRONTIER_ITEM_URL_INDEX, FRONTIER_ITEM_INLINK_SET_INDEX)
+
+# visited links, URL hash vs doc id with the in-link buffers kept by doc id
+visited = VisitedStore(UNIQUE_URL_THRESHOLD)
+
+
+
 
+# files to document link and content, opened by open_output_files
+links_with_content_file = None
+links_file = None
 
+# store of the raw content, used instead of links_with_content_file if RAW_CONTENT_STORE_ENABLED
+raw_content_store = None
 
+# crawl scope check of a hyperlink, compiled from PREFIX_TO_FOLLOW
+url_filter = compile_url_filter(PREFIX_TO_FOLLOW, MAIN_PAGE_URLS)
 
-# files to document link and content
-links_with_content_file = open(LINK_WITH_CONTENT_FILE_NAME, 'w', encoding="utf-8")
-links_file = open(LINKS_FILE_NAME, 'w', encoding="utf-8")
+# site relative links are resolved against, the scheme and host of PREFIX_TO_FOLLOW
+site_url = get_site_url(PREFIX_TO_FOLLOW)
 
 
 # stemmer to stem words
 stemmer = nltk.stem.porter.PorterStemmer()
 
-# English dictionary to de-compund words.
-english_words_set = set(filter(lambda w: len(w) > 1, words.words())).union({""})
+# English dictionary to de-compund words, a prebuilt on-disk index
+# only opened when is_compound_keyword looks up a keyword suffix.
+english_words_set = load_english_words_index()
 
 # flag that enable raw-content writing to files.
 SHOULD_WRITE_RAW_CONTENT = False
 
-# doc id
+# flag that writes the raw content to a compressed record store indexed by doc id
+# (RAW_CONTENT_STORE_FILE_NAME and its .idx file) instead of LINK_WITH_CONTENT_FILE_NAME.
+RAW_CONTENT_STORE_ENABLED = False
+
+# flag that enables the streaming link extractor instead of a full BeautifulSoup parse.
+FAST_LINK_EXTRACTION_ENABLED = False
+
+# flag that enables near-duplicate detection. A page whose content SimHash is within
+# NEAR_DUPLICATE_MAX_DISTANCE bits of an already crawled page is not documented
+# and its URL is mapped to the doc id of that page.
+NEAR_DUPLICATE_DETECTION_ENABLED = False
+NEAR_DUPLICATE_MAX_DISTANCE = 3
+
+# SimHash index of the content of crawled pages
+near_duplicates = SimHashIndex(NEAR_DUPLICATE_MAX_DISTANCE)
+
+# HTTP connection pool, created by start_crawling if HTTP_POOL_ENABLED
+http_connection_pool = None
+
+# RecordingFetcher or ReplayFetcher, created by start_crawling if FETCH_ARCHIVE_MODE is set
+fetch_archive_backend = None
+
+# RobotsCache if ROBOTS_TXT_ENABLED is set, and the HostScheduler spacing
+# the requests to every host, created by start_crawling
+robots_cache = None
+host_scheduler = None
+
+# CanonicalUrlMap if CANONICAL_URLS_ENABLED is set, created by start_crawling
+canonical_urls = None
+
+# EdgeLogWriter of the graph, opened with the output files if EDGE_LOG_ENABLED is set
+edge_log = None
+
+# crawl metrics, created by start_crawling
+crawl_metrics = CrawlMetrics()
+
+# partition of the crawl owned by this process, if it is a partition worker
+partition = None
+
+# seed URL of the crawl, checkpointed so a crawl only resumes from its own checkpoint
+crawl_seed_url = None
+
+# integer doc id, partition workers step by the partition count to keep doc ids unique across partitions
 doc_id_count = 0
+doc_id_step = 1
 
 def get_next_docid():
     global doc_id_count
-    doc_id_count += 1
-    return str("D"+str(doc_id_count))
+    doc_id_count += doc_id_step
+    return doc_id_count
+
+def format_docid(docid):
+    '''
+    :param docid: integer doc id
+    :return: doc id as written to the output files e.g. D12
+    '''
+    return "D" + str(docid)
 
 # This where the crawling starts
 def start_crawling(seed_url, keyword=None):
-    # Add Sed URL to frontier
-    frontier.append(("Seed", seed_url, 1, get_next_docid(), set()))
-
-    # start crawling
-    internal_start_crawling(keyword)
+    global http_connection_pool, crawl_metrics, fetch_archive_backend, robots_cache, host_scheduler, canonical_urls, \
+        url_filter, site_url, crawl_seed_url
+    if PARTITION_COUNT > 1:
+        start_partitioned_crawling(seed_url, keyword)
+        return
+
+    url_filter = compile_url_filter(PREFIX_TO_FOLLOW, MAIN_PAGE_URLS)
+    site_url = get_site_url(PREFIX_TO_FOLLOW)
+
+    crawl_metrics = CrawlMetrics(METRICS_FILE_NAME if METRICS_ENABLED else None, METRICS_SNAPSHOT_INTERVAL_IN_SEC)
+    if HTTP_POOL_ENABLED:
+        http_connection_pool = HTTPConnectionPool(ConditionalFetchCache(HTTP_CACHE_DIRECTORY), metrics=crawl_metrics)
+    fetch_archive_backend = create_fetch_archive_backend()
+    robots_cache = RobotsCache(fetch_robots_txt) if ROBOTS_TXT_ENABLED else None
+    host_scheduler = HostScheduler(POLITENESS_POLICY_DELAY_IN_SEC, robots_cache, ADAPTIVE_POLITENESS_ENABLED,
+                                   MINIMUM_POLITENESS_DELAY_IN_SEC, MAXIMUM_POLITENESS_DELAY_IN_SEC)
+    canonical_urls = CanonicalUrlMap(REDIRECT_MAP_FILE_NAME) if CANONICAL_URLS_ENABLED else None
+
+    crawl_seed_url = seed_url = get_canonical_url(truncate_fragment(seed_url))
+    if RESUME_ENABLED and os.path.exists(CHECKPOINT_FILE_NAME):
+        # continue from the last checkpoint, if it is a checkpoint of this crawl
+        crawl_state = read_checkpoint(CHECKPOINT_FILE_NAME)
+        if crawl_state.get("seed_url") != seed_url:
+            print("The checkpoint is of a crawl from another seed:" + str(crawl_state.get("seed_url")))
+            return
+        current_depth = restore_crawl_checkpoint(crawl_state)
+    else:
+        # the checkpoint and spilled frontier of an earlier crawl must not be resumed into this one
+        remove_crawl_checkpoint()
+        open_output_files()
+
+        # Add Sed URL to frontier, unless robots.txt disallows it
+        if is_allowed_by_robots(seed_url):
+            frontier.add(("Seed", seed_url, 1, get_next_docid(), create_inlinks()))
+        else:
+            print("robots.txt disallows the seed:" + seed_url)
+        current_depth = 1
+
+    # start crawling, the lines buffered when it stops are written even if it fails
+    try:
+        if PIPELINE_ENABLED:
+            asyncio.run(internal_start_crawling_pipeline(keyword, current_depth))
+        elif ASYNC_FETCH_ENABLED:
+            asyncio.run(internal_start_crawling_async(keyword, current_depth))
+        elif THREAD_POOL_ENABLED:
+            internal_start_crawling_threaded(keyword, current_depth)
+        else:
+            internal_start_crawling(keyword, current_depth)
+    finally:
+        flush_crawl_logs()
 
     write_graph_file()
 
+    # a finished crawl is not resumed
+    remove_crawl_checkpoint()
+
     # release all the resources
     release_resources()
 
+def open_output_files(crawl_state=None):
+    '''
+    Opens the links and link with content files (or the raw content store) and the edge log,
+    from scratch or, when resuming, truncated back to the offsets in the checkpoint.
+    :param crawl_state: crawl state read from the checkpoint, None if not resuming
+    :return: None
+    '''
+    global links_with_content_file, links_file, raw_content_store, edge_log
+    background = CRAWL_LOG_WRITER_THREAD_ENABLED or PIPELINE_ENABLED
+    if EDGE_LOG_ENABLED:
+        edge_log = EdgeLogWriter(EDGE_LOG_FILE_NAME, crawl_state["edge_log_offset"] if crawl_state else None)
+        visited.set_edge_log(edge_log)
+    if crawl_state is None:
+        if RAW_CONTENT_STORE_ENABLED:
+            raw_content_store = RecordStoreWriter(RAW_CONTENT_STORE_FILE_NAME)
+        else:
+            links_with_content_file = CrawlLogWriter(LINK_WITH_CONTENT_FILE_NAME, background=background)
+        links_file = CrawlLogWriter(LINKS_FILE_NAME, background=background)
+    else:
+        if RAW_CONTENT_STORE_ENABLED:
+            raw_content_store = RecordStoreWriter(RAW_CONTENT_STORE_FILE_NAME, crawl_state["raw_content_store_offsets"])
+        else:
+            links_with_content_file = CrawlLogWriter(LINK_WITH_CONTENT_FILE_NAME,
+                                                     crawl_state["links_with_content_file_offset"],
+                                                     background=background)
+        links_file = CrawlLogWriter(LINKS_FILE_NAME, crawl_state["links_file_offset"], background=background)
+
+
+def write_crawl_checkpoint(current_depth):
+    '''
+    Checkpoints the frontier, visited links with their in-links,
+    doc id count and the output file offsets.
+    :param current_depth: depth of the last crawled page
+    :return: None
+    '''
+    write_checkpoint(CHECKPOINT_FILE_NAME, {
+        "seed_url": crawl_seed_url,
+        "frontier": frontier,
+        "visited": visited,
+        "near_duplicates": near_duplicates,
+        "doc_id_count": doc_id_count,
+        "current_depth": current_depth,
+        "links_file_offset": links_file.tell(),
+        "links_with_content_file_offset": get_links_with_content_file_offset(),
+        "raw_content_store_offsets": raw_content_store.tell() if raw_content_store is not None else None,
+        "edge_log_offset": edge_log.tell() if edge_log is not None else None
+    })
+    if isinstance(frontier, SpillingBFSFrontier):
+        frontier.remove_consumed_segments()
+
+
+def get_links_with_content_file_offset():
+    if links_with_content_file is None:
+        return None
+    return links_with_content_file.tell()
+
+
+def checkpoint_if_due(current_depth):
+    if len(visited) % CHECKPOINT_INTERVAL_IN_PAGES == 0:
+        write_crawl_checkpoint(current_depth)
+
+
+def restore_crawl_checkpoint(crawl_state):
+    '''
+    Restores the crawl state read from CHECKPOINT_FILE_NAME.
+    :param crawl_state: crawl state read from the checkpoint
+    :return: depth of the last crawled page.
+    '''
+    global frontier, visited, near_duplicates, doc_id_count
+    frontier = crawl_state["frontier"]
+    visited = crawl_state["visited"]
+    near_duplicates = crawl_state["near_duplicates"]
+    doc_id_count = crawl_state["doc_id_count"]
+    open_output_files(crawl_state)
+    print("Resuming crawl at count:" + str(len(visited)))
+    return crawl_state["current_depth"]
+
+
+def remove_crawl_checkpoint():
+    '''
+    Removes the checkpoint and the spilled frontier segments.
+    :return: None
+    '''
+    for file_name in (CHECKPOINT_FILE_NAME, CHECKPOINT_FILE_NAME + ".tmp"):
+        if os.path.exists(file_name):
+            os.remove(file_name)
+    if isinstance(frontier, SpillingBFSFrontier):
+        frontier.remove_spilled_files()
+    else:
+        shutil.rmtree(FRONTIER_SPILL_DIRECTORY, ignore_errors=True)
+
+
+def flush_crawl_logs():
+    '''
+    Writes the lines buffered by the links and link with content files.
+    :return: None
+    '''
+    links_file.flush()
+    if links_with_content_file is not None:
+        links_with_content_file.flush()
+
+
 # closes the links and link with content files.
 def release_resources():
-    links_with_content_file.close()
+    if links_with_content_file is not None:
+        links_with_content_file.close()
+    if raw_content_store is not None:
+        raw_content_store.close()
+    if edge_log is not None:
+        edge_log.close()
     links_file.close()
+    if http_connection_pool is not None:
+        http_connection_pool.close()
+    if canonical_urls is not None:
+        canonical_urls.close()
+    if isinstance(frontier, SpillingBFSFrontier):
+        frontier.close()
+    crawl_metrics.close()
 
 
 def get_content_body(raw_html_soup):
@@ -87,38 +438,36 @@ def get_content_body(raw_html_soup):
     return raw_html_soup.find("div", {"id": "content", "role": "main"})
 
 
-def write_raw_content(hyperlink, html_content_body):
+def write_raw_content(hyperlink, html_content_body, docid):
+    if raw_content_store is not None:
+        raw_content_store.write_record(format_docid(docid), hyperlink, str(html_content_body))
+        return
     links_with_content_file.write("LINK:" + hyperlink + "\n")
     links_with_content_file.write("BODY BEGIN\n" + str(html_content_body) + "\nBODY END\n\n")
 
 
 def write_graph_file():
+    if edge_log is not None:
+        edge_log.flush()
+        finalize_edge_log(EDGE_LOG_FILE_NAME, GRAPH_FILE_NAME)
+        return
     with open(GRAPH_FILE_NAME, 'w', encoding="utf-8") as graph_file:
-        for frontier_item in sorted(visited.values(), key = lambda x : int(x[FRONTIER_ITEM_DOC_ID_INDEX][1:])):
-            graph_file.write(frontier_item[FRONTIER_ITEM_DOC_ID_INDEX]+" "+
-                             " ".join(sorted(frontier_item[FRONTIER_ITEM_INLINK_SET_INDEX], key=lambda x : int(x[1:]))) )
+        for docid, inlinks in sorted(visited.get_inlinks().items()):
+            # in-link buffers may repeat a doc id, each in-link is written once
+            graph_file.write(format_docid(docid) + " " +
+                             " ".join(format_docid(inlink) for inlink in sorted(set(inlinks))))
             graph_file.write("\n")
 
 
 def document_link_and_content(hyperlink_count, anchor_text, hyperlink, depth, new_depth, html_content_body, docid):
     if new_depth:
         links_file.write("\n\n\nDEPTH:" + str(depth) + "\n")
-    links_file.write(str(hyperlink_count) + "|" + docid + "|" + anchor_text + "|" + hyperlink + "\n")
-    links_file.flush()
+    links_file.write(str(hyperlink_count) + "|" + format_docid(docid) + "|" + anchor_text + "|" + hyperlink + "\n")
 
     if SHOULD_WRITE_RAW_CONTENT:
-        write_raw_content(hyperlink, html_content_body)
-
-
+        write_raw_content(hyperlink, html_content_body, docid)
 
 
-def is_link_external(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: Return true if the link is outside of PREFIX_TO_FOLLOW
-             False, otherwise.
-    '''
-    return not hyperlink.startswith(PREFIX_TO_FOLLOW)
 
 
 def is_link_visited(hyperlink):
@@ -128,47 +477,7 @@ def is_link_visited(hyperlink):
              presented in the frontier.
              False, otherwise.
     '''
-    return hyperlink in visited
-
-
-def is_link_administrative(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link is administrative
-             i.e. contains ':'
-             False, otherwise.
-    '''
-    return hyperlink.count(":") > 1
-
-
-def is_link_for_page_section(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link of page section
-             i.e. starts with #.
-             False, otherwise.
-    '''
-    return hyperlink.startswith("#")
-
-
-def is_link_pointing_to_english_article(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link of english article
-             i.e. of the form "en.wikipedia".
-             False, otherwise.
-    '''
-    return hyperlink.count("en.wikipedia") > 0
-
-def is_link_pointing_to_main_page(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link pointing to main page
-             i.e. "https://en.wikipedia.org/wiki/Main_Page" or
-              "https://www.wikipedia.org/"
-             False, otherwise.
-    '''
-    return hyperlink=="https://en.wikipedia.org/wiki/Main_Page" or hyperlink=="https://www.wikipedia.org/"
+    return hyperlink in visited or hyperlink in frontier
 
 
 def should_explore_link(hyperlink, anchor_text=None, keyword=None):
@@ -177,15 +486,12 @@ def should_explore_link(hyperlink, anchor_text=None, keyword=None):
     :param hyperlink: hyperlink
     :param anchor_text: anchor_text
     :param keyword: keyword
-    :return: True, if the link should be explored,
+    :return: True, if the link is in the crawl scope (see compile_url_filter),
+             not visited and matches the keyword,
              False, otherwise.
     '''
-    return not (is_link_external(hyperlink)
-                or is_link_visited(hyperlink)
-                or is_link_administrative(hyperlink)
-                or is_link_for_page_section(hyperlink)
-                or is_link_pointing_to_main_page(hyperlink)) \
-           and is_link_pointing_to_english_article(hyperlink) \
+    return url_filter(hyperlink) \
+           and not is_link_visited(hyperlink) \
            and (is_keyword_satisfied(hyperlink, anchor_text, keyword)
                 or is_compound_keyword(anchor_text, keyword))
 
@@ -254,17 +560,26 @@ def format_hyperlink(hyperlink):
     :return:
             if the relative link start with "/wiki/"
             the function converts relative hyperlink to absolute
-            with addition of "https://en.wikipedia.org".
+            with addition of the site of PREFIX_TO_FOLLOW e.g. "https://en.wikipedia.org".
             It also returns anchor text of the hyperlink.
 
             if the relative link doesn't start with "/wiki/"
             it return the same relative along with resolved anchor text.
 
     '''
-    url = hyperlink['href']
+    return format_extracted_hyperlink(hyperlink.getText(), hyperlink['href'])
+
+
+def format_extracted_hyperlink(anchor_text, url):
+    '''
+    Same as format_hyperlink, for a link given as anchor text and href.
+    :param anchor_text: anchor text
+    :param url: href of the link
+    :return: tuple of anchor text and absolute hyperlink.
+    '''
     if url.startswith("/wiki/"):
-        return hyperlink.getText(), "https://en.wikipedia.org" + url
-    return hyperlink.getText(), url
+        return anchor_text, site_url + url
+    return anchor_text, url
 
 
 def is_compound_keyword(compound_keyword, keyword):
@@ -291,72 +606,653 @@ def is_compound_keyword(compound_keyword, keyword):
 
 
 
-def internal_start_crawling(keyword=None):
-    current_depth = 1
-    previous_visit_time = 0
-    for frontier_item in frontier:
+def get_hyperlink_to_crawl(frontier_item):
+    '''
+    :param frontier_item: frontier_item
+    :return: URL of the frontier item with the '#' part truncated.
+    '''
+    return truncate_fragment(frontier_item[FRONTIER_ITEM_URL_INDEX])
+
+
+def truncate_fragment(hyperlink):
+    '''
+    :param hyperlink: hyperlink
+    :return: the hyperlink with the '#' part truncated.
+    '''
+    return hyperlink if hyperlink.find('#')==-1 else hyperlink[:hyperlink.find('#')]
+
+
+def parse_page(raw_html):
+    '''
+    Parses the page and formats the hyperlinks found in its content section.
+    :param raw_html: raw html of the page
+    :return: tuple (<content div element>, <list of (anchor text, hyperlink)>, <content SimHash>)
+             the SimHash is None unless NEAR_DUPLICATE_DETECTION_ENABLED,
+             None, if the raw html is None i.e. the response was given up on.
+    '''
+    if raw_html is None:
+        return None
+    with crawl_metrics.measure(PARSE_STAGE):
+        fingerprint = None
+        if FAST_LINK_EXTRACTION_ENABLED:
+            # content div html is only kept if it is written to file
+            content_link_extractor = ContentLinkExtractor()
+            html_content_body, discovered_hyperlinks = content_link_extractor.extract(
+                raw_html, SHOULD_WRITE_RAW_CONTENT, NEAR_DUPLICATE_DETECTION_ENABLED)
+            if NEAR_DUPLICATE_DETECTION_ENABLED:
+                fingerprint = compute_simhash(content_link_extractor.get_text())
+            return html_content_body, [format_extracted_hyperlink(anchor_text, url)
+                                       for anchor_text, url in discovered_hyperlinks], fingerprint
+
+        # Get only content section HTML
+        html_content_body = get_content_body(BeautifulSoup(raw_html))
+        if NEAR_DUPLICATE_DETECTION_ENABLED:
+            fingerprint = compute_simhash(html_content_body.get_text(" "))
+
+        # Get all the hyper links in the content section
+        # format relative links to absolute links and get anchor text
+        return html_content_body, [format_hyperlink(discovered_hyperlink)
+                                   for discovered_hyperlink in html_content_body.find_all('a', href=True)], fingerprint
+
+
+def parse_page_in_parser_process(raw_html):
+    '''
+    parse_page run in a parser process of the pipelined crawl, the content
+    div is sent back as html and only if it is written to file.
+    :param raw_html: raw html of the page
+    :return: the page as returned by parse_page
+    '''
+    parsed_page = parse_page(raw_html)
+    if parsed_page is None:
+        return None
+    html_content_body, discovered_hyperlinks, fingerprint = parsed_page
+    if not SHOULD_WRITE_RAW_CONTENT:
+        html_content_body = None
+    elif html_content_body is not None:
+        html_content_body = str(html_content_body)
+    return html_content_body, discovered_hyperlinks, fingerprint
+
+
+def init_parser_process(crawl_settings):
+    '''
+    Initializer of the parser processes of the pipelined crawl.
+    :param crawl_settings: PIPELINE_PARSER_SETTINGS of the starting process
+    :return: None
+    '''
+    global site_url
+    # a spawned parser process re-imports this script without running its __main__ block
+    globals().update(crawl_settings)
+    site_url = get_site_url(PREFIX_TO_FOLLOW)
+
+
+def fetch_page(hyperlink):
+    '''
+    Fetches the hyperlink, reporting how the host responded to the host scheduler.
+    :param hyperlink: hyperlink
+    :return: FetchResult of the hyperlink, with body None if the response was given up on.
+    '''
+    try:
+        if host_scheduler is not None:
+            fetch_result = fetch_with_backoff(fetch_page_from_backend, hyperlink, host_scheduler)
+        else:
+            fetch_result = fetch_page_from_backend(hyperlink)
+    except HTTPError as http_error:
+        if http_error.code not in REJECTED_BODY_STATUSES:
+            raise
+        # it cannot be a page with a content section
+        print("skipped:" + hyperlink + " " + str(http_error.reason))
+        return FetchResult(hyperlink, hyperlink, None)
+    crawl_metrics.add_bytes(len(fetch_result.body))
+    return fetch_result
+
+
+def fetch_page_from_backend(hyperlink):
+    '''
+    Fetches the hyperlink, from the fetch archive if FETCH_ARCHIVE_MODE is set.
+    :param hyperlink: hyperlink
+    :return: FetchResult of the hyperlink.
+    '''
+    if fetch_archive_backend is not None:
+        return fetch_archive_backend.fetch(hyperlink)
+    return fetch_page_from_network(hyperlink)
+
+
+def fetch_page_from_network(hyperlink):
+    '''
+    Fetches the hyperlink, over the keep-alive HTTP connection pool if enabled.
+    :param hyperlink: hyperlink
+    :return: FetchResult of the hyperlink.
+    '''
+    max_body_size = MAX_BODY_SIZE_IN_BYTES if BODY_LIMITS_ENABLED else None
+    # robots.txt is plain text
+    html_only = BODY_LIMITS_ENABLED and urlsplit(hyperlink).path != ROBOTS_TXT_PATH
+    if http_connection_pool is not None:
+        return http_connection_pool.fetch(hyperlink, max_body_size, html_only)
+    return blocking_fetch(hyperlink, crawl_metrics, max_body_size, html_only)
+
+
+def fetch_robots_txt(robots_url):
+    '''
+    Fetches a robots.txt in a politeness slot of its host, as any other page of the host.
+    :param robots_url: URL of the robots.txt
+    :return: FetchResult of the robots.txt.
+    '''
+    politeness_policy = host_scheduler if partition is None else partition.politeness_policy
+    time_to_sleep = politeness_policy.reserve_slot(get_host(robots_url))
+    time.sleep(time_to_sleep)
+    crawl_metrics.record(POLITENESS_STAGE, time_to_sleep)
+    return fetch_page_from_backend(robots_url)
+
+
+def create_fetch_archive_backend():
+    '''
+    :return: RecordingFetcher or ReplayFetcher of FETCH_ARCHIVE_MODE,
+             None, if it is not set.
+    '''
+    if FETCH_ARCHIVE_MODE == "record":
+        return RecordingFetcher(fetch_page_from_network, FETCH_ARCHIVE_DIRECTORY)
+    if FETCH_ARCHIVE_MODE == "replay":
+        return ReplayFetcher(FETCH_ARCHIVE_DIRECTORY, REPLAY_LATENCY_IN_SEC, REPLAY_LATENCY_JITTER_IN_SEC,
+                             metrics=crawl_metrics)
+    return None
+
+
+def fetch_and_parse_page(hyperlink):
+    '''
+    Fetches and parses the hyperlink, this is the work done by
+    the worker threads of the thread-pool crawl.
+    :param hyperlink: hyperlink
+    :return: tuple (<URL after redirects>, <parsed page>)
+    '''
+    fetch_result = fetch_page(hyperlink)
+    return fetch_result.final_url, parse_page(fetch_result.body)
+
+
+def crawl_fetched_page(frontier_item, hyperlink, final_url, parsed_page, new_depth, keyword=None):
+    '''
+    Commits a fetched page: marks it visited, documents it and
+    adds the links discovered in its content section to the frontier.
+    :param frontier_item: frontier_item the page was fetched for
+    :param hyperlink: hyperlink that was fetched
+    :param final_url: URL after redirects
+    :param parsed_page: the page as returned by parse_page
+    :param new_depth: True if the page starts a new depth
+    :param keyword: keyword
+    :return: True if the page was committed,
+             False, if it was dropped i.e. redirect to a link that should not be explored,
+             near-duplicate of a crawled page or response given up on.
+    '''
+    if parsed_page is None:
+        return False
+
+    anchor_text = frontier_item[FRONTIER_ITEM_ANCHOR_TEXT_INDEX]
+    depth = frontier_item[FRONTIER_ITEM_DEPTH_INDEX]
+    docid = frontier_item[FRONTIER_ITEM_DOC_ID_INDEX]
+
+    if canonical_urls is not None and final_url != hyperlink:
+        # remember the redirect, so links to hyperlink are not fetched again
+        final_url = canonical_urls.add_redirect(hyperlink, final_url)
+        canonical_docid = visited.get_doc_id(final_url)
+        if canonical_docid is not None:
+            # redirect to a crawled page, hyperlink becomes an alias of its doc id
+            visited.add_alias(hyperlink, canonical_docid, frontier_item[FRONTIER_ITEM_INLINK_SET_INDEX])
+            return False
+        if final_url in frontier:
+            # redirect to a queued page, it takes over the in-links of hyperlink
+            frontier.merge_inlinks(final_url, frontier_item[FRONTIER_ITEM_INLINK_SET_INDEX])
+            return False
+
+    # to handle redirects
+    if not should_explore_link(final_url):
+        return False
+
+    html_content_body, discovered_hyperlinks, fingerprint = parsed_page
+
+    if fingerprint is not None:
+        canonical_docid = near_duplicates.find(fingerprint)
+        if canonical_docid is not None:
+            # map the near-duplicate to the page crawled before it
+            visited.add_alias(hyperlink, canonical_docid, frontier_item[FRONTIER_ITEM_INLINK_SET_INDEX])
+            print("near-duplicate:" + hyperlink + " of " + format_docid(canonical_docid))
+            return False
+        near_duplicates.add(fingerprint, docid)
+
+    # put link in visited
+    visited.add(hyperlink, docid, frontier_item[FRONTIER_ITEM_INLINK_SET_INDEX])
+    if canonical_urls is not None and final_url != hyperlink:
+        visited.add_alias(final_url, docid, ())
+    print("count:" + str(len(visited)) + " " + "depth:" + str(depth))
+
+    # Document the visited link, a partition worker leaves it to the merge
+    if partition is None:
+        document_link_and_content(len(visited), anchor_text, hyperlink, depth, new_depth, html_content_body, docid)
+    else:
+        partition.page_committed(docid, anchor_text, hyperlink, depth)
+
+    # write_to_link_with_content(hyperlink, html_content_body)
+
+    if isinstance(frontier, OPICFrontier):
+        # the in-links recorded below share the cash of the page, popped under its frontier URL
+        frontier.spend_cash(frontier_item[FRONTIER_ITEM_URL_INDEX], docid,
+                            len(set(truncate_fragment(url) for anchor_text, url in discovered_hyperlinks)))
+
+    with crawl_metrics.measure(LINK_FILTER_STAGE):
+        # a link repeated on the page is filtered once, unless its anchor text can match the keyword
+        discovered_links = set()
+        for anchor_text, discovered_hyperlink in discovered_hyperlinks:
+            # links to sections of a page are links to the page, queued and merged as one frontier item
+            discovered_hyperlink = truncate_fragment(discovered_hyperlink)
+            discovered_link = discovered_hyperlink if keyword is None else (anchor_text, discovered_hyperlink)
+            if discovered_link in discovered_links:
+                continue
+            discovered_links.add(discovered_link)
+            discovered_hyperlink = get_canonical_url(discovered_hyperlink)
+            if partition is None or partition.is_owned(discovered_hyperlink):
+                discover_link(anchor_text, discovered_hyperlink, depth + 1, docid, keyword)
+            else:
+                # the owning partition decides at the end of the depth
+                partition.route(anchor_text, discovered_hyperlink, docid)
+
+    crawl_metrics.page_crawled()
+    return True
+
+
+def discover_link(anchor_text, discovered_hyperlink, depth, inlink_docid, keyword=None):
+    '''
+    Adds a link discovered on the page inlink_docid to the frontier if it
+    should be explored, otherwise records the in-link if it was seen before.
+    :param anchor_text: anchor text
+    :param discovered_hyperlink: hyperlink
+    :param depth: depth of the hyperlink
+    :param inlink_docid: doc id of the page the link was discovered on
+    :param keyword: keyword
+    :return: None
+    '''
+    # an OPIC frontier is not served in depth order, a link past the maximum depth would end the crawl
+    past_maximum_depth = depth > MAXIMUM_CRAWL_DEPTH and isinstance(frontier, OPICFrontier)
+
+    # check to see if the links should be explored
+    if should_explore_link(discovered_hyperlink, anchor_text, keyword) and is_allowed_by_robots(discovered_hyperlink) \
+            and not past_maximum_depth:
+        # if yes add the link to frontier
+        frontier.add((anchor_text, discovered_hyperlink, depth, get_next_docid(), create_inlinks([inlink_docid])))
+
+    elif discovered_hyperlink in visited:
+        visited.add_inlink(discovered_hyperlink, inlink_docid)
+
+    elif discovered_hyperlink in frontier:
+        frontier.merge_inlinks(discovered_hyperlink, [inlink_docid])
+
+
+def get_canonical_url(hyperlink):
+    '''
+    :param hyperlink: hyperlink
+    :return: canonical URL of the hyperlink if CANONICAL_URLS_ENABLED is set,
+             the hyperlink, otherwise.
+    '''
+    return hyperlink if canonical_urls is None else canonical_urls.resolve(hyperlink)
+
+
+def is_allowed_by_robots(hyperlink):
+    '''
+    :param hyperlink: hyperlink
+    :return: True if ROBOTS_TXT_ENABLED is not set or robots.txt allows crawling the hyperlink,
+             False, otherwise.
+    '''
+    return robots_cache is None or robots_cache.can_fetch(hyperlink)
+
+
+async def load_robots_rules(parsed_page):
+    '''
+    Fetches the robots.txt of the hosts the links of the page point to
+    that were not fetched yet, in the default executor, so the lookups
+    of discover_link do not block the event loop.
+    :param parsed_page: the page as returned by parse_page
+    :return: None
+    '''
+    if robots_cache is None or parsed_page is None:
+        return
+    loop = asyncio.get_event_loop()
+    for anchor_text, discovered_hyperlink in parsed_page[1]:
+        if url_filter(discovered_hyperlink) and not robots_cache.has_rules(discovered_hyperlink):
+            await loop.run_in_executor(None, robots_cache.get_rules, discovered_hyperlink)
+
+
+def internal_start_crawling(keyword=None, current_depth=1):
+    while len(frontier) > 0:
+
+        frontier_item = frontier.pop()
 
         # terminate crawling
         if should_stop_crawling(frontier_item):
             return
 
         # Get all the required data from a frontier item
-        anchor_text = frontier_item[FRONTIER_ITEM_ANCHOR_TEXT_INDEX]
-        hyperlink = frontier_item[FRONTIER_ITEM_URL_INDEX]
         depth = frontier_item[FRONTIER_ITEM_DEPTH_INDEX]
-        docid = frontier_item[FRONTIER_ITEM_DOC_ID_INDEX]
 
         # Truncating '#' part
-        hyperlink = hyperlink if hyperlink.find('#')==-1 else hyperlink[:hyperlink.find('#')]
+        hyperlink = get_hyperlink_to_crawl(frontier_item)
 
 
         # check to see if the hyperlink should be crawled.
         if should_explore_link(hyperlink):
 
-            # politeness check                                      #time already elapsed
-            time_to_sleep = POLITENESS_POLICY_DELAY_IN_SEC - (time.clock() - previous_visit_time)
-            time.sleep(0 if time_to_sleep < 0 else time_to_sleep)
-
-            # make note time
-            previous_visit_time = time.clock()
+            # politeness check, per host
+            time_to_sleep = host_scheduler.reserve_slot(get_host(hyperlink))
+            time.sleep(time_to_sleep)
+            crawl_metrics.record(POLITENESS_STAGE, time_to_sleep)
 
             # open the link
-            http_response = request.urlopen(hyperlink);
+            fetch_result = fetch_page(hyperlink)
+
+            if crawl_fetched_page(frontier_item, hyperlink, fetch_result.final_url, parse_page(fetch_result.body),
+                                  current_depth != depth, keyword):
+                current_depth = depth
+                checkpoint_if_due(current_depth)
+
+
+def prefetch_frontier(fetcher, window=MAX_IN_FLIGHT_REQUESTS):
+    '''
+    Schedules fetches for the frontier items that are going to be crawled
+    next, keeping at most window fetches pending and never fetching past
+    the crawl budget.
+    :param fetcher: AsyncFetcher, ThreadPoolFetcher or CrawlPipeline
+    :param window: maximum number of pending fetches
+    :return: None
+    '''
+    budget = min(window, UNIQUE_URL_THRESHOLD - len(visited))
+    for frontier_item in frontier.peek(window):
+        if fetcher.pending_count() >= budget or frontier_item[FRONTIER_ITEM_DEPTH_INDEX] > MAXIMUM_CRAWL_DEPTH:
+            return
+        hyperlink = get_hyperlink_to_crawl(frontier_item)
+        # a queued URL is never visited, so it only needs checking when '#' was truncated
+        if hyperlink == frontier_item[FRONTIER_ITEM_URL_INDEX] or should_explore_link(hyperlink):
+            # a CrawlPipeline with a full fetch queue takes no more
+            if fetcher.schedule(hyperlink) is False:
+                return
 
-            # to handle redirects
-            if not should_explore_link(http_response.geturl()):
-                continue;
 
-            # put link in visited
-            visited[hyperlink] = frontier_item
-            print("count:" + str(len(visited)) + " " + "depth:" + str(depth))
+async def internal_start_crawling_async(keyword=None, current_depth=1):
+    '''
+    Same crawl as internal_start_crawling, but keeps up to
+    MAX_IN_FLIGHT_REQUESTS frontier items downloading ahead of the
+    one being committed. Pages are still committed in frontier order,
+    so doc ids, visited and the output files match the serial crawl.
+    '''
+    fetcher = AsyncFetcher(POLITENESS_POLICY_DELAY_IN_SEC, MAX_IN_FLIGHT_REQUESTS, fetch_page,
+                           politeness_policy=host_scheduler, metrics=crawl_metrics)
+    try:
+        while len(frontier) > 0:
+            frontier_item = frontier.pop()
+
+            # terminate crawling
+            if should_stop_crawling(frontier_item):
+                return
+
+            depth = frontier_item[FRONTIER_ITEM_DEPTH_INDEX]
+            hyperlink = get_hyperlink_to_crawl(frontier_item)
+
+            # check to see if the hyperlink should be crawled.
+            if should_explore_link(hyperlink):
+                prefetch_frontier(fetcher)
+                fetch_result = await fetcher.result(hyperlink)
+                parsed_page = parse_page(fetch_result.body)
+                await load_robots_rules(parsed_page)
+
+                if crawl_fetched_page(frontier_item, hyperlink, fetch_result.final_url, parsed_page,
+                                      current_depth != depth, keyword):
+                    current_depth = depth
+                    checkpoint_if_due(current_depth)
+    finally:
+        await fetcher.close()
+
+
+async def internal_start_crawling_pipeline(keyword=None, current_depth=1):
+    '''
+    Same crawl as internal_start_crawling, split into stages connected by
+    bounded queues, see CrawlPipeline: async fetchers, parser processes,
+    this coroutine as the single committer and the writer threads of the
+    links and link with content files. Pages are committed in frontier
+    order, so the output files match the serial crawl.
+    '''
+    pipeline = CrawlPipeline(POLITENESS_POLICY_DELAY_IN_SEC, parse_page_in_parser_process, fetch_page,
+                             PIPELINE_FETCHER_COUNT, PIPELINE_PARSER_COUNT, PIPELINE_QUEUE_SIZE,
+                             politeness_policy=host_scheduler, parser_initializer=init_parser_process,
+                             parser_initargs=({setting: globals()[setting] for setting in PIPELINE_PARSER_SETTINGS},),
+                             metrics=crawl_metrics)
+    crawl_metrics.watch_queues(lambda: dict(pipeline.get_queue_depths(), write=get_write_queue_depth()))
+    try:
+        while len(frontier) > 0:
+            frontier_item = frontier.pop()
+
+            # terminate crawling
+            if should_stop_crawling(frontier_item):
+                return
+
+            depth = frontier_item[FRONTIER_ITEM_DEPTH_INDEX]
+            hyperlink = get_hyperlink_to_crawl(frontier_item)
+
+            # check to see if the hyperlink should be crawled.
+            if should_explore_link(hyperlink):
+                prefetch_frontier(pipeline, PIPELINE_WINDOW)
+                final_url, parsed_page = await pipeline.result(hyperlink)
+                await load_robots_rules(parsed_page)
+
+                if crawl_fetched_page(frontier_item, hyperlink, final_url, parsed_page,
+                                      current_depth != depth, keyword):
+                    current_depth = depth
+                    checkpoint_if_due(current_depth)
+    finally:
+        await pipeline.close()
+
+
+def get_write_queue_depth():
+    '''
+    :return: number of lines waiting for the writer threads of the links and link with content files.
+    '''
+    write_queue_depth = links_file.pending_count()
+    if links_with_content_file is not None:
+        write_queue_depth += links_with_content_file.pending_count()
+    return write_queue_depth
 
-            # Get only content section HTML
-            html_content_body = get_content_body(BeautifulSoup(http_response.read()))
 
-            # Document the visited link
-            document_link_and_content(len(visited), anchor_text, hyperlink, depth, current_depth != depth, html_content_body, docid)
+def internal_start_crawling_threaded(keyword=None, current_depth=1):
+    '''
+    Same crawl as internal_start_crawling, but worker threads fetch and
+    parse up to MAX_IN_FLIGHT_REQUESTS frontier items ahead. This thread
+    stays the single committer: it assigns doc ids, updates visited and
+    appends to frontier in BFS order, so the output files match the
+    serial crawl.
+    '''
+    fetcher = ThreadPoolFetcher(POLITENESS_POLICY_DELAY_IN_SEC, fetch_and_parse_page, MAX_IN_FLIGHT_REQUESTS,
+                                politeness_policy=host_scheduler, metrics=crawl_metrics)
+    try:
+        while len(frontier) > 0:
+            frontier_item = frontier.pop()
 
-            current_depth = depth
-            # write_to_link_with_content(hyperlink, html_content_body)
+            # terminate crawling
+            if should_stop_crawling(frontier_item):
+                return
 
-            # Get all the hyper links in the content section
-            for discovered_hyperlink in html_content_body.find_all('a', href=True):
-                # format relative links to absolute links and get anchor text
-                anchor_text, discovered_hyperlink = format_hyperlink(discovered_hyperlink)
+            depth = frontier_item[FRONTIER_ITEM_DEPTH_INDEX]
+            hyperlink = get_hyperlink_to_crawl(frontier_item)
 
-                # check to see if the links should be explored
-                if should_explore_link(discovered_hyperlink, anchor_text, keyword):
-                    # if yes add the link to frontier
-                    frontier.append((anchor_text, discovered_hyperlink, depth + 1, get_next_docid(), {frontier_item[FRONTIER_ITEM_DOC_ID_INDEX]}))
+            # check to see if the hyperlink should be crawled.
+            if should_explore_link(hyperlink):
+                prefetch_frontier(fetcher)
+                final_url, parsed_page = fetcher.result(hyperlink)
 
-                elif is_link_visited(discovered_hyperlink):
-                    visited[discovered_hyperlink][FRONTIER_ITEM_INLINK_SET_INDEX].add(frontier_item[FRONTIER_ITEM_DOC_ID_INDEX])
+                if crawl_fetched_page(frontier_item, hyperlink, final_url, parsed_page,
+                                      current_depth != depth, keyword):
+                    current_depth = depth
+                    checkpoint_if_due(current_depth)
+    finally:
+        fetcher.close()
 
 
+def internal_start_crawling_partition(keyword=None):
+    '''
+    Crawl of a partition worker: crawls the frontier items of this
+    partition one depth at a time, exchanging the links discovered for
+    other partitions at the end of every depth, see CrawlPartition.
+    '''
+    current_depth = 1
+    while current_depth <= MAXIMUM_CRAWL_DEPTH:
+        while len(frontier) > 0 and frontier.peek(1)[0][FRONTIER_ITEM_DEPTH_INDEX] == current_depth:
+            frontier_item = frontier.pop()
+
+            # Truncating '#' part
+            hyperlink = get_hyperlink_to_crawl(frontier_item)
+
+            # check to see if the hyperlink should be crawled.
+            if should_explore_link(hyperlink):
+
+                # the page budget is shared by all the partitions
+                if not partition.reserve_page():
+                    break
+
+                # politeness check, shared by all the partitions
+                time_to_sleep = partition.politeness_policy.reserve_slot(get_host(hyperlink))
+                time.sleep(time_to_sleep)
+                crawl_metrics.record(POLITENESS_STAGE, time_to_sleep)
+
+                fetch_result = fetch_page(hyperlink)
+                if not crawl_fetched_page(frontier_item, hyperlink, fetch_result.final_url,
+                                          parse_page(fetch_result.body), False, keyword):
+                    partition.release_page()
+
+        partition.end_depth(lambda links: [discover_link(anchor_text, discovered_hyperlink, current_depth + 1,
+                                                         inlink_docid, keyword)
+                                           for anchor_text, discovered_hyperlink, inlink_docid in links])
+        if partition.is_crawl_done(len(frontier)):
+            return
+        current_depth += 1
+
+
+def run_partition_worker(crawl_partition, seed_url, keyword, crawl_settings):
+    '''
+    Entry point of a partition worker process.
+    :param crawl_partition: CrawlPartition of the worker
+    :param seed_url: seed URL, crawled by the partition owning it
+    :param keyword: keyword
+    :param crawl_settings: PARTITION_WORKER_SETTINGS of the starting process
+    :return: None
+    '''
+    global partition, doc_id_count, doc_id_step, http_connection_pool, fetch_archive_backend, robots_cache, \
+        canonical_urls, url_filter, site_url, crawl_metrics
+    # a spawned worker re-imports this script without running its __main__ block
+    globals().update(crawl_settings)
+    url_filter = compile_url_filter(PREFIX_TO_FOLLOW, MAIN_PAGE_URLS)
+    site_url = get_site_url(PREFIX_TO_FOLLOW)
+    partition = crawl_partition
+    doc_id_step = partition.partition_count
+    doc_id_count = partition.index + 1 - doc_id_step
+    # every worker writes its own metrics snapshots e.g. G1_METRICS.jsonl.0
+    crawl_metrics = CrawlMetrics(METRICS_FILE_NAME + "." + str(partition.index) if METRICS_ENABLED else None,
+                                 METRICS_SNAPSHOT_INTERVAL_IN_SEC)
+    if HTTP_POOL_ENABLED:
+        http_connection_pool = HTTPConnectionPool(ConditionalFetchCache(HTTP_CACHE_DIRECTORY), metrics=crawl_metrics)
+    fetch_archive_backend = create_fetch_archive_backend()
+    robots_cache = RobotsCache(fetch_robots_txt) if ROBOTS_TXT_ENABLED else None
+    # redirects learnt by a worker stay in its process
+    canonical_urls = CanonicalUrlMap() if CANONICAL_URLS_ENABLED else None
+
+    seed_url = get_canonical_url(truncate_fragment(seed_url))
+    if partition.is_owned(seed_url) and is_allowed_by_robots(seed_url):
+        frontier.add(("Seed", seed_url, 1, get_next_docid(), create_inlinks()))
+    try:
+        internal_start_crawling_partition(keyword)
+    except BaseException:
+        partition.abort()
+        raise
+    finally:
+        if http_connection_pool is not None:
+            http_connection_pool.close()
+        crawl_metrics.close()
+    partition.send_result(visited.get_inlinks())
+
+
+def start_partitioned_crawling(seed_url, keyword=None):
+    '''
+    Crawls with PARTITION_COUNT worker processes and
+    merges their crawls into GRAPH_FILE_NAME and LINKS_FILE_NAME.
+    '''
+    crawl_settings = {setting: globals()[setting] for setting in PARTITION_WORKER_SETTINGS}
+    with multiprocessing.Manager() as manager:
+        partitions, result_queue = create_partitions(PARTITION_COUNT, POLITENESS_POLICY_DELAY_IN_SEC,
+                                                     UNIQUE_URL_THRESHOLD, manager)
+        processes = [multiprocessing.Process(target=run_partition_worker,
+                                             args=(crawl_partition, seed_url, keyword, crawl_settings))
+                     for crawl_partition in partitions]
+        for process in processes:
+            process.start()
+        try:
+            partition_results = collect_partition_results(result_queue, processes)
+        except BaseException:
+            for process in processes:
+                process.terminate()
+            raise
+        finally:
+            for process in processes:
+                process.join()
+
+    page_count = merge_partition_results(partition_results, GRAPH_FILE_NAME, LINKS_FILE_NAME)
+    print("Partitioned crawl count:" + str(page_count))
+
 
 if __name__ == '__main__':
-    start = time.clock()
+    args = set(sys.argv)
+    ASYNC_FETCH_ENABLED = "-async" in args
+    HTTP_POOL_ENABLED = "-httpPool" in args
+    THREAD_POOL_ENABLED = "-threads" in args
+    RESUME_ENABLED = "--resume" in args
+    FAST_LINK_EXTRACTION_ENABLED = "-fastLinks" in args
+    NEAR_DUPLICATE_DETECTION_ENABLED = "-nearDuplicates" in args
+    METRICS_ENABLED = "-metrics" in args
+    EDGE_LOG_ENABLED = "-edgeLog" in args
+    ROBOTS_TXT_ENABLED = "-robots" in args
+    ADAPTIVE_POLITENESS_ENABLED = "-adaptivePoliteness" in args
+    CANONICAL_URLS_ENABLED = "-canonicalUrls" in args
+    CRAWL_LOG_WRITER_THREAD_ENABLED = "-logWriterThread" in args
+    PIPELINE_ENABLED = "-pipeline" in args
+    BODY_LIMITS_ENABLED = "-limitBodies" in args
+    if "-record" in args:
+        FETCH_ARCHIVE_MODE = "record"
+    if "-replay" in args:
+        FETCH_ARCHIVE_MODE = "replay"
+    for arg in sys.argv:
+        if arg.startswith("-replayLatency="):
+            REPLAY_LATENCY_IN_SEC = float(arg[len("-replayLatency="):])
+    for arg in sys.argv:
+        if arg.startswith("-processes="):
+            PARTITION_COUNT = int(arg[len("-processes="):])
+    if PARTITION_COUNT > 1:
+        unsupported_flags = [flag for flag in PARTITIONED_CRAWL_UNSUPPORTED_FLAGS if flag in args]
+        if len(unsupported_flags) > 0:
+            print(" ".join(unsupported_flags) + " cannot be used with -processes.")
+            sys.exit(1)
+    for arg in sys.argv:
+        if arg.startswith("-maxBodySize="):
+            MAX_BODY_SIZE_IN_BYTES = int(arg[len("-maxBodySize="):])
+    # crawl another site e.g. a local fixture server -prefixToFollow=http://127.0.0.1:8000/wiki
+    for arg in sys.argv:
+        if arg.startswith("-prefixToFollow="):
+            PREFIX_TO_FOLLOW = arg[len("-prefixToFollow="):]
+    for arg in sys.argv:
+        if arg.startswith("-politenessDelay="):
+            POLITENESS_POLICY_DELAY_IN_SEC = float(arg[len("-politenessDelay="):])
+    for arg in sys.argv:
+        if arg.startswith("-maxPages="):
+            UNIQUE_URL_THRESHOLD = int(arg[len("-maxPages="):])
+    if "-rawContentStore" in args:
+        SHOULD_WRITE_RAW_CONTENT = True
+        RAW_CONTENT_STORE_ENABLED = True
+    if "-spillFrontier" in args:
+        frontier = SpillingBFSFrontier(FRONTIER_ITEM_URL_INDEX, FRONTIER_ITEM_INLINK_SET_INDEX,
+                                       FRONTIER_SPILL_DIRECTORY, FRONTIER_MEMORY_CAPACITY)
+    # crawl the pages with the most OPIC cash first instead of breadth first, not with -processes
+    if "-opic" in args:
+        frontier = OPICFrontier(FRONTIER_ITEM_URL_INDEX, FRONTIER_ITEM_INLINK_SET_INDEX)
+    start = time.perf_counter()
     start_crawling(sys.argv[1])
-    print("Time taken:"+str(time.clock() - start))
-
+    print("Time taken:"+str(time.perf_counter() - start))
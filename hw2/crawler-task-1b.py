@@ -1,11 +1,20 @@
+import os
 import re
 import sys
-from urllib import request
 
 import nltk
 import time
 from bs4 import BeautifulSoup
-from nltk.corpus import words
+
+# make the shared crawler package at the repository root importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawler.async_fetcher import blocking_fetch, get_host
+from crawler.crawl_log import CrawlLogWriter
+from crawler.frontier import DFSFrontier
+from crawler.host_scheduler import HostScheduler, RobotsCache, fetch_with_backoff
+from crawler.url_filter import MAIN_PAGE_URLS, compile_url_filter
+from crawler.visited_store import VisitedStore, create_inlinks
+from crawler.word_index import load_english_words_index
 
 SEED_URL = "https://en.wikipedia.org/wiki/Solar_eclipse"
 
@@ -17,12 +26,15 @@ LINK_WITH_CONTENT_FILE_NAME = "task1_links_with_content.txt"
 LINKS_FILE_NAME = "G2_LINKS.txt"
 GRAPH_FILE_NAME = "G2.txt"
 
-# Frontier (list of frontier-item)
-# A frontier-item is tuple (<Anchor-Text>, <URL>, <DEPTH>, <DOC_ID>, <INLINKS_SET>)
-# Anchor-Text : is the Anchor-Text
-# URL : the URL hyperlink points to.
-# DEPTH : depth at which this was found
-frontier = []
+# robots.txt of every host is fetched once and honored, Crawl-delay included.
+ROBOTS_TXT_ENABLED = False
+
+# adaptive politeness, the delay of every host follows its response times and backs
+# off on 429 and 5xx statuses, between MINIMUM_POLITENESS_DELAY_IN_SEC and
+# MAXIMUM_POLITENESS_DELAY_IN_SEC, 429 and 503 responses are retried.
+ADAPTIVE_POLITENESS_ENABLED = False
+MINIMUM_POLITENESS_DELAY_IN_SEC = 0.25
+MAXIMUM_POLITENESS_DELAY_IN_SEC = 60
 
 # frontier-item selector indexes
 FRONTIER_ITEM_ANCHOR_TEXT_INDEX = 0
@@ -31,41 +43,73 @@ FRONTIER_ITEM_DEPTH_INDEX = 2
 FRONTIER_ITEM_DOC_ID_INDEX = 3
 FRONTIER_ITEM_INLINK_SET_INDEX = 4
 
-# visited links
-visited = dict()
+# Frontier (LIFO stack of frontier-item, each URL is queued once)
+# A frontier-item is tuple (<Anchor-Text>, <URL>, <DEPTH>, <DOC_ID>, <INLINKS_SET>)
+# Anchor-Text : is the Anchor-Text
+# URL : the URL hyperlink points to.
+# DEPTH : depth at which this was found
+frontier = DFSFrontier(FRONTIER_ITEM_URL_INDEX, FRONTIER_ITEM_INLINK_SET_INDEX)
+
+# visited links, URL hash vs doc id with the in-link buffers kept by doc id
+visited = VisitedStore(UNIQUE_URL_THRESHOLD)
+
+# crawl scope check of a hyperlink, compiled from PREFIX_TO_FOLLOW
+url_filter = compile_url_filter(PREFIX_TO_FOLLOW, MAIN_PAGE_URLS)
 
 
 
 
 # files to document link and content
-links_with_content_file = open(LINK_WITH_CONTENT_FILE_NAME, 'w', encoding="utf-8")
-links_file = open(LINKS_FILE_NAME, 'w', encoding="utf-8")
+links_with_content_file = CrawlLogWriter(LINK_WITH_CONTENT_FILE_NAME)
+links_file = CrawlLogWriter(LINKS_FILE_NAME)
 
 
 # stemmer to stem words
 stemmer = nltk.stem.porter.PorterStemmer()
 
-# English dictionary to de-compund words.
-english_words_set = set(filter(lambda w: len(w) > 1, words.words())).union({""})
+# English dictionary to de-compund words, a prebuilt on-disk index
+# only opened when is_compound_keyword looks up a keyword suffix.
+english_words_set = load_english_words_index()
 
 # flag that enable raw-content writing to files.
 SHOULD_WRITE_RAW_CONTENT = True
 
+# RobotsCache if ROBOTS_TXT_ENABLED is set, and the HostScheduler spacing
+# the requests to every host, created by start_crawling
+robots_cache = None
+host_scheduler = None
+
 # doc id
 doc_id_count = 0
 
 def get_next_docid():
     global doc_id_count
     doc_id_count += 1
-    return str("D"+str(doc_id_count))
+    return doc_id_count
+
+def format_docid(docid):
+    '''
+    :param docid: integer doc id
+    :return: doc id as written to the output files e.g. D12
+    '''
+    return "D" + str(docid)
 
 # This where the crawling starts
 def start_crawling(seed_url, keyword=None):
+    global robots_cache, host_scheduler
+    robots_cache = RobotsCache(fetch_robots_txt) if ROBOTS_TXT_ENABLED else None
+    host_scheduler = HostScheduler(POLITENESS_POLICY_DELAY_IN_SEC, robots_cache, ADAPTIVE_POLITENESS_ENABLED,
+                                   MINIMUM_POLITENESS_DELAY_IN_SEC, MAXIMUM_POLITENESS_DELAY_IN_SEC)
+
     # Add Sed URL to frontier
-    frontier.append(("Seed", seed_url, 1, get_next_docid(), set()))
+    frontier.add(("Seed", seed_url, 1, get_next_docid(), create_inlinks()))
 
-    # start crawling
-    internal_start_crawling(keyword)
+    # start crawling, the lines buffered when it stops are written even if it fails
+    try:
+        internal_start_crawling(keyword)
+    finally:
+        links_with_content_file.flush()
+        links_file.flush()
 
     write_graph_file()
 
@@ -94,17 +138,17 @@ def write_raw_content(hyperlink, html_content_body):
 
 def write_graph_file():
     with open(GRAPH_FILE_NAME, 'w', encoding="utf-8") as graph_file:
-        for frontier_item in sorted(visited.values(), key = lambda x : int(x[FRONTIER_ITEM_DOC_ID_INDEX][1:])):
-            graph_file.write(frontier_item[FRONTIER_ITEM_DOC_ID_INDEX]+" "+
-                             " ".join(sorted(frontier_item[FRONTIER_ITEM_INLINK_SET_INDEX], key=lambda x : int(x[1:]))) )
+        for docid, inlinks in sorted(visited.get_inlinks().items()):
+            # in-link buffers may repeat a doc id, each in-link is written once
+            graph_file.write(format_docid(docid) + " " +
+                             " ".join(format_docid(inlink) for inlink in sorted(set(inlinks))))
             graph_file.write("\n")
 
 
 def document_link_and_content(hyperlink_count, anchor_text, hyperlink, depth, new_depth, html_content_body, docid):
     #if new_depth:
         #links_file.write("\n\n\nDEPTH:" + str(depth) + "\n")
-    links_file.write(str(hyperlink_count) + "|" + docid + "|" + str(depth) + "|"+ anchor_text + "|" + hyperlink + "\n")
-    links_file.flush()
+    links_file.write(str(hyperlink_count) + "|" + format_docid(docid) + "|" + str(depth) + "|"+ anchor_text + "|" + hyperlink + "\n")
 
     if SHOULD_WRITE_RAW_CONTENT:
         write_raw_content(hyperlink, html_content_body)
@@ -112,15 +156,6 @@ def document_link_and_content(hyperlink_count, anchor_text, hyperlink, depth, ne
 
 
 
-def is_link_external(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: Return true if the link is outside of PREFIX_TO_FOLLOW
-             False, otherwise.
-    '''
-    return not hyperlink.startswith(PREFIX_TO_FOLLOW)
-
-
 def is_link_visited(hyperlink):
     '''
     :param hyperlink: hyperlink
@@ -128,47 +163,7 @@ def is_link_visited(hyperlink):
              presented in the frontier.
              False, otherwise.
     '''
-    return hyperlink in visited
-
-
-def is_link_administrative(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link is administrative
-             i.e. contains ':'
-             False, otherwise.
-    '''
-    return hyperlink.count(":") > 1
-
-
-def is_link_for_page_section(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link of page section
-             i.e. starts with #.
-             False, otherwise.
-    '''
-    return hyperlink.startswith("#")
-
-
-def is_link_pointing_to_english_article(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link of english article
-             i.e. of the form "en.wikipedia".
-             False, otherwise.
-    '''
-    return hyperlink.count("en.wikipedia") > 0
-
-def is_link_pointing_to_main_page(hyperlink):
-    '''
-    :param hyperlink: hyperlink
-    :return: True, if the link pointing to main page
-             i.e. "https://en.wikipedia.org/wiki/Main_Page" or
-              "https://www.wikipedia.org/"
-             False, otherwise.
-    '''
-    return hyperlink=="https://en.wikipedia.org/wiki/Main_Page" or hyperlink=="https://www.wikipedia.org/"
+    return hyperlink in visited or hyperlink in frontier
 
 
 def should_explore_link(hyperlink, depth=0, anchor_text=None, keyword=None):
@@ -180,12 +175,8 @@ def should_explore_link(hyperlink, depth=0, anchor_text=None, keyword=None):
     :return: True, if the link should be explored,
              False, otherwise.
     '''
-    return not (is_link_external(hyperlink)
-                or is_link_visited(hyperlink)
-                or is_link_administrative(hyperlink)
-                or is_link_for_page_section(hyperlink)
-                or is_link_pointing_to_main_page(hyperlink)) \
-           and is_link_pointing_to_english_article(hyperlink) \
+    return url_filter(hyperlink) \
+           and not is_link_visited(hyperlink) \
            and (is_keyword_satisfied(hyperlink, anchor_text, keyword)
                 or is_compound_keyword(anchor_text, keyword)) \
            and depth <= MAXIMUM_CRAWL_DEPTH
@@ -292,9 +283,27 @@ def is_compound_keyword(compound_keyword, keyword):
 
 
 
+def fetch_robots_txt(robots_url):
+    '''
+    Fetches a robots.txt in a politeness slot of its host, as any other page of the host.
+    :param robots_url: URL of the robots.txt
+    :return: FetchResult of the robots.txt.
+    '''
+    time.sleep(host_scheduler.reserve_slot(get_host(robots_url)))
+    return blocking_fetch(robots_url)
+
+
+def is_allowed_by_robots(hyperlink):
+    '''
+    :param hyperlink: hyperlink
+    :return: True if ROBOTS_TXT_ENABLED is not set or robots.txt allows crawling the hyperlink,
+             False, otherwise.
+    '''
+    return robots_cache is None or robots_cache.can_fetch(hyperlink)
+
+
 def internal_start_crawling(keyword=None):
     current_depth = 1
-    previous_visit_time = 0
     while len(frontier) > 0:
 
         frontier_item = frontier.pop()
@@ -316,30 +325,26 @@ def internal_start_crawling(keyword=None):
         # check to see if the hyperlink should be crawled.
         if should_explore_link(hyperlink, depth = depth):
 
-            # politeness check                                      #time already elapsed
-            time_to_sleep = POLITENESS_POLICY_DELAY_IN_SEC - (time.clock() - previous_visit_time)
-            time.sleep(0 if time_to_sleep < 0 else time_to_sleep)
+            # politeness check, per host
+            time.sleep(host_scheduler.reserve_slot(get_host(hyperlink)))
 
-            # make note time
-            previous_visit_time = time.clock()
-
-            # open the link
+            # open the link, 429 and 503 are retried if ADAPTIVE_POLITENESS_ENABLED
             try:
-                http_response = request.urlopen(hyperlink);
+                fetch_result = fetch_with_backoff(blocking_fetch, hyperlink, host_scheduler)
             except:
                 continue
 
             # to handle redirects
 
-            if not should_explore_link(http_response.geturl()):
+            if not should_explore_link(fetch_result.final_url):
                 continue
 
             # put link in visited
-            visited[hyperlink] = frontier_item
+            visited.add(hyperlink, docid, frontier_item[FRONTIER_ITEM_INLINK_SET_INDEX])
             print("count:" + str(len(visited)) + " " + "depth:" + str(depth))
 
             # Get only content section HTML
-            html_content_body = get_content_body(BeautifulSoup(http_response.read()))
+            html_content_body = get_content_body(BeautifulSoup(fetch_result.body))
 
             # Document the visited link
             document_link_and_content(len(visited), anchor_text, hyperlink, depth, current_depth != depth, html_content_body, docid)
@@ -347,26 +352,40 @@ def internal_start_crawling(keyword=None):
             current_depth = depth
             # write_to_link_with_content(hyperlink, html_content_body)
 
-            # Get all the hyper links in the content section
+            # Get all the hyper links in the content section, a link repeated on the page is filtered once
+            discovered_links = set()
             for discovered_hyperlink in html_content_body.find_all('a', href=True):
                 # format relative links to absolute links and get anchor text
                 anchor_text, discovered_hyperlink = format_hyperlink(discovered_hyperlink)
 
+                # Truncating '#' part, links to sections of a page are queued and merged as one frontier item
+                discovered_hyperlink = discovered_hyperlink if discovered_hyperlink.find('#')==-1 else discovered_hyperlink[:discovered_hyperlink.find('#')]
+                if discovered_hyperlink in discovered_links:
+                    continue
+                discovered_links.add(discovered_hyperlink)
+
                # if is_link_administrative(hyperlink):
                 #    print(hyperlink)
 
                 # check to see if the links should be explored
-                if should_explore_link(discovered_hyperlink, anchor_text=None, keyword=None, depth=(depth + 1)):
+                if should_explore_link(discovered_hyperlink, anchor_text=None, keyword=None, depth=(depth + 1)) \
+                        and is_allowed_by_robots(discovered_hyperlink):
                     # if yes add the link to frontier
-                    frontier.append((anchor_text, discovered_hyperlink, depth + 1, get_next_docid(), {frontier_item[FRONTIER_ITEM_DOC_ID_INDEX]}))
+                    frontier.add((anchor_text, discovered_hyperlink, depth + 1, get_next_docid(), create_inlinks([frontier_item[FRONTIER_ITEM_DOC_ID_INDEX]])))
+
+                elif discovered_hyperlink in visited:
+                    visited.add_inlink(discovered_hyperlink, frontier_item[FRONTIER_ITEM_DOC_ID_INDEX])
 
-                elif is_link_visited(discovered_hyperlink):
-                    visited[discovered_hyperlink][FRONTIER_ITEM_INLINK_SET_INDEX].add(frontier_item[FRONTIER_ITEM_DOC_ID_INDEX])
+                elif discovered_hyperlink in frontier:
+                    frontier.merge_inlinks(discovered_hyperlink, [frontier_item[FRONTIER_ITEM_DOC_ID_INDEX]])
 
 
 
 if __name__ == '__main__':
-    start = time.clock()
+    args = set(sys.argv)
+    ROBOTS_TXT_ENABLED = "-robots" in args
+    ADAPTIVE_POLITENESS_ENABLED = "-adaptivePoliteness" in args
+    start = time.perf_counter()
     start_crawling(sys.argv[1])
-    print("Time taken:"+str(time.clock() - start))
+    print("Time taken:"+str(time.perf_counter() - start))
 
@@ -7,6 +7,10 @@ import time
 import os
 from bs4 import BeautifulSoup
 
+# make the shared crawler package at the repository root importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawler.record_store import RecordStoreReader, get_index_path
+
 CASE_FOLDING = True
 PUNCTUATION_REMOVAL = True
 LINKS_WITH_CONTENT_PATH = ""
@@ -63,6 +67,33 @@ def sanitize_content(content):
     return re.sub(r"([\n\t])+", " ", content, 0)
 
 
+def write_sanitized_file(sanitized_output_file_name, sanitized_output_file_content):
+    sanitized_output_file_name = "./sanitised_output/" + sanitized_output_file_name
+    sanitized_output_file_name += ".txt"
+    print("Writing file: " + sanitized_output_file_name)
+    write_parsed_file(sanitized_output_file_name, sanitize_content(sanitized_output_file_content))
+
+
+def start_corpus_generation_from_record_store():
+    '''
+    Reads the raw contents from the record store written by the crawler
+    sanitizes and writes sanitized file.
+    :return: None
+    '''
+    for docid, link, body in RecordStoreReader(LINKS_WITH_CONTENT_PATH):
+        sanitized_output_file_name = get_filename(link)
+        sanitized_output_file_content = sanitized_output_file_name.replace("_", "")
+
+        # collect the non empty lines of the body,
+        # the same way they are read from the raw URL with contents file.
+        for line in body.split("\n"):
+            line = line.strip()
+            if line != "":
+                sanitized_output_file_content += (line + "\n")
+
+        write_sanitized_file(sanitized_output_file_name, sanitized_output_file_content)
+
+
 def start_corpus_generation():
     '''
     Reads the contents of raw URL with contents file
@@ -104,10 +135,7 @@ def start_corpus_generation():
             # it marks the end of the content
             elif line == BODY_END_IDENTIFIER:
                 body_stared = False
-                sanitized_output_file_name = "./sanitised_output/" + sanitized_output_file_name
-                sanitized_output_file_name += ".txt"
-                print("Writing file: " + sanitized_output_file_name)
-                write_parsed_file(sanitized_output_file_name, sanitize_content(sanitized_output_file_content))
+                write_sanitized_file(sanitized_output_file_name, sanitized_output_file_content)
 
                 sanitized_output_file_name = ""
                 sanitized_output_file_content = ""
@@ -126,5 +154,9 @@ if __name__ == '__main__':
     PUNCTUATION_REMOVAL = "-noPunRemoval" not in args
     LINKS_WITH_CONTENT_PATH = sys.argv[1]
     start = time.clock()
-    start_corpus_generation()
+    if os.path.exists(get_index_path(LINKS_WITH_CONTENT_PATH)):
+        # raw contents in a record store written with -rawContentStore
+        start_corpus_generation_from_record_store()
+    else:
+        start_corpus_generation()
     print("Time taken:"+str(time.clock() - start))
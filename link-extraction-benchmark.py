@@ -0,0 +1,93 @@
+import sys
+import time
+from os import listdir
+from os.path import join
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from crawler.link_extractor import extract_content_links
+
+# Number of times every page is parsed by each extractor.
+REPEAT_COUNT = 5
+
+# Only the content section of a page is parsed by SoupStrainer.
+CONTENT_STRAINER = SoupStrainer("div", attrs={"id": "content", "role": "main"})
+
+
+def load_saved_pages(dir_path):
+    '''
+    Loads saved pages i.e. raw html files from dir_path.
+    :param dir_path: directory with the saved pages
+    :return: list of (file name, raw html bytes)
+    '''
+    saved_pages = []
+    for file in sorted(listdir(dir_path)):
+        with open(join(dir_path, file), 'rb') as saved_page_file:
+            saved_pages.append((file, saved_page_file.read()))
+    return saved_pages
+
+
+def extract_with_beautiful_soup(raw_html):
+    '''
+    The crawler's current path, a full BeautifulSoup parse
+    followed by find and find_all over the content section.
+    :param raw_html: raw html
+    :return: list of (anchor text, href)
+    '''
+    html_content_body = BeautifulSoup(raw_html).find("div", {"id": "content", "role": "main"})
+    return [(hyperlink.getText(), hyperlink['href']) for hyperlink in html_content_body.find_all('a', href=True)]
+
+
+def extract_with_soup_strainer(raw_html):
+    '''
+    BeautifulSoup building only the content section.
+    :param raw_html: raw html
+    :return: list of (anchor text, href)
+    '''
+    html_content_body = BeautifulSoup(raw_html, parse_only=CONTENT_STRAINER)
+    return [(hyperlink.getText(), hyperlink['href']) for hyperlink in html_content_body.find_all('a', href=True)]
+
+
+def extract_with_streaming_extractor(raw_html):
+    '''
+    The streaming ContentLinkExtractor.
+    :param raw_html: raw html
+    :return: list of (anchor text, href)
+    '''
+    return extract_content_links(raw_html)[1]
+
+
+EXTRACTORS = [
+    ("BeautifulSoup (current)", extract_with_beautiful_soup),
+    ("BeautifulSoup + SoupStrainer", extract_with_soup_strainer),
+    ("ContentLinkExtractor", extract_with_streaming_extractor)
+]
+
+
+def benchmark(saved_pages):
+    '''
+    Times every extractor over the saved pages and checks that
+    they extract the same links as the current path.
+    :param saved_pages: list of (file name, raw html bytes)
+    :return: None
+    '''
+    expected_links = {file: extract_with_beautiful_soup(raw_html) for file, raw_html in saved_pages}
+    link_count = sum(len(links) for links in expected_links.values())
+    print("Pages: " + str(len(saved_pages)) + " Links: " + str(link_count))
+
+    for extractor_name, extractor in EXTRACTORS:
+        mismatches = [file for file, raw_html in saved_pages if extractor(raw_html) != expected_links[file]]
+
+        start = time.perf_counter()
+        for i in range(REPEAT_COUNT):
+            for file, raw_html in saved_pages:
+                extractor(raw_html)
+        time_taken = time.perf_counter() - start
+
+        print(extractor_name + "|" +
+              "pages/sec: " + str(round(REPEAT_COUNT * len(saved_pages) / time_taken, 2)) + "|" +
+              "mismatching pages: " + str(len(mismatches)) + " " + " ".join(mismatches))
+
+
+if __name__ == '__main__':
+    benchmark(load_saved_pages(sys.argv[1]))
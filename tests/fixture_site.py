@@ -0,0 +1,192 @@
+import random
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Fixture sites of the crawl tests, each served at FIXTURE_HOST on its own port. The tests
+# replay the fetch archives in fixtures/ instead, recorded from them with e.g.
+#
+#   python tests/fixture_site.py
+#   python hw2/crawler-task-1a.py http://127.0.0.1:8000/wiki/Page_0 -record \
+#       -prefixToFollow=http://127.0.0.1:8000/wiki -politenessDelay=0
+#
+# and the fetch_archive directory of the crawl moved to tests/fixtures, see FIXTURE_SITES.
+FIXTURE_HOST = "127.0.0.1"
+FIXTURE_PORT = 8000
+FIXTURE_PREFIX_TO_FOLLOW = "http://" + FIXTURE_HOST + ":" + str(FIXTURE_PORT) + "/wiki"
+FIXTURE_SEED_URL = FIXTURE_PREFIX_TO_FOLLOW + "/Page_0"
+
+# Pages of the site, each links to FIXTURE_LINKS_PER_PAGE random pages, an
+# administrative page, a section of itself and a section of another page.
+FIXTURE_PAGE_COUNT = 60
+FIXTURE_LINKS_PER_PAGE = 8
+FIXTURE_RANDOM_SEED = 7
+
+# Topical site of the focused crawl tests, recorded from
+#
+#   python tests/fixture_site.py topical
+#   python crawler-task-2.py http://127.0.0.1:8001/wiki/Page_3 rain -record -bestFirst \
+#       -prefixToFollow=http://127.0.0.1:8001/wiki -politenessDelay=0
+#
+# to fixtures/topical_archive. Every TOPICAL_PAGE_STEP-th page is about rain, the
+# other pages are not. Each page links to TOPICAL_LINKS_PER_PAGE random pages, half
+# of the links to a page about rain mention rain in their anchor text.
+TOPICAL_PORT = 8001
+TOPICAL_PREFIX_TO_FOLLOW = "http://" + FIXTURE_HOST + ":" + str(TOPICAL_PORT) + "/wiki"
+TOPICAL_SEED_URL = TOPICAL_PREFIX_TO_FOLLOW + "/Page_3"
+TOPICAL_KEYWORD = "rain"
+TOPICAL_PAGE_COUNT = 200
+TOPICAL_PAGE_STEP = 3
+TOPICAL_LINKS_PER_PAGE = 10
+TOPICAL_RANDOM_SEED = 11
+
+# Skewed site of the crawl order tests, recorded from
+#
+#   python tests/fixture_site.py skewed
+#   python hw2/crawler-task-1a.py http://127.0.0.1:8002/wiki/Page_0 -record \
+#       -prefixToFollow=http://127.0.0.1:8002/wiki -politenessDelay=0
+#
+# to fixtures/skewed_archive. Each page links to SKEWED_LINKS_PER_PAGE pages drawn
+# with a probability of 1 / (page + 1) ** SKEWED_IN_DEGREE_EXPONENT, so a few pages
+# have most of the in-links, and to one page drawn uniformly, so all are reachable.
+SKEWED_PORT = 8002
+SKEWED_PREFIX_TO_FOLLOW = "http://" + FIXTURE_HOST + ":" + str(SKEWED_PORT) + "/wiki"
+SKEWED_SEED_URL = SKEWED_PREFIX_TO_FOLLOW + "/Page_0"
+SKEWED_PAGE_COUNT = 400
+SKEWED_LINKS_PER_PAGE = 8
+SKEWED_IN_DEGREE_EXPONENT = 1.2
+SKEWED_RANDOM_SEED = 5
+
+# Alias site of the canonical URL tests, recorded as the skewed site from port 8003
+# to fixtures/alias_archive. The pages of the fixture site, each also linking to
+# pages of it through an alias redirecting to the page, with a trailing slash and
+# with an escaped letter in its path, all three serving the page.
+ALIAS_PORT = 8003
+ALIAS_PREFIX_TO_FOLLOW = "http://" + FIXTURE_HOST + ":" + str(ALIAS_PORT) + "/wiki"
+ALIAS_SEED_URL = ALIAS_PREFIX_TO_FOLLOW + "/Page_0"
+
+
+def create_fixture_pages():
+    '''
+    :return: dict of path vs html of the pages of the fixture site.
+    '''
+    random_generator = random.Random(FIXTURE_RANDOM_SEED)
+    pages = dict()
+    for page in range(FIXTURE_PAGE_COUNT):
+        links = random_generator.sample(range(FIXTURE_PAGE_COUNT), FIXTURE_LINKS_PER_PAGE)
+        content = "".join('<a href="/wiki/Page_%d">Page %d</a> ' % (link, link) for link in links)
+        content += '<a href="/wiki/Help:Contents">Help</a> <a href="#Section">Section</a> ' \
+                   '<a href="/wiki/Page_%d#Section">Section of page %d</a>' % (links[0], links[0])
+        pages["/wiki/Page_%d" % page] = '<html><body><div id="content" role="main"><p>Page %d</p>%s</div>' \
+                                        '</body></html>' % (page, content)
+    return pages
+
+
+def is_topical_page(page):
+    return page % TOPICAL_PAGE_STEP == 0
+
+
+def create_topical_pages():
+    '''
+    :return: dict of path vs html of the pages of the topical site.
+    '''
+    random_generator = random.Random(TOPICAL_RANDOM_SEED)
+    pages = dict()
+    for page in range(TOPICAL_PAGE_COUNT):
+        content = "<p>Heavy rain and rains, more rain</p>" if is_topical_page(page) else "<p>History of trade routes</p>"
+        for link in random_generator.sample(range(TOPICAL_PAGE_COUNT), TOPICAL_LINKS_PER_PAGE):
+            if is_topical_page(link) and random_generator.random() < 0.5:
+                content += '<a href="/wiki/Page_%d">Rain in region %d</a> ' % (link, link)
+            else:
+                content += '<a href="/wiki/Page_%d">Article %d</a> ' % (link, link)
+        pages["/wiki/Page_%d" % page] = '<html><body><div id="content" role="main">%s</div>' \
+                                        '</body></html>' % content
+    return pages
+
+
+def create_skewed_pages():
+    '''
+    :return: dict of path vs html of the pages of the skewed site.
+    '''
+    random_generator = random.Random(SKEWED_RANDOM_SEED)
+    weights = [1 / (page + 1) ** SKEWED_IN_DEGREE_EXPONENT for page in range(SKEWED_PAGE_COUNT)]
+    pages = dict()
+    for page in range(SKEWED_PAGE_COUNT):
+        links = random_generator.choices(range(SKEWED_PAGE_COUNT), weights, k=SKEWED_LINKS_PER_PAGE)
+        links.append(random_generator.randrange(SKEWED_PAGE_COUNT))
+        content = "".join('<a href="/wiki/Page_%d">Page %d</a> ' % (link, link) for link in links)
+        pages["/wiki/Page_%d" % page] = '<html><body><div id="content" role="main"><p>Page %d</p>%s</div>' \
+                                        '</body></html>' % (page, content)
+    return pages
+
+
+def create_alias_pages():
+    '''
+    :return: dict of path vs html of the pages of the alias site, aliases included.
+    '''
+    pages = dict()
+    for path, html in create_fixture_pages().items():
+        page = int(path[len("/wiki/Page_"):])
+        alias_links = '<a href="/wiki/Alias_%d">Alias of page %d</a> ' \
+                      '<a href="/wiki/Page_%d/">Page %d</a> <a href="/wiki/Pag%%65_%d">Page %d</a>' \
+                      % ((page * 7 + 3) % FIXTURE_PAGE_COUNT, (page * 7 + 3) % FIXTURE_PAGE_COUNT,
+                         (page * 7 + 4) % FIXTURE_PAGE_COUNT, (page * 7 + 4) % FIXTURE_PAGE_COUNT,
+                         (page * 7 + 5) % FIXTURE_PAGE_COUNT, (page * 7 + 5) % FIXTURE_PAGE_COUNT)
+        pages[path] = pages[path + "/"] = pages["/wiki/Pag%65_" + str(page)] = \
+            html.replace("</div>", alias_links + "</div>")
+    return pages
+
+
+def create_alias_redirects():
+    '''
+    :return: dict of path vs the path it redirects to, of the aliases of the alias site.
+    '''
+    return {"/wiki/Alias_%d" % page: "/wiki/Page_%d" % page for page in range(FIXTURE_PAGE_COUNT)}
+
+
+# name vs (port, function returning the pages, function returning the redirects or None) of the fixture sites
+FIXTURE_SITES = {
+    "fixture": (FIXTURE_PORT, create_fixture_pages, None),
+    "topical": (TOPICAL_PORT, create_topical_pages, None),
+    "skewed": (SKEWED_PORT, create_skewed_pages, None),
+    "aliases": (ALIAS_PORT, create_alias_pages, create_alias_redirects)
+}
+
+
+def create_request_handler(pages, redirects=None):
+    '''
+    :param pages: dict of path vs html of the pages to serve
+    :param redirects: dict of path vs the path it redirects to, None for no redirects
+    :return: request handler class serving the pages.
+    '''
+    return type("SiteRequestHandler", (FixtureRequestHandler,), {"pages": pages, "redirects": redirects or dict()})
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    pages = dict()
+    redirects = dict()
+
+    def do_GET(self):
+        location = self.redirects.get(self.path)
+        if location is not None:
+            self.send_response(301)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        page = self.pages.get(self.path)
+        if page is None:
+            self.send_error(404)
+            return
+        body = page.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+if __name__ == '__main__':
+    # python tests/fixture_site.py [<site name, see FIXTURE_SITES>]
+    port, create_pages, create_redirects = FIXTURE_SITES[sys.argv[1] if len(sys.argv) > 1 else "fixture"]
+    redirects = create_redirects() if create_redirects is not None else None
+    ThreadingHTTPServer((FIXTURE_HOST, port), create_request_handler(create_pages(), redirects)).serve_forever()
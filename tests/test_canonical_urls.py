@@ -0,0 +1,102 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from crawler.canonical_urls import CanonicalUrlMap, canonicalize_url
+from fixture_site import ALIAS_PREFIX_TO_FOLLOW, ALIAS_SEED_URL, FIXTURE_PAGE_COUNT
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CRAWLER_SCRIPT = os.path.join(os.path.dirname(TESTS_DIRECTORY), "hw2", "crawler-task-1a.py")
+ALIAS_ARCHIVE_DIRECTORY = os.path.join(TESTS_DIRECTORY, "fixtures", "alias_archive")
+REDIRECT_MAP_FILE_NAME = "G1_REDIRECTS.txt"
+
+
+@pytest.mark.parametrize("hyperlink, canonical_form", [
+    ("HTTPS://En.Wikipedia.ORG/wiki/Rain", "https://en.wikipedia.org/wiki/Rain"),
+    ("https://en.wikipedia.org:443/wiki/Rain", "https://en.wikipedia.org/wiki/Rain"),
+    ("http://en.wikipedia.org:80/wiki/Rain", "http://en.wikipedia.org/wiki/Rain"),
+    ("http://en.wikipedia.org:8080/wiki/Rain", "http://en.wikipedia.org:8080/wiki/Rain"),
+    ("https://en.wikipedia.org/wiki/Rain#History", "https://en.wikipedia.org/wiki/Rain"),
+    ("https://en.wikipedia.org/wiki/Rain/", "https://en.wikipedia.org/wiki/Rain"),
+    ("https://en.wikipedia.org/wiki/R%61in", "https://en.wikipedia.org/wiki/Rain"),
+    ("https://en.wikipedia.org/wiki/Rain%3f", "https://en.wikipedia.org/wiki/Rain%3F"),
+    ("https://en.wikipedia.org/", "https://en.wikipedia.org/"),
+])
+def test_canonicalize_url(hyperlink, canonical_form):
+    assert canonicalize_url(hyperlink) == canonical_form
+
+
+def test_redirects_are_resolved_and_saved(tmp_path):
+    redirect_map_file_name = str(tmp_path / REDIRECT_MAP_FILE_NAME)
+    canonical_urls = CanonicalUrlMap(redirect_map_file_name)
+    canonical_urls.add_redirect("https://en.wikipedia.org/wiki/Rainfall", "https://en.wikipedia.org/wiki/Rain")
+    # a redirect to a redirect is followed to the end of the chain
+    canonical_urls.add_redirect("https://en.wikipedia.org/wiki/Rain_fall", "https://en.wikipedia.org/wiki/Rainfall/")
+    assert canonical_urls.resolve("https://en.wikipedia.org/wiki/Rain_fall#Types") == \
+           "https://en.wikipedia.org/wiki/Rain"
+    canonical_urls.close()
+
+    # a later crawl loads the redirects
+    reloaded_canonical_urls = CanonicalUrlMap(redirect_map_file_name)
+    assert reloaded_canonical_urls.resolve("https://en.wikipedia.org/wiki/Rainfall") == \
+           "https://en.wikipedia.org/wiki/Rain"
+    assert reloaded_canonical_urls.resolve("https://en.wikipedia.org/wiki/Snow/") == \
+           "https://en.wikipedia.org/wiki/Snow"
+    reloaded_canonical_urls.close()
+
+
+def crawl_alias_site(crawl_directory, canonical_urls):
+    '''
+    Crawls the alias site, replaying the alias archive of crawl_directory.
+    :param crawl_directory: directory the crawl writes its files to
+    :param canonical_urls: True to crawl with -canonicalUrls
+    :return: tuple (<list of the crawled URLs>, <set of (in-link URL, URL) of the graph>)
+    '''
+    subprocess.run([sys.executable, CRAWLER_SCRIPT, ALIAS_SEED_URL, "-replay", "-replayLatency=0",
+                    "-prefixToFollow=" + ALIAS_PREFIX_TO_FOLLOW, "-politenessDelay=0"] +
+                   (["-canonicalUrls"] if canonical_urls else []),
+                   cwd=crawl_directory, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url_by_docid = dict()
+    with open(os.path.join(crawl_directory, "G1_LINKS.txt"), 'r', encoding="utf-8") as links_file:
+        for link_item in links_file:
+            link_tokens = link_item.strip().split("|")
+            if len(link_tokens) > 1:
+                url_by_docid[link_tokens[1]] = link_tokens[-1]
+    edges = set()
+    with open(os.path.join(crawl_directory, "G1.txt"), 'r', encoding="utf-8") as graph_file:
+        for vertex_item in graph_file:
+            vertex_tokens = vertex_item.split()
+            edges.update((url_by_docid[inlink], url_by_docid[vertex_tokens[0]]) for inlink in vertex_tokens[1:])
+    return list(url_by_docid.values()), edges
+
+
+@pytest.fixture
+def crawl_directory(tmp_path):
+    shutil.copytree(ALIAS_ARCHIVE_DIRECTORY, os.path.join(tmp_path, "fetch_archive"))
+    return tmp_path
+
+
+def get_page_urls():
+    return sorted(ALIAS_PREFIX_TO_FOLLOW + "/Page_" + str(page) for page in range(FIXTURE_PAGE_COUNT))
+
+
+def test_aliases_are_crawled_as_duplicates_without_canonical_urls(crawl_directory):
+    crawled_urls, edges = crawl_alias_site(crawl_directory, False)
+    # every page is crawled under its own URL, with a trailing slash and escaped
+    assert len(set(crawled_urls)) == len(crawled_urls) == 3 * FIXTURE_PAGE_COUNT
+
+
+def test_aliases_are_crawled_once_with_canonical_urls(crawl_directory):
+    crawled_urls, edges = crawl_alias_site(crawl_directory, True)
+    assert sorted(crawled_urls) == get_page_urls()
+    with open(os.path.join(crawl_directory, REDIRECT_MAP_FILE_NAME), 'r', encoding="utf-8") as redirect_map_file:
+        assert len(redirect_map_file.read().splitlines()) == FIXTURE_PAGE_COUNT
+
+    # a later crawl resolves the aliases from the redirect map before fetching
+    # them, doc ids differ but it crawls the same pages and links
+    recrawled_urls, recrawled_edges = crawl_alias_site(crawl_directory, True)
+    assert sorted(recrawled_urls) == get_page_urls()
+    assert recrawled_edges == edges
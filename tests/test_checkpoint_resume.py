@@ -0,0 +1,135 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from fixture_site import FIXTURE_PREFIX_TO_FOLLOW, FIXTURE_SEED_URL
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CRAWLER_SCRIPT = os.path.join(os.path.dirname(TESTS_DIRECTORY), "hw2", "crawler-task-1a.py")
+FIXTURE_ARCHIVE_DIRECTORY = os.path.join(TESTS_DIRECTORY, "fixtures", "fetch_archive")
+CHECKPOINT_FILE_NAME = "G1_CHECKPOINT.pickle"
+OUTPUT_FILE_NAMES = ["G1.txt", "G1_LINKS.txt"]
+
+# the crawler checkpoints every 50 pages, a crawl failing on page 55 leaves a checkpoint
+PAGE_AFTER_CHECKPOINT = 55
+PAGE_BEFORE_CHECKPOINT = 9
+
+
+def run_crawl(crawl_directory, seed_url=FIXTURE_SEED_URL, resume=False):
+    '''
+    Crawls the fixture site, replaying the fetch archive of crawl_directory.
+    :return: CompletedProcess of the crawl.
+    '''
+    return subprocess.run([sys.executable, CRAWLER_SCRIPT, seed_url, "-replay", "-replayLatency=0",
+                           "-prefixToFollow=" + FIXTURE_PREFIX_TO_FOLLOW, "-politenessDelay=0"] +
+                          (["--resume"] if resume else []),
+                          cwd=crawl_directory, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                          universal_newlines=True)
+
+
+def read_output(crawl_directory):
+    output = dict()
+    for file_name in OUTPUT_FILE_NAMES:
+        with open(os.path.join(crawl_directory, file_name), 'r', encoding="utf-8") as output_file:
+            output[file_name] = output_file.read()
+    return output
+
+
+def get_crawled_urls(output):
+    return [link_item.split("|")[-1] for link_item in output["G1_LINKS.txt"].splitlines() if "|" in link_item]
+
+
+def get_archive_path(archive_directory, hyperlink):
+    return os.path.join(archive_directory, hashlib.sha1(hyperlink.encode("utf-8")).hexdigest())
+
+
+def corrupt_archived_page(crawl_directory, hyperlink):
+    '''
+    Replaces the archived body of the hyperlink with bytes that do not decompress,
+    so the crawl fails when it fetches the hyperlink.
+    :return: None
+    '''
+    archive_path = get_archive_path(os.path.join(crawl_directory, "fetch_archive"), hyperlink)
+    with open(archive_path, 'rb') as archive_file:
+        header = archive_file.readline()
+    with open(archive_path, 'wb') as archive_file:
+        archive_file.write(header + b"not zlib")
+
+
+def restore_archived_page(crawl_directory, hyperlink):
+    shutil.copy(get_archive_path(FIXTURE_ARCHIVE_DIRECTORY, hyperlink),
+                get_archive_path(os.path.join(crawl_directory, "fetch_archive"), hyperlink))
+
+
+@pytest.fixture(scope="module")
+def uninterrupted_output(tmp_path_factory):
+    crawl_directory = tmp_path_factory.mktemp("uninterrupted")
+    shutil.copytree(FIXTURE_ARCHIVE_DIRECTORY, os.path.join(crawl_directory, "fetch_archive"))
+    run_crawl(crawl_directory).check_returncode()
+    return read_output(crawl_directory)
+
+
+@pytest.fixture
+def crawl_directory(tmp_path):
+    shutil.copytree(FIXTURE_ARCHIVE_DIRECTORY, os.path.join(tmp_path, "fetch_archive"))
+    return tmp_path
+
+
+def crash_crawl_at_page(crawl_directory, crawled_urls, page):
+    '''
+    Runs a crawl failing when it fetches its page-th page.
+    :return: None
+    '''
+    corrupt_archived_page(crawl_directory, crawled_urls[page - 1])
+    assert run_crawl(crawl_directory).returncode != 0
+    restore_archived_page(crawl_directory, crawled_urls[page - 1])
+
+
+def test_finished_crawl_is_not_resumed(crawl_directory, uninterrupted_output):
+    run_crawl(crawl_directory).check_returncode()
+    assert not os.path.exists(os.path.join(crawl_directory, CHECKPOINT_FILE_NAME))
+
+    completed_process = run_crawl(crawl_directory, resume=True)
+    completed_process.check_returncode()
+    assert "Resuming crawl" not in completed_process.stdout
+    assert read_output(crawl_directory) == uninterrupted_output
+
+
+def test_resumed_crawl_matches_uninterrupted_crawl(crawl_directory, uninterrupted_output):
+    crash_crawl_at_page(crawl_directory, get_crawled_urls(uninterrupted_output), PAGE_AFTER_CHECKPOINT)
+    assert os.path.exists(os.path.join(crawl_directory, CHECKPOINT_FILE_NAME))
+
+    completed_process = run_crawl(crawl_directory, resume=True)
+    completed_process.check_returncode()
+    assert "Resuming crawl at count:50" in completed_process.stdout
+    assert read_output(crawl_directory) == uninterrupted_output
+
+
+def test_new_crawl_discards_checkpoint_of_earlier_crawl(crawl_directory, uninterrupted_output):
+    crawled_urls = get_crawled_urls(uninterrupted_output)
+    crash_crawl_at_page(crawl_directory, crawled_urls, PAGE_AFTER_CHECKPOINT)
+    crash_crawl_at_page(crawl_directory, crawled_urls, PAGE_BEFORE_CHECKPOINT)
+    assert not os.path.exists(os.path.join(crawl_directory, CHECKPOINT_FILE_NAME))
+
+    completed_process = run_crawl(crawl_directory, resume=True)
+    completed_process.check_returncode()
+    assert "Resuming crawl" not in completed_process.stdout
+    assert read_output(crawl_directory) == uninterrupted_output
+
+
+def test_checkpoint_of_another_seed_is_not_resumed(crawl_directory, uninterrupted_output):
+    crawled_urls = get_crawled_urls(uninterrupted_output)
+    crash_crawl_at_page(crawl_directory, crawled_urls, PAGE_AFTER_CHECKPOINT)
+    with open(os.path.join(crawl_directory, "G1_LINKS.txt"), 'r', encoding="utf-8") as links_file:
+        links_before_resume = links_file.read()
+
+    completed_process = run_crawl(crawl_directory, crawled_urls[1], resume=True)
+    completed_process.check_returncode()
+    assert "The checkpoint is of a crawl from another seed:" + FIXTURE_SEED_URL in completed_process.stdout
+    assert os.path.exists(os.path.join(crawl_directory, CHECKPOINT_FILE_NAME))
+    with open(os.path.join(crawl_directory, "G1_LINKS.txt"), 'r', encoding="utf-8") as links_file:
+        assert links_file.read() == links_before_resume
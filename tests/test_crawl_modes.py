@@ -0,0 +1,66 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from fixture_site import FIXTURE_PAGE_COUNT, FIXTURE_PREFIX_TO_FOLLOW, FIXTURE_SEED_URL
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CRAWLER_SCRIPT = os.path.join(os.path.dirname(TESTS_DIRECTORY), "hw2", "crawler-task-1a.py")
+FIXTURE_ARCHIVE_DIRECTORY = os.path.join(TESTS_DIRECTORY, "fixtures", "fetch_archive")
+
+# output files every crawl mode must write the same
+OUTPUT_FILE_NAMES = ["G1.txt", "G1_LINKS.txt"]
+
+CRAWL_MODE_FLAGS = {
+    "serial": [],
+    "async": ["-async"],
+    "threads": ["-threads"],
+    "pipeline": ["-pipeline"]
+}
+
+
+def crawl_fixture_site(mode, crawl_directory):
+    '''
+    Crawls the fixture site in the mode, replaying the fixture archive.
+    :param mode: key of CRAWL_MODE_FLAGS
+    :param crawl_directory: directory the crawl writes its files to
+    :return: dict of output file name vs its content
+    '''
+    shutil.copytree(FIXTURE_ARCHIVE_DIRECTORY, os.path.join(crawl_directory, "fetch_archive"))
+    subprocess.run([sys.executable, CRAWLER_SCRIPT, FIXTURE_SEED_URL, "-replay", "-replayLatency=0",
+                    "-prefixToFollow=" + FIXTURE_PREFIX_TO_FOLLOW, "-politenessDelay=0"] + CRAWL_MODE_FLAGS[mode],
+                   cwd=crawl_directory, check=True, stdout=subprocess.DEVNULL)
+    output = dict()
+    for file_name in OUTPUT_FILE_NAMES:
+        with open(os.path.join(crawl_directory, file_name), 'r', encoding="utf-8") as output_file:
+            output[file_name] = output_file.read()
+    return output
+
+
+@pytest.fixture(scope="module")
+def serial_output(tmp_path_factory):
+    return crawl_fixture_site("serial", tmp_path_factory.mktemp("serial"))
+
+
+def test_serial_crawl_covers_fixture_site(serial_output):
+    crawled_urls = [link_item.split("|")[-1] for link_item in serial_output["G1_LINKS.txt"].splitlines()
+                    if "|" in link_item]
+    assert sorted(crawled_urls) == sorted(FIXTURE_PREFIX_TO_FOLLOW + "/Page_" + str(page)
+                                          for page in range(FIXTURE_PAGE_COUNT))
+
+
+@pytest.mark.parametrize("mode", ["async", "threads", "pipeline"])
+def test_crawl_mode_matches_serial_crawl(mode, serial_output, tmp_path):
+    assert crawl_fixture_site(mode, tmp_path) == serial_output
+
+
+@pytest.mark.parametrize("flag", ["--resume", "-spillFrontier", "-edgeLog", "-pipeline", "-opic"])
+def test_partitioned_crawl_rejects_unsupported_flag(flag, tmp_path):
+    completed_process = subprocess.run([sys.executable, CRAWLER_SCRIPT, FIXTURE_SEED_URL, "-processes=2", flag],
+                                       cwd=tmp_path, stdout=subprocess.PIPE, universal_newlines=True)
+    assert completed_process.returncode == 1
+    assert completed_process.stdout == flag + " cannot be used with -processes.\n"
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,89 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from fixture_site import SKEWED_PREFIX_TO_FOLLOW, SKEWED_SEED_URL
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIRECTORY = os.path.dirname(TESTS_DIRECTORY)
+CRAWLER_SCRIPT = os.path.join(REPOSITORY_DIRECTORY, "hw2", "crawler-task-1a.py")
+CRAWL_ORDER_COMPARISON_SCRIPT = os.path.join(REPOSITORY_DIRECTORY, "crawl-order-comparison.py")
+SKEWED_ARCHIVE_DIRECTORY = os.path.join(TESTS_DIRECTORY, "fixtures", "skewed_archive")
+
+# page budget of the compared crawls, a tenth of the site
+MAX_PAGES = 40
+
+CRAWL_ORDER_FLAGS = {
+    "reference": [],
+    "bfs": ["-maxPages=" + str(MAX_PAGES)],
+    "opic": ["-maxPages=" + str(MAX_PAGES), "-opic"],
+    "opicAsync": ["-maxPages=" + str(MAX_PAGES), "-opic", "-async"]
+}
+
+
+def crawl_skewed_site(crawl_order, crawl_directory):
+    '''
+    Crawls the skewed site in the crawl order, replaying the skewed archive.
+    :param crawl_order: key of CRAWL_ORDER_FLAGS, the reference crawl has no page budget
+    :param crawl_directory: directory the crawl writes its files to
+    :return: crawl_directory
+    '''
+    shutil.copytree(SKEWED_ARCHIVE_DIRECTORY, os.path.join(crawl_directory, "fetch_archive"))
+    subprocess.run([sys.executable, CRAWLER_SCRIPT, SKEWED_SEED_URL, "-replay", "-replayLatency=0",
+                    "-prefixToFollow=" + SKEWED_PREFIX_TO_FOLLOW, "-politenessDelay=0"] +
+                   CRAWL_ORDER_FLAGS[crawl_order],
+                   cwd=crawl_directory, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return crawl_directory
+
+
+def read_file(crawl_directory, file_name):
+    with open(os.path.join(crawl_directory, file_name), 'r', encoding="utf-8") as crawl_file:
+        return crawl_file.read()
+
+
+@pytest.fixture(scope="module")
+def crawl_directories(tmp_path_factory):
+    return {crawl_order: crawl_skewed_site(crawl_order, tmp_path_factory.mktemp(crawl_order))
+            for crawl_order in ["reference", "bfs", "opic"]}
+
+
+@pytest.fixture(scope="module")
+def collected_page_ranks(crawl_directories):
+    '''
+    :return: dict of crawl order vs the PageRank of the reference crawl its pages
+             collected after each fraction of the crawl, see crawl-order-comparison.py
+    '''
+    reference_directory = crawl_directories["reference"]
+    crawl_orders = ["bfs", "opic"]
+    completed_process = subprocess.run(
+        [sys.executable, CRAWL_ORDER_COMPARISON_SCRIPT, os.path.join(reference_directory, "G1.txt"),
+         os.path.join(reference_directory, "G1_LINKS.txt")] +
+        [os.path.join(crawl_directories[crawl_order], "G1_LINKS.txt") for crawl_order in crawl_orders],
+        check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    comparison_lines = [line for line in completed_process.stdout.splitlines() if "|" in line]
+    return {crawl_order: [float(page_rank) for page_rank in re.findall(r"PageRank after [0-9]+%: ([0-9.]+)", line)]
+            for crawl_order, line in zip(crawl_orders, comparison_lines)}
+
+
+def test_budgeted_crawls_stop_at_budget(crawl_directories):
+    for crawl_order in ["bfs", "opic"]:
+        crawled_urls = [link_item.split("|")[-1] for link_item in
+                        read_file(crawl_directories[crawl_order], "G1_LINKS.txt").splitlines() if "|" in link_item]
+        assert len(crawled_urls) == len(set(crawled_urls)) == MAX_PAGES
+
+
+def test_opic_crawl_collects_more_page_rank_than_bfs_crawl(collected_page_ranks):
+    # at every fraction of the crawl, the pages most linked to are found earlier
+    assert len(collected_page_ranks["opic"]) == len(collected_page_ranks["bfs"]) == 4
+    for opic_page_rank, bfs_page_rank in zip(collected_page_ranks["opic"], collected_page_ranks["bfs"]):
+        assert opic_page_rank > bfs_page_rank
+
+
+def test_async_opic_crawl_matches_serial_opic_crawl(crawl_directories, tmp_path):
+    crawl_skewed_site("opicAsync", tmp_path)
+    for file_name in ["G1.txt", "G1_LINKS.txt"]:
+        assert read_file(tmp_path, file_name) == read_file(crawl_directories["opic"], file_name)
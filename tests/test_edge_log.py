@@ -0,0 +1,69 @@
+import random
+
+from crawler.edge_log import EdgeLogWriter, finalize_edge_log
+
+
+def read_graph(graph_file_name):
+    with open(graph_file_name, 'r', encoding="utf-8") as graph_file:
+        return graph_file.read()
+
+
+def format_graph(inlinks_by_doc_id):
+    return "".join("D%d %s\n" % (doc_id, " ".join("D%d" % inlink for inlink in sorted(set(inlinks))))
+                   for doc_id, inlinks in sorted(inlinks_by_doc_id.items()))
+
+
+def test_external_sort_matches_in_memory_graph(tmp_path):
+    random_generator = random.Random(3)
+    edge_log_path = str(tmp_path / "edges.log")
+    writer = EdgeLogWriter(edge_log_path)
+    inlinks_by_doc_id = dict()
+    for doc_id in range(1, 301):
+        inlinks = [random_generator.randrange(1, 301) for i in range(5)]
+        inlinks_by_doc_id[doc_id] = inlinks
+        writer.write_node(doc_id, inlinks)
+    # in-links found after the pages were crawled, duplicates included
+    for i in range(2000):
+        doc_id = random_generator.randrange(1, 301)
+        inlink = random_generator.randrange(1, 301)
+        inlinks_by_doc_id[doc_id].append(inlink)
+        writer.write_edges(doc_id, [inlink])
+    writer.close()
+
+    # runs far smaller than the log, so they are merged from disk
+    graph_file_name = str(tmp_path / "graph.txt")
+    assert finalize_edge_log(edge_log_path, graph_file_name, run_size=97, temporary_directory=str(tmp_path)) == 300
+    assert read_graph(graph_file_name) == format_graph(inlinks_by_doc_id)
+    # the sorted runs are removed
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["edges.log", "graph.txt"]
+
+
+def test_page_without_inlinks_is_in_graph(tmp_path):
+    edge_log_path = str(tmp_path / "edges.log")
+    writer = EdgeLogWriter(edge_log_path)
+    writer.write_node(1, [])
+    writer.write_node(2, [1])
+    writer.close()
+    graph_file_name = str(tmp_path / "graph.txt")
+    finalize_edge_log(edge_log_path, graph_file_name)
+    assert read_graph(graph_file_name) == "D1 \nD2 D1\n"
+
+
+def test_resumed_log_drops_edges_past_offset_and_torn_record(tmp_path):
+    edge_log_path = str(tmp_path / "edges.log")
+    writer = EdgeLogWriter(edge_log_path)
+    writer.write_node(1, [])
+    writer.write_node(2, [1])
+    offset = writer.tell()
+    writer.write_node(3, [2])
+    writer.close()
+
+    writer = EdgeLogWriter(edge_log_path, offset)
+    writer.write_node(3, [1])
+    writer.close()
+    # a crash while a record was written leaves half of it
+    with open(edge_log_path, 'ab') as edge_log_file:
+        edge_log_file.write(b"\x01\x00\x00")
+    graph_file_name = str(tmp_path / "graph.txt")
+    assert finalize_edge_log(edge_log_path, graph_file_name) == 3
+    assert read_graph(graph_file_name) == "D1 \nD2 D1\nD3 D1\n"
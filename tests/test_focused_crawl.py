@@ -0,0 +1,92 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import nltk
+import pytest
+
+from fixture_site import TOPICAL_KEYWORD, TOPICAL_PREFIX_TO_FOLLOW, TOPICAL_SEED_URL
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CRAWLER_SCRIPT = os.path.join(os.path.dirname(TESTS_DIRECTORY), "crawler-task-2.py")
+TOPICAL_ARCHIVE_DIRECTORY = os.path.join(TESTS_DIRECTORY, "fixtures", "topical_archive")
+LINKS_FILE_NAME = "task2_links.txt"
+
+# page budget of the focused crawls
+MAX_PAGES = 40
+
+CRAWL_MODE_FLAGS = {
+    "serial": ["-harvestRate"],
+    "serialWithoutHarvestRate": [],
+    "bestFirst": ["-bestFirst"],
+    "bestFirstAsync": ["-bestFirst", "-async"]
+}
+
+
+def is_english_words_corpus_installed():
+    try:
+        nltk.data.find("corpora/words")
+        return True
+    except LookupError:
+        return False
+
+
+# matching the keyword looks its suffix up in the english words
+pytestmark = pytest.mark.skipif(not is_english_words_corpus_installed(),
+                                reason="the NLTK words corpus is not installed")
+
+
+def crawl_topical_site(mode, crawl_directory):
+    '''
+    Crawls the topical site for TOPICAL_KEYWORD in the mode, replaying the topical archive.
+    :param mode: key of CRAWL_MODE_FLAGS
+    :param crawl_directory: directory the crawl writes its files to
+    :return: tuple (<harvest rate>, <relevant page count>, <fetched page count>, <links file content>),
+             the first three None if the crawl did not report its harvest rate.
+    '''
+    shutil.copytree(TOPICAL_ARCHIVE_DIRECTORY, os.path.join(crawl_directory, "fetch_archive"))
+    completed_process = subprocess.run([sys.executable, CRAWLER_SCRIPT, TOPICAL_SEED_URL, TOPICAL_KEYWORD, "-replay",
+                                        "-replayLatency=0", "-prefixToFollow=" + TOPICAL_PREFIX_TO_FOLLOW,
+                                        "-politenessDelay=0", "-maxPages=" + str(MAX_PAGES)] + CRAWL_MODE_FLAGS[mode],
+                                       cwd=crawl_directory, check=True, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, universal_newlines=True)
+    harvest_rate = re.search(r"Harvest rate:([0-9.]+) relevant:([0-9]+) fetched:([0-9]+)", completed_process.stdout)
+    with open(os.path.join(crawl_directory, LINKS_FILE_NAME), 'r', encoding="utf-8") as links_file:
+        links = links_file.read()
+    if harvest_rate is None:
+        return None, None, None, links
+    return float(harvest_rate.group(1)), int(harvest_rate.group(2)), int(harvest_rate.group(3)), links
+
+
+@pytest.fixture(scope="module")
+def serial_crawl(tmp_path_factory):
+    return crawl_topical_site("serial", tmp_path_factory.mktemp("serial"))
+
+
+@pytest.fixture(scope="module")
+def best_first_crawl(tmp_path_factory):
+    return crawl_topical_site("bestFirst", tmp_path_factory.mktemp("bestFirst"))
+
+
+def test_serial_crawl_only_fetches_relevant_pages(serial_crawl):
+    harvest_rate, relevant_page_count, fetched_page_count, links = serial_crawl
+    assert harvest_rate == 1.0
+    # the keyword filter runs out of matching links before the budget
+    assert 0 < fetched_page_count < MAX_PAGES
+
+
+def test_serial_crawl_only_matches_page_content_for_harvest_rate(serial_crawl, tmp_path):
+    assert crawl_topical_site("serialWithoutHarvestRate", tmp_path) == (None, None, None, serial_crawl[3])
+
+
+def test_best_first_crawl_uses_whole_budget(serial_crawl, best_first_crawl):
+    harvest_rate, relevant_page_count, fetched_page_count, links = best_first_crawl
+    assert fetched_page_count == MAX_PAGES
+    assert harvest_rate >= 0.9
+    assert relevant_page_count > serial_crawl[1]
+
+
+def test_async_best_first_crawl_matches_serial_best_first_crawl(best_first_crawl, tmp_path):
+    assert crawl_topical_site("bestFirstAsync", tmp_path) == best_first_crawl
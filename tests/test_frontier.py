@@ -0,0 +1,182 @@
+import pickle
+
+import pytest
+
+from crawler.frontier import BFSFrontier, OPICFrontier, PriorityFrontier, SpillingBFSFrontier
+from crawler.visited_store import create_inlinks
+
+URL_INDEX = 1
+INLINK_SET_INDEX = 2
+
+
+def create_item(page, inlinks=()):
+    return ("Page %d" % page, "https://en.wikipedia.org/wiki/Page_%d" % page, create_inlinks(inlinks))
+
+
+def drain(frontier):
+    items = []
+    while len(frontier) > 0:
+        anchor_text, hyperlink, inlinks = frontier.pop()
+        items.append((hyperlink, sorted(inlinks)))
+    return items
+
+
+def add_pages(frontiers, pages, inlink):
+    for frontier in frontiers:
+        for page in pages:
+            frontier.add(create_item(page, [inlink]))
+
+
+def create_scored_item(page, score):
+    return ("Page %d" % page, "https://en.wikipedia.org/wiki/Page_%d" % page, score)
+
+
+def create_priority_frontier():
+    # highest score first
+    return PriorityFrontier(URL_INDEX, lambda frontier_item: -frontier_item[2])
+
+
+def test_priority_frontier_peek_matches_pop_order():
+    frontier = create_priority_frontier()
+    for page in range(20):
+        frontier.add(create_scored_item(page, page % 5))
+    # rediscovered with a higher score, the queued items are replaced
+    for page in range(0, 20, 4):
+        frontier.add(create_scored_item(page, 10 + page))
+    # a lower score does not replace them
+    frontier.add(create_scored_item(19, 0))
+
+    peeked = frontier.peek(8)
+    assert peeked == frontier.peek(8)
+    assert len(frontier) == 20
+    assert [frontier.pop() for i in range(8)] == peeked
+    assert frontier.peek(100) == [frontier.pop() for i in range(12)]
+    assert frontier.peek(1) == []
+
+
+def test_priority_frontier_peek_drops_stale_entries():
+    frontier = create_priority_frontier()
+    for page in range(100):
+        frontier.add(create_scored_item(page, 0))
+    for page in range(50):
+        frontier.add(create_scored_item(page, 1))
+    assert [frontier.pop()[URL_INDEX] for i in range(50)] == [create_item(page)[URL_INDEX] for page in range(50)]
+    assert len(frontier.heap) == 100
+    # the replaced entries of the first pages surface first, they are dropped for good
+    assert frontier.peek(50) == [create_scored_item(page, 0) for page in range(50, 100)]
+    assert len(frontier.heap) == 50
+
+
+def test_opic_frontier_serves_most_cash_first():
+    frontier = OPICFrontier(URL_INDEX, INLINK_SET_INDEX)
+    frontier.add(create_item(0))
+    assert frontier.pop()[URL_INDEX] == create_item(0)[URL_INDEX]
+    # the seed splits its cash among its 4 out-links, page 3 is linked twice
+    assert frontier.spend_cash(create_item(0)[URL_INDEX], 1, 4) == 1.0
+    for page in [1, 2, 3]:
+        frontier.add(create_item(page, [1]))
+    frontier.merge_inlinks(create_item(3)[URL_INDEX], create_inlinks([1]))
+    assert frontier.cash[create_item(3)[URL_INDEX]][0] == 0.5
+
+    assert frontier.pop()[URL_INDEX] == create_item(3)[URL_INDEX]
+    assert frontier.spend_cash(create_item(3)[URL_INDEX], 2, 1) == 0.5
+    # page 3 spends its cash on a single out-link, page 4 and page 2 linked from it get all of it
+    frontier.add(create_item(4, [2]))
+    frontier.merge_inlinks(create_item(2)[URL_INDEX], create_inlinks([2]))
+    peeked = frontier.peek(3)
+    assert [frontier.pop() for i in range(3)] == peeked
+    assert [frontier_item[URL_INDEX] for frontier_item in peeked] == \
+           [create_item(page)[URL_INDEX] for page in [2, 4, 1]]
+    assert sorted(peeked[0][INLINK_SET_INDEX]) == [1, 2]
+
+
+def test_opic_frontier_serves_equal_cash_in_add_order():
+    frontier = OPICFrontier(URL_INDEX, INLINK_SET_INDEX)
+    for page in range(5):
+        frontier.add(create_item(page))
+    # in-links recorded while no page is spending its cash bring none
+    frontier.merge_inlinks(create_item(4)[URL_INDEX], create_inlinks([9]))
+    assert [hyperlink for hyperlink, inlinks in drain(frontier)] == [create_item(page)[URL_INDEX] for page in range(5)]
+
+
+def test_opic_frontier_drops_cash_of_crawled_urls():
+    frontier = OPICFrontier(URL_INDEX, INLINK_SET_INDEX)
+    frontier.add(create_item(0))
+    frontier.add(create_item(1))
+    frontier.pop()
+    # spending under a URL that was not the one popped spends nothing
+    assert frontier.spend_cash(create_item(5)[URL_INDEX], 1, 2) == 0.0
+    frontier.add(create_item(2, [1]))
+    assert frontier.cash[create_item(2)[URL_INDEX]][0] == 0.0
+
+
+@pytest.fixture
+def spilling_frontier(tmp_path):
+    frontier = SpillingBFSFrontier(URL_INDEX, INLINK_SET_INDEX, str(tmp_path / "segments"),
+                                   memory_capacity=5, segment_size=4)
+    yield frontier
+    frontier.close()
+
+
+def test_spilling_frontier_matches_bfs_frontier(spilling_frontier):
+    bfs_frontier = BFSFrontier(URL_INDEX, INLINK_SET_INDEX)
+    frontiers = [bfs_frontier, spilling_frontier]
+    add_pages(frontiers, range(30), 1)
+    # rediscovered links merge their in-links, whether the item is in memory or spilled
+    add_pages(frontiers, range(0, 30, 3), 2)
+
+    for page in range(30):
+        assert create_item(page)[URL_INDEX] in spilling_frontier
+    assert create_item(30)[URL_INDEX] not in spilling_frontier
+    assert len(spilling_frontier) == len(bfs_frontier) == 30
+
+    for i in range(12):
+        assert spilling_frontier.pop()[URL_INDEX] == bfs_frontier.pop()[URL_INDEX]
+    add_pages(frontiers, range(20, 40), 3)
+    assert drain(spilling_frontier) == drain(bfs_frontier)
+
+
+def test_spilled_urls_are_not_kept_in_memory(spilling_frontier):
+    add_pages([spilling_frontier], range(5 + 4 * 100), 1)
+    # only the URLs of the segment being written are in memory, the others are in key files
+    assert len(spilling_frontier.segment_keys) <= 4
+    assert len(spilling_frontier.enqueued) == 5
+    assert len(spilling_frontier) == 5 + 4 * 100
+
+
+def test_filter_false_positives_are_confirmed_on_disk(tmp_path):
+    frontier = SpillingBFSFrontier(URL_INDEX, INLINK_SET_INDEX, str(tmp_path / "segments"),
+                                   memory_capacity=5, segment_size=4, filter_bit_count=64)
+    add_pages([frontier], range(100), 1)
+    assert all(create_item(page)[URL_INDEX] in frontier for page in range(100))
+    assert not any(create_item(page)[URL_INDEX] in frontier for page in range(100, 300))
+    assert [hyperlink for hyperlink, inlinks in drain(frontier)] == \
+           [create_item(page)[URL_INDEX] for page in range(100)]
+    frontier.close()
+
+
+def test_inlinks_of_earlier_crawl_are_not_applied(tmp_path):
+    spill_directory = str(tmp_path / "segments")
+    earlier_frontier = SpillingBFSFrontier(URL_INDEX, INLINK_SET_INDEX, spill_directory, 5, 4)
+    add_pages([earlier_frontier], range(30), 1)
+    add_pages([earlier_frontier], range(30), 2)
+    earlier_frontier.flush()
+
+    # a frontier reusing the spill directory, the earlier crawl was not closed
+    frontier = SpillingBFSFrontier(URL_INDEX, INLINK_SET_INDEX, spill_directory, 5, 4)
+    add_pages([frontier], range(100, 130), 3)
+    assert drain(frontier) == [(create_item(page)[URL_INDEX], [3]) for page in range(100, 130)]
+    frontier.close()
+
+
+def test_restored_frontier_drops_items_spilled_after_checkpoint(spilling_frontier):
+    bfs_frontier = BFSFrontier(URL_INDEX, INLINK_SET_INDEX)
+    add_pages([spilling_frontier, bfs_frontier], range(18), 1)
+    checkpoint = pickle.dumps(spilling_frontier)
+
+    add_pages([spilling_frontier], range(18, 40), 2)
+    add_pages([spilling_frontier], range(18), 2)
+    restored_frontier = pickle.loads(checkpoint)
+    # the segment being written at the checkpoint is appended to again
+    add_pages([restored_frontier, bfs_frontier], range(50, 60), 3)
+    assert drain(restored_frontier) == drain(bfs_frontier)
@@ -0,0 +1,109 @@
+import threading
+import time
+from urllib.error import HTTPError, URLError
+
+import pytest
+
+from crawler.async_fetcher import FetchResult
+from crawler.host_scheduler import RobotsCache
+
+ROBOTS_TXT = b"User-agent: *\nDisallow: /private\n"
+
+
+def create_fetch(responses, fetched_urls):
+    '''
+    :param responses: robots.txt URL vs its body, or the exception fetching it raises
+    :param fetched_urls: list the fetched URLs are appended to
+    :return: fetch backend serving the responses.
+    '''
+    def fetch(robots_url):
+        fetched_urls.append(robots_url)
+        response = responses[robots_url]
+        if isinstance(response, Exception):
+            raise response
+        return FetchResult(robots_url, robots_url, response)
+    return fetch
+
+
+def get_http_error(robots_url, status):
+    return HTTPError(robots_url, status, "status " + str(status), None, None)
+
+
+def test_robots_txt_rules_are_honored():
+    fetched_urls = []
+    robots = RobotsCache(create_fetch({"http://a.test/robots.txt": ROBOTS_TXT}, fetched_urls))
+    assert robots.can_fetch("http://a.test/page")
+    assert not robots.can_fetch("http://a.test/private/page")
+    assert fetched_urls == ["http://a.test/robots.txt"]
+
+
+@pytest.mark.parametrize("status, allowed", [(401, False), (403, False), (404, True), (410, True)])
+def test_robots_txt_client_error(status, allowed):
+    robots_url = "http://a.test/robots.txt"
+    robots = RobotsCache(create_fetch({robots_url: get_http_error(robots_url, status)}, []))
+    assert robots.can_fetch("http://a.test/page") == allowed
+    assert robots.has_rules("http://a.test/page")
+
+
+@pytest.mark.parametrize("error", [get_http_error("http://a.test/robots.txt", 500),
+                                   get_http_error("http://a.test/robots.txt", 503),
+                                   URLError("connection refused"), ConnectionResetError()])
+def test_unreachable_robots_txt_disallows_host_until_retried(error):
+    robots_url = "http://a.test/robots.txt"
+    responses = {robots_url: error}
+    fetched_urls = []
+    robots = RobotsCache(create_fetch(responses, fetched_urls), retry_interval=0.2)
+    assert not robots.can_fetch("http://a.test/page")
+    # the failure is cached until the retry interval is over
+    assert not robots.can_fetch("http://a.test/other-page")
+    assert fetched_urls == [robots_url]
+
+    responses[robots_url] = ROBOTS_TXT
+    time.sleep(0.25)
+    assert not robots.has_rules("http://a.test/page")
+    assert robots.can_fetch("http://a.test/page")
+    assert not robots.can_fetch("http://a.test/private/page")
+    assert fetched_urls == [robots_url, robots_url]
+
+
+def test_robots_txt_of_different_hosts_are_fetched_concurrently():
+    slow_host_fetching = threading.Event()
+    release_slow_host = threading.Event()
+
+    def fetch(robots_url):
+        if robots_url.startswith("http://slow.test"):
+            slow_host_fetching.set()
+            release_slow_host.wait(5)
+        return FetchResult(robots_url, robots_url, ROBOTS_TXT)
+
+    robots = RobotsCache(fetch)
+    slow_lookup = threading.Thread(target=robots.can_fetch, args=("http://slow.test/page",))
+    slow_lookup.start()
+    assert slow_host_fetching.wait(5)
+    # a lookup of another host is not held up by the pending fetch
+    fast_lookup = threading.Thread(target=robots.can_fetch, args=("http://fast.test/page",))
+    fast_lookup.start()
+    fast_lookup.join(2)
+    fast_host_fetched = not fast_lookup.is_alive()
+    release_slow_host.set()
+    slow_lookup.join()
+    fast_lookup.join()
+    assert fast_host_fetched
+    assert robots.has_rules("http://slow.test/page")
+
+
+def test_robots_txt_of_a_host_is_fetched_once():
+    fetched_urls = []
+    robots_urls = {"http://a.test/robots.txt": ROBOTS_TXT}
+
+    def fetch(robots_url):
+        time.sleep(0.05)
+        return create_fetch(robots_urls, fetched_urls)(robots_url)
+
+    robots = RobotsCache(fetch)
+    lookups = [threading.Thread(target=robots.can_fetch, args=("http://a.test/page",)) for i in range(8)]
+    for lookup in lookups:
+        lookup.start()
+    for lookup in lookups:
+        lookup.join()
+    assert fetched_urls == ["http://a.test/robots.txt"]
@@ -0,0 +1,120 @@
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+
+import pytest
+
+from crawler.http_pool import ConditionalFetchCache, HTTPConnectionPool
+from crawler.instrumentation import CONNECT_STAGE, CrawlMetrics, DNS_STAGE
+
+PAGE_BODY = b"<html><body>" + b"<p>Page</p>" * 100 + b"</body></html>"
+PAGE_ETAG = '"v1"'
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+    '''
+    Stand-in server of the pool tests, keeps connections alive:
+
+        /page          gzip compressed if asked for, with an ETag, 304 if the ETag is sent back
+        /redirect      301 to /page
+        /not-modified  304 whatever the request
+    '''
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connection_count += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/redirect":
+            self.send_response(301)
+            self.send_header("Location", "/page")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path == "/not-modified" or (self.path == "/page" and self.headers.get("If-None-Match") == PAGE_ETAG):
+            self.send_response(304)
+            self.send_header("ETag", PAGE_ETAG)
+            self.end_headers()
+        elif self.path == "/page":
+            body = PAGE_BODY
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", PAGE_ETAG)
+            if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                body = gzip.compress(body)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    stand_in_server = ThreadingHTTPServer(("127.0.0.1", 0), StandInRequestHandler)
+    stand_in_server.daemon_threads = True
+    stand_in_server.lock = threading.Lock()
+    stand_in_server.connection_count = 0
+    stand_in_server.requests = []
+    thread = threading.Thread(target=stand_in_server.serve_forever, daemon=True)
+    thread.start()
+    yield stand_in_server
+    stand_in_server.shutdown()
+    stand_in_server.server_close()
+
+
+def get_url(server, path):
+    return "http://127.0.0.1:" + str(server.server_address[1]) + path
+
+
+def test_connection_is_kept_alive(server):
+    metrics = CrawlMetrics()
+    pool = HTTPConnectionPool(metrics=metrics)
+    for i in range(5):
+        assert pool.fetch(get_url(server, "/page")).body == PAGE_BODY
+    pool.close()
+    assert server.connection_count == 1
+    assert len(server.requests) == 5
+    # a single connection was opened, so a single DNS lookup and connect were timed
+    assert metrics.histograms[DNS_STAGE].count == 1
+    assert metrics.histograms[CONNECT_STAGE].count == 1
+
+
+def test_gzip_body_is_decoded(server):
+    pool = HTTPConnectionPool()
+    fetch_result = pool.fetch(get_url(server, "/redirect"))
+    pool.close()
+    assert fetch_result.final_url == get_url(server, "/page")
+    assert fetch_result.body == PAGE_BODY
+
+
+def test_cached_page_is_revalidated(server, tmp_path):
+    cache = ConditionalFetchCache(str(tmp_path))
+    pool = HTTPConnectionPool(cache)
+    assert pool.fetch(get_url(server, "/page")).body == PAGE_BODY
+    # a recrawl sends the ETag back and is served the cached body on 304
+    recrawl_pool = HTTPConnectionPool(cache)
+    fetch_result = recrawl_pool.fetch(get_url(server, "/redirect"))
+    pool.close()
+    recrawl_pool.close()
+    assert fetch_result.body == PAGE_BODY
+    assert server.requests == [("/page", None), ("/redirect", None), ("/page", PAGE_ETAG)]
+
+
+def test_not_modified_without_cached_body_is_an_error(server, tmp_path):
+    cache = ConditionalFetchCache(str(tmp_path))
+    pool = HTTPConnectionPool(cache)
+    with pytest.raises(HTTPError) as http_error:
+        pool.fetch(get_url(server, "/not-modified"))
+    pool.close()
+    assert http_error.value.code == 304
+    assert cache.get(get_url(server, "/not-modified")) is None
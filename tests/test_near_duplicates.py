@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from crawler.near_duplicates import SimHashIndex, compute_simhash, hamming_distance
+
+WORDS = ["rain", "cloud", "storm", "river", "ocean", "wind", "cyclone", "season", "climate", "pressure",
+         "tropical", "eclipse", "moon", "solar", "shadow", "orbit", "history", "trade", "route", "region"]
+
+
+def create_text(seed, word_count=500):
+    random_generator = random.Random(seed)
+    return " ".join(random_generator.choice(WORDS) + str(random_generator.randrange(5)) for i in range(word_count))
+
+
+def test_simhash_ignores_case_and_punctuation():
+    assert compute_simhash("Heavy rain, more RAIN.") == compute_simhash("heavy rain more rain")
+
+
+def test_near_duplicate_texts_have_close_fingerprints():
+    text = create_text(1)
+    # a few words changed, as in a page with another footer or timestamp
+    edited_text = text.replace("rain1 ", "snow1 ", 1) + " edited"
+    assert hamming_distance(compute_simhash(text), compute_simhash(edited_text)) <= 3
+    assert hamming_distance(compute_simhash(text), compute_simhash(create_text(2))) > 3
+
+
+def test_index_finds_fingerprints_within_max_distance():
+    index = SimHashIndex(max_distance=3, band_count=4)
+    fingerprint = compute_simhash(create_text(1))
+    index.add(fingerprint, "D1")
+    # flipping bits in every band still leaves one band of the fingerprint unchanged
+    for flipped_bits in [(0,), (0, 16), (0, 16, 32), (15, 31, 47)]:
+        near_fingerprint = fingerprint
+        for bit in flipped_bits:
+            near_fingerprint ^= 1 << bit
+        assert index.find(near_fingerprint) == "D1"
+    assert index.find(fingerprint ^ (1 | 1 << 16 | 1 << 32 | 1 << 48)) is None
+    assert index.find(compute_simhash(create_text(2))) is None
+
+
+def test_index_needs_more_bands_than_max_distance():
+    with pytest.raises(ValueError):
+        SimHashIndex(max_distance=4, band_count=4)
@@ -0,0 +1,43 @@
+import pytest
+
+from crawler.record_store import RecordStoreReader, RecordStoreWriter, decode_record
+
+PAGES = [("D%d" % page, "https://en.wikipedia.org/wiki/Page_%d" % page, "<div>Page %d été</div>" % page * 50)
+         for page in range(1, 21)]
+
+
+def write_pages(store_path, pages, offsets=None):
+    writer = RecordStoreWriter(store_path, offsets)
+    for doc_id, hyperlink, content in pages:
+        writer.write_record(doc_id, hyperlink, content)
+    writer.close()
+
+
+def test_records_are_read_back(tmp_path):
+    store_path = str(tmp_path / "content.store")
+    write_pages(store_path, PAGES)
+    reader = RecordStoreReader(store_path)
+    assert len(reader) == len(PAGES)
+    assert reader.get_doc_ids() == [doc_id for doc_id, hyperlink, content in PAGES]
+    assert reader.read_record("D7") == PAGES[6]
+    assert list(reader) == PAGES
+
+
+def test_resumed_store_drops_records_past_offsets(tmp_path):
+    store_path = str(tmp_path / "content.store")
+    writer = RecordStoreWriter(store_path)
+    for doc_id, hyperlink, content in PAGES[:10]:
+        writer.write_record(doc_id, hyperlink, content)
+    offsets = writer.tell()
+    # records written after the checkpoint, then the crawl died
+    for doc_id, hyperlink, content in PAGES[10:15]:
+        writer.write_record(doc_id, hyperlink, content)
+    writer.close()
+
+    write_pages(store_path, PAGES[10:], offsets)
+    assert list(RecordStoreReader(store_path)) == PAGES
+
+
+def test_decode_rejects_other_bytes():
+    with pytest.raises(ValueError):
+        decode_record(b"<html></html>")
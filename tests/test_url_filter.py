@@ -0,0 +1,44 @@
+import pytest
+
+from crawler.url_filter import MAIN_PAGE_URLS, compile_url_filter, get_site_url
+
+WIKIPEDIA_PREFIX_TO_FOLLOW = "https://en.wikipedia.org/wiki"
+
+
+def test_site_url():
+    assert get_site_url(WIKIPEDIA_PREFIX_TO_FOLLOW) == "https://en.wikipedia.org"
+    assert get_site_url("http://127.0.0.1:8000/wiki") == "http://127.0.0.1:8000"
+
+
+@pytest.mark.parametrize("hyperlink, followed", [
+    ("https://en.wikipedia.org/wiki/Solar_eclipse", True),
+    ("https://en.wikipedia.org/wiki/Help:Contents", False),
+    ("https://en.wikipedia.org/wiki/Main_Page", False),
+    ("https://en.wikipedia.org/w/index.php?title=Rain", False),
+    ("https://de.wikipedia.org/wiki/Regen", False),
+    ("#Section", False),
+    ("/wiki/Rain", False),
+])
+def test_wikipedia_filter(hyperlink, followed):
+    url_filter = compile_url_filter(WIKIPEDIA_PREFIX_TO_FOLLOW, MAIN_PAGE_URLS)
+    assert url_filter(hyperlink) == followed
+
+
+@pytest.mark.parametrize("hyperlink, followed", [
+    ("http://127.0.0.1:8000/wiki/Page_1", True),
+    ("http://127.0.0.1:8000/wiki/Help:Contents", False),
+    ("http://127.0.0.1:8001/wiki/Page_1", False),
+])
+def test_filter_of_site_with_port(hyperlink, followed):
+    # the port is not taken for an administrative page, nor is the host required to be Wikipedia
+    assert compile_url_filter("http://127.0.0.1:8000/wiki")(hyperlink) == followed
+
+
+def test_filter_of_other_wikipedia_prefix_requires_english_article():
+    url_filter = compile_url_filter("https://")
+    assert url_filter("https://en.wikipedia.org/wiki/Rain")
+    assert not url_filter("https://de.wikipedia.org/wiki/Regen")
+
+
+def test_administrative_prefix_follows_nothing():
+    assert not compile_url_filter("https://en.wikipedia.org/wiki/Help:")("https://en.wikipedia.org/wiki/Help:Contents")
@@ -0,0 +1,67 @@
+import pickle
+
+from crawler.edge_log import EdgeLogWriter, finalize_edge_log
+from crawler.visited_store import VisitedStore, create_inlinks
+
+PAGE_URL = "https://en.wikipedia.org/wiki/Page_%d"
+
+
+def test_visited_urls_are_found_by_doc_id():
+    visited = VisitedStore(100)
+    for page in range(1, 101):
+        visited.add(PAGE_URL % page, page, create_inlinks([page - 1]))
+    assert len(visited) == 100
+    for page in range(1, 101):
+        assert PAGE_URL % page in visited
+        assert visited.get_doc_id(PAGE_URL % page) == page
+    # the exact hashes confirm Bloom filter hits, none of the unvisited URLs is reported visited
+    for page in range(101, 10101):
+        assert PAGE_URL % page not in visited
+        assert visited.get_doc_id(PAGE_URL % page) is None
+
+
+def test_inlinks_are_recorded_by_doc_id():
+    visited = VisitedStore(10)
+    visited.add(PAGE_URL % 1, 1, create_inlinks())
+    visited.add(PAGE_URL % 2, 2, create_inlinks([1]))
+    visited.add_inlink(PAGE_URL % 1, 2)
+    visited.add_inlink(PAGE_URL % 2, 1)
+    assert {doc_id: list(inlinks) for doc_id, inlinks in visited.get_inlinks().items()} == {1: [2], 2: [1, 1]}
+
+
+def test_alias_shares_doc_id_and_inlinks():
+    visited = VisitedStore(10)
+    visited.add(PAGE_URL % 1, 1, create_inlinks([3]))
+    visited.add_alias(PAGE_URL % 1 + "_alias", 1, [4, 5])
+    visited.add_inlink(PAGE_URL % 1 + "_alias", 6)
+    # an alias is not another page
+    assert len(visited) == 1
+    assert visited.get_doc_id(PAGE_URL % 1 + "_alias") == 1
+    assert list(visited.get_inlinks()[1]) == [3, 4, 5, 6]
+
+
+def test_inlinks_are_written_to_edge_log(tmp_path):
+    edge_log_path = str(tmp_path / "edges.log")
+    graph_file_name = str(tmp_path / "graph.txt")
+    visited = VisitedStore(10)
+    visited.set_edge_log(EdgeLogWriter(edge_log_path))
+    visited.add(PAGE_URL % 1, 1, create_inlinks())
+    visited.add(PAGE_URL % 2, 2, create_inlinks([1]))
+    visited.add_alias(PAGE_URL % 2 + "_alias", 2, [3])
+    visited.add_inlink(PAGE_URL % 1, 2)
+    assert visited.get_inlinks() == dict()
+    visited.edge_log.close()
+
+    assert finalize_edge_log(edge_log_path, graph_file_name) == 2
+    with open(graph_file_name, 'r', encoding="utf-8") as graph_file:
+        assert graph_file.read() == "D1 D2\nD2 D1 D3\n"
+
+
+def test_checkpointed_store_leaves_out_edge_log(tmp_path):
+    visited = VisitedStore(10)
+    visited.add(PAGE_URL % 1, 1, create_inlinks())
+    visited.set_edge_log(EdgeLogWriter(str(tmp_path / "edges.log")))
+    restored_visited = pickle.loads(pickle.dumps(visited))
+    visited.edge_log.close()
+    assert restored_visited.edge_log is None
+    assert restored_visited.get_doc_id(PAGE_URL % 1) == 1
@@ -0,0 +1,124 @@
+import sys
+import time
+from os import listdir
+from os.path import join
+
+from crawler.link_extractor import extract_content_links
+from crawler.url_filter import MAIN_PAGE_URLS, compile_url_filter
+
+PREFIX_TO_FOLLOW = "https://en.wikipedia.org/wiki"
+
+# Number of times the links of every page are filtered by each filter.
+REPEAT_COUNT = 20
+
+
+def load_page_links(dir_path):
+    '''
+    Loads saved pages i.e. raw html files from dir_path and extracts
+    the links of their content sections, relative links made absolute.
+    :param dir_path: directory with the saved pages
+    :return: list of (file name, list of hyperlinks)
+    '''
+    page_links = []
+    for file in sorted(listdir(dir_path)):
+        with open(join(dir_path, file), 'rb') as saved_page_file:
+            links = extract_content_links(saved_page_file.read())[1]
+        page_links.append((file, ["https://en.wikipedia.org" + url if url.startswith("/wiki/") else url
+                                  for anchor_text, url in links]))
+    return page_links
+
+
+def filter_with_predicates(page_links):
+    '''
+    The crawler's former path, one predicate function per rule for every link.
+    :param page_links: list of (file name, list of hyperlinks)
+    :return: list of the hyperlinks queued, in order
+    '''
+    queued = set()
+    queued_links = []
+
+    def is_link_external(hyperlink):
+        return not hyperlink.startswith(PREFIX_TO_FOLLOW)
+
+    def is_link_visited(hyperlink):
+        return hyperlink in queued
+
+    def is_link_administrative(hyperlink):
+        return hyperlink.count(":") > 1
+
+    def is_link_for_page_section(hyperlink):
+        return hyperlink.startswith("#")
+
+    def is_link_pointing_to_english_article(hyperlink):
+        return hyperlink.count("en.wikipedia") > 0
+
+    def is_link_pointing_to_main_page(hyperlink):
+        return hyperlink == "https://en.wikipedia.org/wiki/Main_Page" or hyperlink == "https://www.wikipedia.org/"
+
+    for file, links in page_links:
+        for hyperlink in links:
+            if not (is_link_external(hyperlink)
+                    or is_link_visited(hyperlink)
+                    or is_link_administrative(hyperlink)
+                    or is_link_for_page_section(hyperlink)
+                    or is_link_pointing_to_main_page(hyperlink)) \
+                    and is_link_pointing_to_english_article(hyperlink):
+                queued.add(hyperlink)
+                queued_links.append(hyperlink)
+    return queued_links
+
+
+def filter_with_compiled_filter(page_links, dedup_page_links=False):
+    '''
+    The compiled URL filter, optionally skipping the links repeated on a page.
+    :param page_links: list of (file name, list of hyperlinks)
+    :param dedup_page_links: True to filter every link of a page once
+    :return: list of the hyperlinks queued, in order
+    '''
+    url_filter = compile_url_filter(PREFIX_TO_FOLLOW, MAIN_PAGE_URLS)
+    queued = set()
+    queued_links = []
+    for file, links in page_links:
+        if dedup_page_links:
+            links = dict.fromkeys(links)
+        for hyperlink in links:
+            if url_filter(hyperlink) and hyperlink not in queued:
+                queued.add(hyperlink)
+                queued_links.append(hyperlink)
+    return queued_links
+
+
+FILTERS = [
+    ("Predicates (former)", filter_with_predicates),
+    ("Compiled filter", filter_with_compiled_filter),
+    ("Compiled filter + per-page dedup", lambda page_links: filter_with_compiled_filter(page_links, True))
+]
+
+
+def benchmark(page_links):
+    '''
+    Times every filter over the links of the saved pages and checks
+    that they queue the same links as the former path.
+    :param page_links: list of (file name, list of hyperlinks)
+    :return: None
+    '''
+    expected_links = filter_with_predicates(page_links)
+    link_count = sum(len(links) for file, links in page_links)
+    print("Pages: " + str(len(page_links)) + " Links: " + str(link_count) +
+          " Distinct per page: " + str(sum(len(set(links)) for file, links in page_links)))
+
+    for filter_name, url_filter in FILTERS:
+        matching = url_filter(page_links) == expected_links
+
+        start = time.perf_counter()
+        for i in range(REPEAT_COUNT):
+            url_filter(page_links)
+        time_taken = time.perf_counter() - start
+
+        print(filter_name + "|" +
+              "links/sec: " + str(round(REPEAT_COUNT * link_count / time_taken)) + "|" +
+              "same queued links: " + str(matching))
+
+
+if __name__ == '__main__':
+    benchmark(load_page_links(sys.argv[1]))